@@ -21,6 +21,13 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_object(obj, name, type_, reflected, compare_to):
+    # помесячные секции orders_archive живут вне metadata — их ведёт воркер архивации
+    if type_ == "table" and reflected and compare_to is None and name.startswith("orders_archive_y"):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     url = settings.database_url.replace("+asyncpg", "")
     context.configure(
@@ -28,6 +35,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         compare_type=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -39,6 +47,7 @@ def do_run_migrations(connection: Connection) -> None:
         connection=connection,
         target_metadata=target_metadata,
         compare_type=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
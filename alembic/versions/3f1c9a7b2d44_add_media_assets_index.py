@@ -0,0 +1,140 @@
+"""add media_assets index and products.images GIN index
+
+Revision ID: 3f1c9a7b2d44
+Revises: 6d5bcf592e98
+Create Date: 2026-10-19 13:10:00.000000
+
+"""
+import hashlib
+from pathlib import Path
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from PIL import Image
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c9a7b2d44"
+down_revision: Union[str, Sequence[str], None] = "6d5bcf592e98"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# медиатека админки на момент миграции; код приложения не импортируем — миграция должна
+# работать и после того, как он изменится
+MEDIA_ROOT = Path(__file__).resolve().parents[2] / "app" / "static" / "images"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+
+def _split(rel: str) -> tuple[str, str]:
+    parent, _, name = rel.rpartition("/")
+    return parent, name
+
+
+def _file_row(path: Path, rel: str) -> dict:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    width = height = fmt = None
+    try:
+        with Image.open(path) as im:
+            (width, height), fmt = im.size, im.format
+    except (OSError, ValueError):
+        pass  # битый файл всё равно показываем в медиатеке, без размеров
+    parent, name = _split(rel)
+    return {
+        "path": rel,
+        "folder": parent,
+        "name": name,
+        "kind": "file",
+        "size_bytes": path.stat().st_size,
+        "width": width,
+        "height": height,
+        "format": fmt,
+        "sha256": digest.hexdigest(),
+    }
+
+
+def _backfill_rows() -> list[dict]:
+    """Индекс того, что уже лежит на диске, иначе медиатека после деплоя пустая."""
+    if not MEDIA_ROOT.is_dir():
+        return []
+    rows = []
+    for path in sorted(MEDIA_ROOT.rglob("*")):
+        rel = path.relative_to(MEDIA_ROOT).as_posix()
+        if path.name.startswith("."):
+            continue
+        if path.is_dir():
+            parent, name = _split(rel)
+            # executemany: у всех строк один набор ключей
+            rows.append(
+                {
+                    "path": rel,
+                    "folder": parent,
+                    "name": name,
+                    "kind": "folder",
+                    "size_bytes": None,
+                    "width": None,
+                    "height": None,
+                    "format": None,
+                    "sha256": None,
+                }
+            )
+        elif path.suffix.lower() in IMAGE_EXTENSIONS:
+            rows.append(_file_row(path, rel))
+    return rows
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "media_assets",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("path", sa.String(length=512), nullable=False),
+        sa.Column("folder", sa.String(length=512), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("kind", sa.String(length=8), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("width", sa.Integer(), nullable=True),
+        sa.Column("height", sa.Integer(), nullable=True),
+        sa.Column("format", sa.String(length=16), nullable=True),
+        sa.Column("sha256", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("path"),
+    )
+    op.create_index("ix_media_assets_folder_kind", "media_assets", ["folder", "kind"], unique=False)
+    rows = _backfill_rows()
+    if rows:
+        # дальше индекс ведёт админка; сверить с диском после ручных правок — app/scripts/reindex_media.py
+        media_assets = sa.table(
+            "media_assets",
+            sa.column("path", sa.String),
+            sa.column("folder", sa.String),
+            sa.column("name", sa.String),
+            sa.column("kind", sa.String),
+            sa.column("size_bytes", sa.BigInteger),
+            sa.column("width", sa.Integer),
+            sa.column("height", sa.Integer),
+            sa.column("format", sa.String),
+            sa.column("sha256", sa.String),
+        )
+        op.bulk_insert(media_assets, rows)
+    op.create_index(op.f("ix_media_assets_sha256"), "media_assets", ["sha256"], unique=False)
+    op.create_index(
+        "ix_products_images",
+        "products",
+        ["images"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"images": "jsonb_path_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_products_images", table_name="products")
+    op.drop_index(op.f("ix_media_assets_sha256"), table_name="media_assets")
+    op.drop_index("ix_media_assets_folder_kind", table_name="media_assets")
+    op.drop_table("media_assets")
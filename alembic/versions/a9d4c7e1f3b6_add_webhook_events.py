@@ -0,0 +1,53 @@
+"""add webhook events
+
+Revision ID: a9d4c7e1f3b6
+Revises: f2a61b9c3e07
+Create Date: 2026-10-19 20:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9d4c7e1f3b6"
+down_revision: Union[str, Sequence[str], None] = "f2a61b9c3e07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("provider", sa.String(length=32), nullable=False),
+        sa.Column("event_key", sa.String(length=128), nullable=False),
+        sa.Column("order_ref", sa.String(length=64), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("received_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("provider", "event_key", name="uq_webhook_events_provider_event_key"),
+    )
+    op.create_index(
+        "ix_webhook_events_pending",
+        "webhook_events",
+        ["provider", "order_ref", "id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'received'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_webhook_events_pending",
+        table_name="webhook_events",
+        postgresql_where=sa.text("status = 'received'"),
+    )
+    op.drop_table("webhook_events")
@@ -0,0 +1,68 @@
+"""webhook events per-order sequence
+
+Revision ID: b3e7f0a2c5d9
+Revises: a9d4c7e1f3b6
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e7f0a2c5d9"
+down_revision: Union[str, Sequence[str], None] = "a9d4c7e1f3b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("webhook_events", sa.Column("seq", sa.Integer(), nullable=True))
+    # уже записанные события нумеруем в порядке поступления
+    op.execute(
+        """
+        UPDATE webhook_events AS e
+        SET seq = n.seq
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY order_ref ORDER BY id) AS seq
+            FROM webhook_events
+        ) AS n
+        WHERE e.id = n.id
+        """
+    )
+    op.alter_column("webhook_events", "seq", nullable=False)
+    op.create_unique_constraint("uq_webhook_events_order_ref_seq", "webhook_events", ["order_ref", "seq"])
+
+    op.drop_index(
+        "ix_webhook_events_pending",
+        table_name="webhook_events",
+        postgresql_where=sa.text("status = 'received'"),
+    )
+    op.create_index(
+        "ix_webhook_events_pending",
+        "webhook_events",
+        ["order_ref", "seq"],
+        unique=False,
+        postgresql_where=sa.text("status = 'received'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_webhook_events_pending",
+        table_name="webhook_events",
+        postgresql_where=sa.text("status = 'received'"),
+    )
+    op.create_index(
+        "ix_webhook_events_pending",
+        "webhook_events",
+        ["provider", "order_ref", "id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'received'"),
+    )
+    op.drop_constraint("uq_webhook_events_order_ref_seq", "webhook_events", type_="unique")
+    op.drop_column("webhook_events", "seq")
@@ -0,0 +1,56 @@
+"""add partial indexes for post-payment and archive workers
+
+Revision ID: c47a9e2b5d18
+Revises: 8b2e4d6f1a93
+Create Date: 2026-10-19 15:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c47a9e2b5d18"
+down_revision: Union[str, Sequence[str], None] = "8b2e4d6f1a93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# копия предикатов из app/db/models/order.py на момент миграции
+POST_PAYMENT_PENDING_SQL = (
+    "status = 'paid' AND (need_post_process OR confirmation_email_sent_at IS NULL"
+    " OR (tracking_number IS NOT NULL AND tracking_email_sent_at IS NULL))"
+)
+STALE_CANDIDATE_SQL = "status IN ('draft', 'pending_payment')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY — orders живая таблица, обычный CREATE INDEX заблокирует запись
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_post_payment_pending",
+            "orders",
+            ["created_at"],
+            unique=False,
+            postgresql_where=sa.text(POST_PAYMENT_PENDING_SQL),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_orders_stale_created_at",
+            "orders",
+            ["created_at"],
+            unique=False,
+            postgresql_where=sa.text(STALE_CANDIDATE_SQL),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_orders_stale_created_at", table_name="orders", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_orders_post_payment_pending", table_name="orders", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,43 @@
+"""add partitioned orders_archive cold storage
+
+Revision ID: e5d83c1f7a62
+Revises: c47a9e2b5d18
+Create Date: 2026-10-19 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5d83c1f7a62"
+down_revision: Union[str, Sequence[str], None] = "c47a9e2b5d18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "orders_archive",
+        sa.Column("id", sa.UUID(as_uuid=False), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("order_number", sa.String(length=16), nullable=True),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("data", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index(op.f("ix_orders_archive_order_number"), "orders_archive", ["order_number"], unique=False)
+    # секции (orders_archive_yYYYYmMM) создаёт воркер архивации по мере надобности
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # секции удаляются вместе с родительской таблицей
+    op.drop_index(op.f("ix_orders_archive_order_number"), table_name="orders_archive")
+    op.drop_table("orders_archive")
@@ -0,0 +1,58 @@
+"""add email outbox
+
+Revision ID: f2a61b9c3e07
+Revises: e5d83c1f7a62
+Create Date: 2026-10-19 18:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a61b9c3e07"
+down_revision: Union[str, Sequence[str], None] = "e5d83c1f7a62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("template", sa.String(length=64), nullable=False),
+        sa.Column("to_email", sa.String(length=320), nullable=False),
+        sa.Column("variables", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("dedup_key", sa.String(length=128), nullable=True),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("run_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("provider_message_id", sa.String(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("dedup_key"),
+    )
+    op.create_index(
+        "ix_email_outbox_ready",
+        "email_outbox",
+        ["run_at"],
+        unique=False,
+        postgresql_where=sa.text("status IN ('queued', 'sending')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_email_outbox_ready",
+        table_name="email_outbox",
+        postgresql_where=sa.text("status IN ('queued', 'sending')"),
+    )
+    op.drop_table("email_outbox")
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+import logging
+import mimetypes
+import os
+from pathlib import Path
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.staticfiles import NotModifiedResponse
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+from app.core.config import settings
+
+log = logging.getLogger("assets")
+
+STATIC_DIR = Path(__file__).resolve().parents[1] / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+STATIC_PREFIX = "/static/"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# порядок = предпочтение: brotli жмёт текст заметно лучше gzip
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _load_manifest() -> dict[str, str]:
+    # в dev собранный dist легко устаревает — там всегда отдаём исходники
+    if settings.env == "dev" or not MANIFEST_PATH.exists():
+        return {}
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        log.exception("Broken asset manifest %s, serving unhashed assets", MANIFEST_PATH)
+        return {}
+
+
+_manifest = _load_manifest()
+
+
+def static_url(path: str) -> str:
+    """'css/output.css' -> '/static/dist/css/output.3f2a9c1e.css' (или исходный URL без манифеста)."""
+    path = path.lstrip("/")
+    hashed = _manifest.get(path)
+    if hashed:
+        return f"{STATIC_PREFIX}dist/{hashed}"
+    return f"{STATIC_PREFIX}{path}"
+
+
+def accepted_encodings(header: str) -> dict[str, float]:
+    """'br;q=1.0, gzip;q=0, *' -> {'br': 1.0, 'gzip': 0.0, '*': 1.0}. q=0 — явный отказ."""
+    accepted: dict[str, float] = {}
+    for part in header.split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token.lower()] = q
+    return accepted
+
+
+def _encoding_allowed(accepted: dict[str, float], encoding: str) -> bool:
+    q = accepted.get(encoding, accepted.get("*", 0.0))
+    return q > 0
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который для dist/ (файлы с hash в имени) отдаёт
+    Cache-Control: immutable и, если клиент умеет, готовый .br/.gz рядом с файлом —
+    без сжатия на лету.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not path.startswith("dist" + os.sep) and not path.startswith("dist/"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        for encoding, suffix in ENCODINGS:
+            if not _encoding_allowed(accepted, encoding):
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None:
+                continue
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=media_type,
+                headers={
+                    "Content-Encoding": encoding,
+                    "Vary": "Accept-Encoding",
+                    "Cache-Control": IMMUTABLE,
+                },
+            )
+            # как StaticFiles.file_response: ETag/Last-Modified .br/.gz -> 304 на повторный запрос
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -11,7 +11,79 @@ class Settings(BaseSettings):
     MAILGUN_API_KEY: str
 
     database_url: str
+    # read-only реплика для каталога/админских списков; пусто = всё в primary
+    database_replica_url: str | None = None
+    # сколько секунд после записи клиент читает только с primary (лаг реплики)
+    db_replica_sticky_seconds: int = 5
+    db_replica_cookie_name: str = "noirid_rw"
+
+    # пул и рантайм БД
+    db_pool_size: int = 10
+    db_max_overflow: int = 5
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 30 * 60
+    db_pool_pre_ping: bool = False
+    # без pre-ping: пинговать на checkout соединения, простоявшие в пуле дольше N секунд; 0 = выкл
+    db_pool_idle_ping_seconds: float = 60.0
+    db_pool_wait_warn_ms: float = 250.0
+    db_statement_cache_size: int = 500
+
+    # statement_timeout по классам роутов, мс
+    db_statement_timeout_ms: int = 5_000
+    db_admin_statement_timeout_ms: int = 10_000
+    db_webhook_statement_timeout_ms: int = 10_000
+    db_worker_statement_timeout_ms: int = 60_000
     session_cookie_name: str = "noirid_session"
+    # "cookie" — подписанная cookie (starlette), "server" — LRU + таблица web_sessions
+    session_backend: str = "cookie"
+    session_max_age: int = 14 * 24 * 60 * 60
+    session_lru_size: int = 10_000
+
+    # in-process кэш каталога; инвалидация через LISTEN/NOTIFY, TTL — страховка
+    catalog_cache_ttl_seconds: int = 10 * 60
+    # кэш отрендеренных страниц (info, каталог, карточки товаров)
+    page_cache_enabled: bool = True
+    page_cache_max_entries: int = 1_000
+
+    # Jinja: байткод на диске + кэш фрагментов {% cache %}
+    jinja_bytecode_dir: str | None = None
+    jinja_fragment_cache_size: int = 500
+
+    media_max_upload_bytes: int = 25 * 1024 * 1024
+
+    idempotency_ttl_seconds: int = 24 * 60 * 60
+
+    # IPN 2CO: True — проверить подпись, записать в webhook_events и сразу ответить,
+    # применяет воркер (webhook.apply); False — применять прямо в запросе
+    ipn_async_ingest: bool = False
+
+    # исходящие HTTP-запросы (app/core/http.py)
+    http_mailgun_timeout_seconds: float = 15.0
+    http_paypal_timeout_seconds: float = 20.0
+
+    # письма: outbox + пакетная отправка через Mailgun batch sending
+    mailgun_base_url: str = "https://api.mailgun.net/v3"
+    mailgun_batch_size: int = 500
+    mailgun_requests_per_second: float = 2.0
+    email_batch_linger_seconds: float = 1.0
+    email_max_attempts: int = 8
+
+    # очередь фоновых задач (таблица jobs + LISTEN/NOTIFY)
+    jobs_concurrency: int = 8
+    jobs_poll_interval_seconds: float = 5.0
+    jobs_lease_seconds: int = 5 * 60
+    jobs_max_attempts: int = 8
+    jobs_backoff_base_seconds: float = 10.0
+    jobs_backoff_max_seconds: float = 60 * 60
+    jobs_retention_days: int = 7
+
+    # архивация брошенных заказов: пачками, с паузой между ними (нагрузка на I/O и WAL)
+    archive_batch_size: int = 1_000
+    archive_batch_pause_seconds: float = 0.2
+    # через сколько дней archived-заказ уезжает из orders в секционированный orders_archive
+    orders_cold_after_days: int = 30
+    # сколько месяцев храним секции orders_archive
+    orders_archive_retention_months: int = 24
 
     tco_merchant_code: str
     tco_secret_word: str
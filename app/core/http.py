@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import random
+from dataclasses import dataclass, field
+
+import httpx
+
+from app.core.config import settings
+
+log = logging.getLogger("http")
+
+# HTTP/2 — только если установлен h2 (pip install "httpx[http2]"), иначе HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# запрос до апстрима гарантированно не дошёл — повтор безопасен даже для POST
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass(frozen=True, slots=True)
+class Upstream:
+    name: str
+    timeout: httpx.Timeout
+    limits: httpx.Limits = field(
+        default_factory=lambda: httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+    )
+    retries: int = 2
+    backoff: float = 0.3
+    http2: bool = True
+
+
+UPSTREAMS = {
+    "mailgun": Upstream(
+        "mailgun",
+        timeout=httpx.Timeout(settings.http_mailgun_timeout_seconds, connect=5.0),
+        retries=3,
+        backoff=0.5,
+    ),
+    # платёжный клик ждёт ответа — короткий connect, общий таймаут с запасом на capture
+    "paypal": Upstream(
+        "paypal",
+        timeout=httpx.Timeout(settings.http_paypal_timeout_seconds, connect=3.0),
+        retries=2,
+        backoff=0.2,
+    ),
+}
+
+
+class HttpClients:
+    """
+    Один httpx.AsyncClient на апстрим на процесс: пул соединений и TLS-сессии
+    переживают запросы. transport подменяется в тестах (httpx.MockTransport).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self.transport = transport
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _build(self, upstream: Upstream) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=upstream.timeout,
+            limits=upstream.limits,
+            http2=upstream.http2 and HTTP2_AVAILABLE and self.transport is None,
+            transport=self.transport,
+            headers={"User-Agent": f"{settings.app_name}/1.0"},
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(UPSTREAMS[name])
+        return client
+
+    def open(self) -> None:
+        for name in UPSTREAMS:
+            self.get(name)
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+http_clients = HttpClients()
+
+
+async def request(
+    upstream: str,
+    method: str,
+    url: str,
+    *,
+    idempotent: bool = False,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Запрос через общий клиент апстрима с ретраями и экспоненциальным backoff.
+    Ошибки соединения повторяются всегда. 429/5xx и таймауты чтения — только
+    при idempotent=True (GET или POST с ключом идемпотентности у апстрима):
+    иначе повтор может задублировать письмо или платёж.
+    """
+    policy = UPSTREAMS[upstream]
+    client = http_clients.get(upstream)
+    attempt = 0
+    while True:
+        try:
+            response = await client.request(method, url, **kwargs)
+        except CONNECT_ERRORS as exc:
+            error: Exception | None = exc
+        except httpx.TimeoutException as exc:
+            if not idempotent:
+                raise
+            error = exc
+        else:
+            if not (idempotent and response.status_code in RETRY_STATUSES):
+                return response
+            error = None
+
+        if attempt >= policy.retries:
+            if error is not None:
+                raise error
+            return response
+
+        delay = policy.backoff * 2**attempt * random.uniform(0.5, 1.0)
+        if error is None:
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), 10.0))
+        attempt += 1
+        log.warning(
+            "Retrying %s %s in %.2fs (attempt %s/%s): %s",
+            upstream, method, delay, attempt, policy.retries,
+            error if error is not None else f"HTTP {response.status_code}",
+        )
+        await asyncio.sleep(delay)
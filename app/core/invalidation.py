@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+log = logging.getLogger("invalidation")
+
+CHANNEL = "noirid_invalidate"
+
+Handler = Callable[[], Awaitable[None] | None]
+
+_handlers: dict[str, list[Handler]] = defaultdict(list)
+
+
+def subscribe(topic: str, handler: Handler) -> None:
+    _handlers[topic].append(handler)
+
+
+async def publish(session: AsyncSession, topic: str) -> None:
+    """
+    NOTIFY внутри текущей транзакции: Postgres доставит его слушателям
+    только после COMMIT, так что другие воркеры не перечитают данные раньше времени.
+    """
+    await session.execute(select(func.pg_notify(CHANNEL, topic)))
+
+
+async def dispatch(topic: str) -> None:
+    for handler in _handlers.get(topic, ()):
+        try:
+            result = handler()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            log.exception("Invalidation handler failed | topic=%s", topic)
+
+
+def listen_dsn() -> str:
+    # asyncpg понимает обычный postgresql:// DSN без "+asyncpg"
+    url = make_url(settings.database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class InvalidationListener:
+    """
+    Один LISTEN-коннект на процесс (вне пула SQLAlchemy, чтобы не занимать слот).
+    При обрыве переподключаемся и на всякий случай инвалидируем все топики:
+    пока нас не было, NOTIFY могли потеряться.
+    """
+
+    def __init__(self, dsn: str | None = None, *, retry_delay: float = 2.0, ping_interval: float = 30.0) -> None:
+        self.dsn = dsn or listen_dsn()
+        self.retry_delay = retry_delay
+        self.ping_interval = ping_interval
+        self._task: asyncio.Task | None = None
+        # event loop держит на задачи только слабые ссылки: без своей ссылки dispatch
+        # может собрать GC посреди работы, и инвалидация потеряется
+        self._dispatching: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="invalidation-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        task = asyncio.get_running_loop().create_task(dispatch(payload))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+
+    async def _run(self) -> None:
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(CHANNEL, self._on_notify)
+                if not first:
+                    for topic in list(_handlers):
+                        await dispatch(topic)
+                log.info("Listening for invalidations on %s", CHANNEL)
+
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _c: closed.set())
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=self.ping_interval)
+                    except asyncio.TimeoutError:
+                        # полуоткрытый TCP termination listener не заметит никогда —
+                        # без пинга мы бы молча жили на TTL кэша
+                        await asyncio.wait_for(conn.fetchval("SELECT 1"), timeout=self.ping_interval)
+                log.warning("Invalidation listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Invalidation listener failed, retry in %.1fs", self.retry_delay)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            first = False
+            await asyncio.sleep(self.retry_delay)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """LRU отрендеренных кусков шаблонов с TTL. Живёт в памяти процесса."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: tuple) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: tuple, value: str, ttl: float | None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache "catalog-grid", 600 %} ... {% endcache %}
+    {% cache "variant-row", 300, brand, model %} ... {% endcache %}
+
+    Первый аргумент — имя фрагмента, второй — TTL в секундах (0/none = до
+    инвалидации), остальные добавляются к ключу. Хранилище берётся из
+    environment.fragment_cache.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment) -> None:
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache_support", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, args: list[Any], caller: Callable[[], str]) -> str:
+        store: FragmentCache | None = self.environment.fragment_cache
+        if store is None:
+            return caller()
+
+        name, ttl, *vary = [*args, None][: max(len(args), 2)]
+        key = (name, *vary)
+        value = store.get(key)
+        if value is None:
+            value = caller()
+            store.set(key, value, float(ttl) if ttl else None)
+        return Markup(value)
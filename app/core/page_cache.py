@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+
+# HTML может уходить вместе с Set-Cookie от сессионной middleware, поэтому
+# только браузерный кэш и всегда с ревалидацией: повторный заход = дешёвый 304.
+CACHE_CONTROL = "no-cache"
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPage:
+    body: bytes
+    media_type: str
+    etag: str
+    last_modified: datetime
+    generation: int | None
+    stored_at: float
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+
+
+class PageCache:
+    """LRU отрендеренных страниц в памяти процесса."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedPage] = OrderedDict()
+
+    def get(self, key: str) -> CachedPage | None:
+        page = self._entries.get(key)
+        if page is not None:
+            self._entries.move_to_end(key)
+        return page
+
+    def put(self, key: str, page: CachedPage) -> None:
+        self._entries[key] = page
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+page_cache = PageCache(max_entries=settings.page_cache_max_entries)
+
+
+def _cache_key(request: Request, vary_query: tuple[str, ...]) -> str:
+    # host входит в ключ: url_for() в шаблонах рендерит абсолютные ссылки
+    key = f"{request.url.scheme}://{request.url.netloc}{request.url.path}"
+    if vary_query:
+        parts = [f"{name}={request.query_params.get(name, '')}" for name in vary_query]
+        key += "?" + "&".join(parts)
+    return key
+
+
+def _not_modified(request: Request, page: CachedPage) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return page.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return page.last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _respond(request: Request, page: CachedPage) -> Response:
+    if _not_modified(request, page):
+        return Response(status_code=304, headers=page.headers())
+    return Response(content=page.body, media_type=page.media_type, headers=page.headers())
+
+
+def cached_page(
+    *,
+    ttl: int | None = None,
+    generation: Callable[[], int] | None = None,
+    vary_query: tuple[str, ...] = (),
+):
+    """
+    Кэширует HTML-ответ GET-роута целиком. Эндпоинт обязан принимать `request: Request`.
+
+    generation — счётчик версии данных (например, поколение каталога): запись,
+    отрендеренная при другой версии, считается протухшей. ttl — доп. ограничение по времени.
+    Ключ — scheme://host/path плюс только перечисленные в vary_query параметры,
+    чтобы utm-метки и прочий мусор не плодили копии.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Response]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            if not settings.page_cache_enabled:
+                return await func(*args, **kwargs)
+
+            key = _cache_key(request, vary_query)
+            current_gen = generation() if generation else None
+
+            page = page_cache.get(key)
+            if page is not None:
+                expired = ttl is not None and time.monotonic() - page.stored_at > ttl
+                if page.generation == current_gen and not expired:
+                    return _respond(request, page)
+                page_cache.discard(key)
+
+            response = await func(*args, **kwargs)
+            body = getattr(response, "body", None)
+            if response.status_code != 200 or not isinstance(body, bytes) or response.background is not None:
+                return response
+
+            page = CachedPage(
+                body=body,
+                media_type=response.media_type or "text/html",
+                etag='"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"',
+                last_modified=datetime.now(timezone.utc),
+                # поколение до рендера: если каталог сменился посреди рендера, запись сразу протухнет
+                generation=current_gen,
+                stored_at=time.monotonic(),
+            )
+            page_cache.put(key, page)
+            return _respond(request, page)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.session import request_db_state
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Гарантия read-your-writes поверх реплики. Если запрос что-то записал,
+    клиенту ставится короткая cookie с дедлайном; пока она жива, все его
+    запросы читают с primary (редирект после POST в админке, возврат с оплаты).
+    """
+
+    def __init__(self, app: ASGIApp, *, cookie_name: str, sticky_seconds: int) -> None:
+        self.app = app
+        self.cookie_name = cookie_name
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/static/"):
+            await self.app(scope, receive, send)
+            return
+
+        raw = HTTPConnection(scope).cookies.get(self.cookie_name, "")
+        sticky = raw.isdigit() and int(raw) > time.time()
+        state = {"sticky": sticky, "wrote": False}
+        token = request_db_state.set(state)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and state["wrote"]:
+                until = int(time.time()) + self.sticky_seconds
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie",
+                    f"{self.cookie_name}={until}; path=/; Max-Age={self.sticky_seconds}; httponly; samesite=lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_db_state.reset(token)
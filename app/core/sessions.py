@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import secrets
+from collections import OrderedDict
+from collections.abc import Iterator, MutableMapping
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection, Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.models.web_session import WebSession
+
+log = logging.getLogger("sessions")
+
+
+class SessionStore:
+    """
+    Серверное хранилище сессий: LRU в памяти процесса + таблица web_sessions.
+    В памяти лежит (version, data); версия приходит в cookie, поэтому
+    попадание в LRU с той же версией — это ноль I/O, а чужой воркер,
+    обновивший сессию, просто выдаст новую версию и мы сходим в БД.
+    """
+
+    def __init__(self, engine: AsyncEngine, *, max_entries: int, max_age: int) -> None:
+        self.engine = engine
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lru: OrderedDict[str, tuple[int, dict[str, Any]]] = OrderedDict()
+
+    def _remember(self, sid: str, version: int, data: dict[str, Any]) -> None:
+        self._lru[sid] = (version, data)
+        self._lru.move_to_end(sid)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_cached(self, sid: str, version: int) -> dict[str, Any] | None:
+        entry = self._lru.get(sid)
+        if entry is None or entry[0] != version:
+            return None
+        self._lru.move_to_end(sid)
+        return entry[1]
+
+    async def load(self, sid: str) -> tuple[int, dict[str, Any]] | None:
+        stmt = select(WebSession.version, WebSession.data).where(
+            WebSession.id == sid,
+            WebSession.expires_at > datetime.now(timezone.utc),
+        )
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(stmt)).first()
+        if row is None:
+            self._lru.pop(sid, None)
+            return None
+        version, data = int(row.version), dict(row.data or {})
+        self._remember(sid, version, data)
+        return version, data
+
+    async def save(self, sid: str, data: dict[str, Any]) -> int:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.max_age)
+        stmt = insert(WebSession).values(id=sid, data=data, version=1, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WebSession.id],
+            set_={
+                "data": stmt.excluded.data,
+                "expires_at": stmt.excluded.expires_at,
+                "version": WebSession.version + 1,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        ).returning(WebSession.version)
+        async with self.engine.begin() as conn:
+            version = int((await conn.execute(stmt)).scalar_one())
+        self._remember(sid, version, dict(data))
+        return version
+
+    async def delete(self, sid: str) -> None:
+        self._lru.pop(sid, None)
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(WebSession).where(WebSession.id == sid))
+
+    async def purge_expired(self) -> int:
+        async with self.engine.begin() as conn:
+            res = await conn.execute(
+                delete(WebSession).where(WebSession.expires_at <= datetime.now(timezone.utc))
+            )
+        return int(res.rowcount or 0)
+
+
+def _parse_cookie(raw: str | None) -> tuple[str | None, int]:
+    # формат: "<sid>.<version>"; всё кривое — как будто cookie нет
+    if not raw or "." not in raw:
+        return None, 0
+    sid, _, version = raw.rpartition(".")
+    if not sid or len(sid) > 64 or not version.isdigit():
+        return None, 0
+    return sid, int(version)
+
+
+class LazySession(MutableMapping[str, Any]):
+    """
+    request.session серверного бэкенда. Синхронный request.session не может сходить в БД,
+    поэтому данные подгружает load_session — зависимость роутеров, которые сессией
+    пользуются. Эндпоинты без неё не платят ни LRU, ни SELECT; обращение к сессии
+    без load_session — ошибка, а не тихая пустая сессия, которая затёрла бы сохранённую.
+    """
+
+    def __init__(self, store: SessionStore, sid: str | None, version: int) -> None:
+        self.store = store
+        self.sid = sid
+        self.version = version
+        self.loaded = sid is None
+        self.rotate = False
+        self.initial: dict[str, Any] = {}
+        self._data: dict[str, Any] = {}
+
+    async def load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        cached = self.store.get_cached(self.sid, self.version)
+        if cached is None:
+            loaded = await self.store.load(self.sid)
+            if loaded is None:
+                self.sid = None  # протухла/удалена — выдадим новую при первой записи
+                return
+            self.version, cached = loaded
+        self.initial = cached
+        self._data = dict(cached)
+
+    def _check(self) -> dict[str, Any]:
+        if not self.loaded:
+            raise RuntimeError("Session is not loaded: add Depends(load_session) to the router")
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._check()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._check()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._check()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._check())
+
+    def __len__(self) -> int:
+        return len(self._check())
+
+    @property
+    def changed(self) -> bool:
+        return self.loaded and (self.rotate or self._data != self.initial)
+
+
+async def load_session(request: Request) -> None:
+    """Depends для роутеров, читающих request.session. С cookie-бэкендом — no-op."""
+    session = request.scope.get("session")
+    if isinstance(session, LazySession):
+        await session.load()
+
+
+def rotate_session(request: Request) -> None:
+    """
+    Новый sid при смене привилегий (вход в админку): id, подсунутый до логина
+    (session fixation), перестаёт что-либо значить. Подписанной cookie это не нужно —
+    её значение и так меняется вместе с содержимым.
+    """
+    session = request.scope.get("session")
+    if isinstance(session, LazySession):
+        session.rotate = True
+
+
+class ServerSessionMiddleware:
+    """
+    Замена SessionMiddleware: в cookie только непрозрачный id + версия,
+    без подписи и без пересериализации на каждый ответ. Cookie ставится
+    только когда сессия реально поменялась.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        store: SessionStore,
+        session_cookie: str,
+        same_site: str = "lax",
+        https_only: bool = False,
+        skip_prefixes: tuple[str, ...] = ("/static/", "/health"),
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.skip_prefixes = skip_prefixes
+        self.cookie_flags = f"httponly; samesite={same_site}"
+        if https_only:
+            self.cookie_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket") or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        sid, version = _parse_cookie(connection.cookies.get(self.session_cookie))
+        # без чтения: загрузит load_session, если эндпоинту сессия вообще нужна
+        session = LazySession(self.store, sid, version)
+        scope["session"] = session
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and session.changed:
+                await self._persist(session, message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _persist(self, session: LazySession, message: Message) -> None:
+        headers = MutableHeaders(scope=message)
+        sid, data = session.sid, dict(session)
+        if sid and (session.rotate or not data):
+            await self.store.delete(sid)
+            sid = None
+
+        if not data:
+            headers.append(
+                "Set-Cookie",
+                f"{self.session_cookie}=null; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.cookie_flags}",
+            )
+            return
+
+        sid = sid or secrets.token_urlsafe(32)
+        version = await self.store.save(sid, data)
+        headers.append(
+            "Set-Cookie",
+            f"{self.session_cookie}={sid}.{version}; path=/; Max-Age={self.store.max_age}; {self.cookie_flags}",
+        )
@@ -3,11 +3,45 @@ from fastapi import Request
 from pathlib import Path
 from datetime import datetime
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+from app.core.assets import static_url
+from app.core.config import settings
+from app.core.invalidation import subscribe
+from app.core.jinja_cache import FragmentCache, FragmentCacheExtension
+from app.services.images import srcset
 
 BASE_DIR = Path(__file__).resolve().parents[2]  # .../noirid
 TEMPLATES_DIR = BASE_DIR / "app" / "templates"
+BYTECODE_DIR = Path(settings.jinja_bytecode_dir) if settings.jinja_bytecode_dir else BASE_DIR / ".cache" / "jinja"
+
+fragment_cache = FragmentCache(max_entries=settings.jinja_fragment_cache_size)
+
+
+def build_environment() -> Environment:
+    # байткод на диске общий для всех воркеров: после деплоя шаблоны компилирует
+    # scripts/compile_templates.py (или первый воркер), остальные только читают .cache
+    BYTECODE_DIR.mkdir(parents=True, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        # по расширению: .txt (текстовые письма) не экранируем
+        autoescape=select_autoescape(),
+        bytecode_cache=FileSystemBytecodeCache(str(BYTECODE_DIR), pattern="noirid-%s.cache"),
+        # в проде шаблоны не меняются без рестарта — не stat'им файлы на каждый рендер
+        auto_reload=settings.env == "dev",
+        cache_size=-1,
+        extensions=[FragmentCacheExtension],
+    )
+    env.fragment_cache = fragment_cache
+    return env
+
+
+templates = Jinja2Templates(env=build_environment())
+templates.env.globals["static_url"] = static_url
+templates.env.globals["srcset"] = srcset
 
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+# фрагменты с товарами/вариантами устаревают вместе с каталогом
+subscribe("catalog", fragment_cache.clear)
 
 
 def inject_common_vars(request: Request):
@@ -16,4 +50,4 @@ def inject_common_vars(request: Request):
     }
 
 # Просто добавляем функцию в список процессоров
-templates.context_processors.append(inject_common_vars)
\ No newline at end of file
+templates.context_processors.append(inject_common_vars)
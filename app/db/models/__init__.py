@@ -1,10 +1,16 @@
 from app.db.models.product import Product, Variant
 from app.db.models.content import ContentBlock
-from app.db.models.order import Order, OrderItem
+from app.db.models.order import Order, OrderArchive, OrderItem
 from app.db.models.payment import Payment
 from app.db.models.user import User
 from app.db.models.support import SupportQuestion
 from app.db.models.subscription import EmailSubscription
+from app.db.models.web_session import WebSession
+from app.db.models.idempotency import IdempotencyKey
+from app.db.models.media import MediaAsset
+from app.db.models.job import Job
+from app.db.models.email_outbox import EmailOutbox
+from app.db.models.webhook_event import WebhookEvent
 
 __all__ = [
     "Product",
@@ -12,8 +18,15 @@ __all__ = [
     "ContentBlock",
     "Order",
     "OrderItem",
+    "OrderArchive",
     "Payment",
     "User",
     "SupportQuestion",
-    "EmailSubscription"
+    "EmailSubscription",
+    "WebSession",
+    "IdempotencyKey",
+    "MediaAsset",
+    "Job",
+    "EmailOutbox",
+    "WebhookEvent",
 ]
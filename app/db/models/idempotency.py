@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, Integer, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # scope — имя эндпоинта и id клиента из сессии ("cart.add:<client>", ...)
+    scope: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)
+
+    # sha256 от method + path + body: тот же ключ с другим телом — ошибка клиента
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False, default=200)
+    response_body: Mapped[Any] = mapped_column(JSONB, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+MEDIA_URL_PREFIX = "/static/images/"
+
+
+class MediaAsset(Base):
+    """Индекс медиатеки (static/images): файлы и папки, чтобы админка не ходила по диску.
+
+    Листинг папки — выборка по (folder, kind), без LIKE по префиксу пути.
+    """
+
+    __tablename__ = "media_assets"
+    __table_args__ = (
+        Index("ix_media_assets_folder_kind", "folder", "kind"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # путь относительно static/images, posix: "products/noir/front.webp"
+    path: Mapped[str] = mapped_column(String(512), unique=True, nullable=False)
+    folder: Mapped[str] = mapped_column(String(512), nullable=False, default="")
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    kind: Mapped[str] = mapped_column(String(8), nullable=False, default="file")  # file | folder
+
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    format: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    @property
+    def url(self) -> str:
+        return f"{MEDIA_URL_PREFIX}{self.path}"
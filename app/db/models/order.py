@@ -5,7 +5,7 @@ from decimal import Decimal
 from typing import Any
 from uuid import uuid4
 from sqlalchemy import Text
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, Numeric, String, func, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -34,8 +34,23 @@ def generate_smart_order_number():
     return f"NRD-{x1}{year}{x2}{month}{x3}"
 
 
+# Предикаты воркеров. Один и тот же текст — в частичном индексе и в запросе:
+# литералы вместо bind-параметров, иначе планировщик не докажет, что индекс подходит.
+POST_PAYMENT_PENDING_SQL = (
+    "status = 'paid' AND (need_post_process OR confirmation_email_sent_at IS NULL"
+    " OR (tracking_number IS NOT NULL AND tracking_email_sent_at IS NULL))"
+)
+STALE_CANDIDATE_SQL = "status IN ('draft', 'pending_payment')"
+
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # заказы с незавершённой пост-обработкой — единицы среди всех оплаченных
+        Index("ix_orders_post_payment_pending", "created_at", postgresql_where=text(POST_PAYMENT_PENDING_SQL)),
+        # кандидаты в архив: брошенные корзины и неоплаченные
+        Index("ix_orders_stale_created_at", "created_at", postgresql_where=text(STALE_CANDIDATE_SQL)),
+    )
 
     id: Mapped[str] = mapped_column(
         UUID(as_uuid=False),
@@ -130,3 +145,24 @@ class OrderItem(Base):
     personalization_json: Mapped[dict[str, Any]] = mapped_column(JSONB, default=dict)
 
     order: Mapped["Order"] = relationship(back_populates="items")
+
+
+class OrderArchive(Base):
+    """
+    Холодное хранилище брошенных заказов (status='archived'), секционировано по месяцам created_at.
+    Заказ переезжает целиком одним JSONB-документом (order + items + payments):
+    схема горячих таблиц может меняться без миграции архива.
+    Секции orders_archive_yYYYYmMM создаёт/удаляет app/workers/archive_orders.py.
+    """
+
+    __tablename__ = "orders_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    # ключ секционирования обязан входить в PK
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+
+    order_number: Mapped[str | None] = mapped_column(String(16), nullable=True, index=True)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    data: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
@@ -24,6 +24,10 @@ from app.db.base import Base
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # обратный индекс медиа -> товары: images @> '[{"url": ...}]'
+        Index("ix_products_images", "images", postgresql_using="gin", postgresql_ops={"images": "jsonb_path_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     slug: Mapped[str] = mapped_column(String(120), unique=True, index=True)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class WebhookEvent(Base):
+    """
+    Журнал входящих уведомлений платёжек. payload не меняется после вставки —
+    обновляются только поля обработки, поэтому любое событие можно переприменить.
+    """
+
+    __tablename__ = "webhook_events"
+    __table_args__ = (
+        # ретрай того же уведомления упирается в ключ и не плодит строк
+        UniqueConstraint("provider", "event_key", name="uq_webhook_events_provider_event_key"),
+        # порядок событий заказа; по нему же берётся следующий seq (max + 1)
+        UniqueConstraint("order_ref", "seq", name="uq_webhook_events_order_ref_seq"),
+        # необработанные события заказа по порядку — то, что читает консьюмер
+        Index(
+            "ix_webhook_events_pending",
+            "order_ref",
+            "seq",
+            postgresql_where=text("status = 'received'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+    provider: Mapped[str] = mapped_column(String(32), nullable=False)
+    # натуральный ключ события у провайдера (для 2CO — хеш полей IPN без даты и подписи)
+    event_key: Mapped[str] = mapped_column(String(128), nullable=False)
+    # order_number (NRD-...), у 2CO без REFNOEXT — номер заказа в 2CO; общий для всех провайдеров
+    order_ref: Mapped[str] = mapped_column(String(64), nullable=False)
+    # 1, 2, 3, ... в пределах order_ref — в этом порядке события применяются
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+
+    # received | applied
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="received")
+
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
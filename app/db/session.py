@@ -1,24 +1,262 @@
 from __future__ import annotations
 
+import logging
+import time
 from collections.abc import AsyncGenerator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TypeVar
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import Executable
 
 from app.core.config import settings
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-    pool_pre_ping=True,
-)
+log = logging.getLogger("db")
+
+STATEMENT_TIMEOUT_KEY = "statement_timeout_ms"
+REPLICA_OPTION = "use_replica"
+WROTE_KEY = "wrote"
+
+# Классы роутов -> statement_timeout. "pages" — дефолт движка (server_settings),
+# остальным ставим SET LOCAL в начале транзакции.
+STATEMENT_TIMEOUTS_MS = {
+    "pages": settings.db_statement_timeout_ms,
+    "admin": settings.db_admin_statement_timeout_ms,
+    "webhooks": settings.db_webhook_statement_timeout_ms,
+    "workers": settings.db_worker_statement_timeout_ms,
+}
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    slow_waits: int = 0
+    timeouts: int = 0
+    disconnects: int = 0
+    connects: int = 0
+    total_connect_ms: float = 0.0
+    max_connect_ms: float = 0.0
+    stale_pings: int = 0
+    stale_dropped: int = 0
+
+    def record_wait(self, wait_ms: float) -> None:
+        self.checkouts += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        if wait_ms >= settings.db_pool_wait_warn_ms:
+            self.slow_waits += 1
+            log.warning("DB pool wait %.1f ms | %s", wait_ms, engine.pool.status())
+
+    def record_connect(self, connect_ms: float) -> None:
+        self.connects += 1
+        self.total_connect_ms += connect_ms
+        self.max_connect_ms = max(self.max_connect_ms, connect_ms)
+
+    def snapshot(self) -> dict[str, float | int]:
+        return {
+            "checkouts": self.checkouts,
+            "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "slow_waits": self.slow_waits,
+            "timeouts": self.timeouts,
+            "disconnects": self.disconnects,
+            "connects": self.connects,
+            "avg_connect_ms": round(self.total_connect_ms / self.connects, 3) if self.connects else 0.0,
+            "max_connect_ms": round(self.max_connect_ms, 3),
+            "stale_pings": self.stale_pings,
+            "stale_dropped": self.stale_dropped,
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+CHECKED_IN_AT_KEY = "checked_in_at"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Обычный async-пул, но меряет, сколько запрос ждал свободное соединение.
+
+    Ожидание в очереди и открытие нового соединения считаются отдельно:
+    медленный connect — это не исчерпание пула.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        started_wall = time.time()
+        try:
+            record = super()._do_get()
+        except sa_exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            pool_metrics.record_wait((time.perf_counter() - started) * 1000)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # QueuePool открывает новое соединение, только когда есть свободный
+        # overflow-слот, т.е. без ожидания в очереди — всё время ушло на connect
+        if record.starttime >= started_wall:
+            pool_metrics.record_connect(elapsed_ms)
+            pool_metrics.record_wait(0.0)
+        else:
+            pool_metrics.record_wait(elapsed_ms)
+        return record
+
+
+def _remember_checkin(dbapi_connection, connection_record) -> None:
+    connection_record.info[CHECKED_IN_AT_KEY] = time.monotonic()
+
+
+def _ping_stale(dbapi_connection, connection_record, connection_proxy) -> None:
+    # Полный pre-ping выключен, но соединение, пролежавшее в пуле дольше
+    # db_pool_idle_ping_seconds, проверяем: его мог убить PgBouncer/NAT/рестарт
+    # Postgres. DisconnectionError заставляет пул выбросить запись и повторить
+    # checkout на свежем соединении — запрос ошибку не увидит.
+    idle_after = settings.db_pool_idle_ping_seconds
+    if settings.db_pool_pre_ping or idle_after <= 0 or dbapi_connection is None:
+        return
+    checked_in_at = connection_record.info.pop(CHECKED_IN_AT_KEY, None)
+    if checked_in_at is None or time.monotonic() - checked_in_at < idle_after:
+        return
+    pool_metrics.stale_pings += 1
+    try:
+        dbapi_connection.ping()
+    except Exception as exc:
+        pool_metrics.stale_dropped += 1
+        log.warning("DB idle connection is dead, reconnecting: %s", exc)
+        raise sa_exc.DisconnectionError() from exc
+
+
+def _make_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        # pre-ping = лишний round trip на каждый checkout; по умолчанию выключен,
+        # пингуем только долго простоявшие соединения (см. _ping_stale) + pool_recycle
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "server_settings": {
+                "application_name": settings.app_name,
+                "statement_timeout": str(settings.db_statement_timeout_ms),
+            },
+        },
+    )
+
+
+def _on_db_error(context) -> None:
+    # Только метрика и лог: инвалидацию пула при disconnect SQLAlchemy делает
+    # сама, а упавший запрос не повторяется — это задача вызывающего кода
+    if context.is_disconnect:
+        pool_metrics.disconnects += 1
+        log.warning("DB disconnect detected: %s", context.original_exception)
+
+
+def _instrument(async_engine: AsyncEngine) -> None:
+    event.listen(async_engine.sync_engine, "handle_error", _on_db_error)
+    event.listen(async_engine.sync_engine.pool, "checkin", _remember_checkin)
+    event.listen(async_engine.sync_engine.pool, "checkout", _ping_stale)
+
+
+engine = _make_engine(settings.database_url)
+_instrument(engine)
+
+# Реплика опциональна: без DATABASE_REPLICA_URL всё идёт в primary, как раньше
+replica_engine: AsyncEngine | None = None
+if settings.database_replica_url:
+    replica_engine = _make_engine(settings.database_replica_url)
+    _instrument(replica_engine)
+
+
+# Флаг «этот запрос писал в БД» на время HTTP-запроса. Кладём изменяемый dict,
+# а не bool: сессия может жить в скопированном контексте (Depends), а мутация
+# словаря видна middleware, которая его создала.
+request_db_state: ContextVar[dict[str, bool] | None] = ContextVar("request_db_state", default=None)
+
+Stmt = TypeVar("Stmt", bound=Executable)
+
+
+def on_replica(stmt: Stmt) -> Stmt:
+    """Помечает read-only запрос: его можно отправить на реплику, если она есть и сессия ещё не писала."""
+    return stmt.execution_options(**{REPLICA_OPTION: True})
+
+
+class RuntimeSession(Session):
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if replica_engine is not None and clause is not None and self._can_use_replica(clause):
+            return replica_engine.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def _can_use_replica(self, clause) -> bool:
+        if not clause.get_execution_options().get(REPLICA_OPTION):
+            return False
+        # свежесть: после записи (в этой сессии или недавно этим клиентом)
+        # читаем только с primary, иначе рискуем не увидеть свою же правку
+        if self._flushing or self.info.get(WROTE_KEY):
+            return False
+        state = request_db_state.get()
+        return not (state and (state.get("sticky") or state.get("wrote")))
+
+
+@event.listens_for(RuntimeSession, "after_flush")
+def _mark_wrote(session: Session, flush_context) -> None:
+    session.info[WROTE_KEY] = True
+    state = request_db_state.get()
+    if state is not None:
+        state["wrote"] = True
+
+
+@event.listens_for(RuntimeSession, "do_orm_execute")
+def _mark_dml(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        _mark_wrote(orm_execute_state.session, None)
+
+
+@event.listens_for(RuntimeSession, "after_begin")
+def _apply_statement_timeout(session: Session, transaction, connection) -> None:
+    timeout = session.info.get(STATEMENT_TIMEOUT_KEY)
+    if timeout is None or timeout == settings.db_statement_timeout_ms:
+        return
+    # SET LOCAL живёт до конца транзакции и не протекает в пул
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=RuntimeSession,
     expire_on_commit=False,
 )
 
 
+def session_for(route_class: str) -> AsyncSession:
+    return AsyncSessionLocal(info={STATEMENT_TIMEOUT_KEY: STATEMENT_TIMEOUTS_MS[route_class]})
+
+
+def worker_session() -> AsyncSession:
+    return session_for("workers")
+
+
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def get_admin_session() -> AsyncGenerator[AsyncSession, None]:
+    async with session_for("admin") as session:
+        yield session
+
+
+async def get_webhook_session() -> AsyncGenerator[AsyncSession, None]:
+    async with session_for("webhooks") as session:
+        yield session
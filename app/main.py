@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.staticfiles import StaticFiles
 from starlette.responses import JSONResponse
 
+from app.core.assets import PrecompressedStaticFiles
 from app.core.config import settings
+from app.core.http import http_clients
+from app.core.invalidation import InvalidationListener
 from app.core.logger_setup import setup_logging
+from app.core.replica import ReplicaStickinessMiddleware
+from app.core.sessions import ServerSessionMiddleware, SessionStore
 from app.core.templates import templates
+from app.db.session import AsyncSessionLocal, engine, pool_metrics, replica_engine
+from app.services.promotions import load_promotions
 
 from app.routers.pages.home import router as home_router
 from app.routers.pages.catalog import router as catalog_router
@@ -26,29 +34,70 @@ from app.routers.api.orders import router as orders_api_router
 from app.routers.pages.order_status import router as order_status_page_router
 from app.routers.pages.info import router as info_page_router
 from app.routers.pages.admin import router as admin_router
+from app.routers.pages.images import router as images_router
 from app.routers.api import mockups
 from app.routers.api.marketing import router as marketing_router
 from app.routers.api.payments_paypal import router as paypal_router
+from app.routers.api.catalog import router as catalog_api_router
 
 
 
 
 setup_logging(settings.env)
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # план акций компилируем один раз на старте, дальше — только по правкам из админки
+    try:
+        async with AsyncSessionLocal() as session:
+            await load_promotions(session)
+    except Exception:
+        logging.getLogger("promotions").exception("Failed to load promotions, using defaults")
+
+    # кэши каталога/акций сбрасываются по NOTIFY от админки любого воркера
+    listener = InvalidationListener()
+    listener.start()
+    # общие пулы исходящих соединений (Mailgun, PayPal) на весь процесс
+    http_clients.open()
+    try:
+        yield
+    finally:
+        await listener.stop()
+        await http_clients.aclose()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 script_dir = os.path.dirname(__file__)
 st_abs_file_path = os.path.join(script_dir, "static/")
 
-app.mount("/static", StaticFiles(directory=st_abs_file_path), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=st_abs_file_path), name="static")
+
+if settings.session_backend == "server":
+    app.add_middleware(
+        ServerSessionMiddleware,
+        store=SessionStore(engine, max_entries=settings.session_lru_size, max_age=settings.session_max_age),
+        session_cookie=settings.session_cookie_name,
+        same_site="lax",
+        https_only=(settings.env != "dev"),
+    )
+else:
+    app.add_middleware(
+        SessionMiddleware,
+        secret_key=settings.secret_key,
+        session_cookie=settings.session_cookie_name,
+        max_age=settings.session_max_age,
+        same_site="lax",
+        https_only=(settings.env != "dev"),
+    )
 
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=settings.secret_key,
-    session_cookie=settings.session_cookie_name,
-    same_site="lax",
-    https_only=(settings.env != "dev"),
-)
+if replica_engine is not None:
+    app.add_middleware(
+        ReplicaStickinessMiddleware,
+        cookie_name=settings.db_replica_cookie_name,
+        sticky_seconds=settings.db_replica_sticky_seconds,
+    )
 
 app.include_router(home_router)
 app.include_router(catalog_router)
@@ -64,9 +113,11 @@ app.include_router(orders_api_router)
 app.include_router(order_status_page_router)
 app.include_router(info_page_router)
 app.include_router(admin_router)
+app.include_router(images_router)
 app.include_router(mockups.router)
 app.include_router(marketing_router)
 app.include_router(paypal_router)
+app.include_router(catalog_api_router)
 
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
@@ -89,3 +140,12 @@ async def not_found_handler(request: Request, exc: StarletteHTTPException):
 @app.get("/health", include_in_schema=False)
 async def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@app.get("/health/db", include_in_schema=False)
+async def health_db() -> dict:
+    return {
+        "pool": engine.pool.status(),
+        "replica_pool": replica_engine.pool.status() if replica_engine is not None else None,
+        "metrics": pool_metrics.snapshot(),
+    }
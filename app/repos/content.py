@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Any
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -12,3 +14,14 @@ class ContentRepo:
         stmt = select(ContentBlock).where(ContentBlock.key == key)
         res = await session.execute(stmt)
         return res.scalars().first()
+
+    @staticmethod
+    async def upsert(session: AsyncSession, key: str, payload: dict[str, Any]) -> ContentBlock:
+        block = await ContentRepo.get_by_key(session, key)
+        if block is None:
+            block = ContentBlock(key=key, payload=payload)
+            session.add(block)
+        else:
+            block.payload = payload
+        await session.flush()
+        return block
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.email_outbox import EmailOutbox
+
+
+class EmailOutboxRepo:
+    @staticmethod
+    async def add(
+        session: AsyncSession,
+        *,
+        template: str,
+        to_email: str,
+        variables: dict[str, Any],
+        dedup_key: str | None,
+    ) -> int | None:
+        res = await session.execute(
+            insert(EmailOutbox)
+            .values(
+                template=template,
+                to_email=to_email,
+                variables=variables,
+                dedup_key=dedup_key,
+                status="queued",
+                attempts=0,
+            )
+            .on_conflict_do_nothing(index_elements=[EmailOutbox.dedup_key])
+            .returning(EmailOutbox.id)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def claim(session: AsyncSession, limit: int, lease: timedelta) -> Sequence[EmailOutbox]:
+        now = func.now()
+        ready = (
+            select(EmailOutbox.id)
+            .where(
+                or_(
+                    (EmailOutbox.status == "queued") & (EmailOutbox.run_at <= now),
+                    (EmailOutbox.status == "sending") & (EmailOutbox.locked_until < now),
+                )
+            )
+            .order_by(EmailOutbox.run_at, EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ready.scalar_subquery()))
+            .values(status="sending", attempts=EmailOutbox.attempts + 1, locked_until=now + lease)
+            .returning(EmailOutbox)
+        )
+        return res.scalars().all()
+
+    @staticmethod
+    async def mark_sent(session: AsyncSession, ids: Sequence[int], provider_message_id: str | None) -> None:
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids))
+            .values(
+                status="sent",
+                locked_until=None,
+                last_error=None,
+                provider_message_id=provider_message_id,
+                sent_at=func.now(),
+            )
+        )
+
+    @staticmethod
+    async def retry(session: AsyncSession, ids: Sequence[int], *, run_at: datetime, error: str) -> None:
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids))
+            .values(status="queued", run_at=run_at, locked_until=None, last_error=error)
+        )
+
+    @staticmethod
+    async def bury(session: AsyncSession, ids: Sequence[int], *, error: str) -> None:
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids))
+            .values(status="dead", locked_until=None, last_error=error)
+        )
+
+    @staticmethod
+    async def purge_sent(session: AsyncSession, before: datetime) -> int:
+        res = await session.execute(
+            delete(EmailOutbox).where(EmailOutbox.status == "sent", EmailOutbox.sent_at < before)
+        )
+        return int(res.rowcount or 0)
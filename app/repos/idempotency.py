@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.idempotency import IdempotencyKey
+
+
+class IdempotencyRepo:
+    @staticmethod
+    async def get(session: AsyncSession, scope: str, key: str) -> IdempotencyKey | None:
+        res = await session.execute(
+            select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    def add(
+        session: AsyncSession,
+        *,
+        scope: str,
+        key: str,
+        request_hash: str,
+        status_code: int,
+        response_body: Any,
+        expires_at: datetime,
+    ) -> IdempotencyKey:
+        row = IdempotencyKey(
+            scope=scope,
+            key=key,
+            request_hash=request_hash,
+            status_code=status_code,
+            response_body=response_body,
+            expires_at=expires_at,
+        )
+        session.add(row)
+        return row
+
+    @staticmethod
+    async def purge_expired(session: AsyncSession, now: datetime) -> int:
+        res = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+        return int(res.rowcount or 0)
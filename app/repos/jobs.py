@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.job import Job
+
+
+class JobsRepo:
+    @staticmethod
+    async def add(
+        session: AsyncSession,
+        *,
+        type: str,
+        payload: dict[str, Any],
+        dedup_key: str | None,
+        run_at: datetime | None,
+        max_attempts: int,
+    ) -> int | None:
+        values: dict[str, Any] = {
+            "type": type,
+            "payload": payload,
+            "dedup_key": dedup_key,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+        }
+        if run_at is not None:
+            values["run_at"] = run_at
+        res = await session.execute(
+            insert(Job)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[Job.dedup_key])
+            .returning(Job.id)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def claim(session: AsyncSession, limit: int, lease: timedelta) -> Sequence[Job]:
+        """
+        Забирает до limit готовых задач. Зависшие running (воркер умер) подбираются
+        после истечения аренды. SKIP LOCKED — несколько консьюмеров не дерутся за строки.
+        """
+        now = func.now()
+        ready = (
+            select(Job.id)
+            .where(
+                or_(
+                    (Job.status == "queued") & (Job.run_at <= now),
+                    (Job.status == "running") & (Job.locked_until < now),
+                )
+            )
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        res = await session.execute(
+            update(Job)
+            .where(Job.id.in_(ready.scalar_subquery()))
+            .values(status="running", attempts=Job.attempts + 1, locked_until=now + lease)
+            .returning(Job)
+        )
+        return res.scalars().all()
+
+    @staticmethod
+    def _owned(job_id: int, attempts: int):
+        # владелец — тот, кто забрал задачу этой попыткой; после истечения аренды её
+        # мог перехватить другой раннер (attempts + 1), и старый уже ничего не пишет
+        return (Job.id == job_id) & (Job.status == "running") & (Job.attempts == attempts)
+
+    @staticmethod
+    async def extend(session: AsyncSession, job_id: int, attempts: int, lease: timedelta) -> bool:
+        """Heartbeat: продлевает аренду. False — задача уже не наша."""
+        res = await session.execute(
+            update(Job).where(JobsRepo._owned(job_id, attempts)).values(locked_until=func.now() + lease)
+        )
+        return bool(res.rowcount)
+
+    @staticmethod
+    async def complete(session: AsyncSession, job_id: int, attempts: int) -> bool:
+        res = await session.execute(
+            update(Job)
+            .where(JobsRepo._owned(job_id, attempts))
+            .values(status="done", locked_until=None, last_error=None, finished_at=func.now())
+        )
+        return bool(res.rowcount)
+
+    @staticmethod
+    async def retry(session: AsyncSession, job_id: int, attempts: int, *, run_at: datetime, error: str) -> bool:
+        res = await session.execute(
+            update(Job)
+            .where(JobsRepo._owned(job_id, attempts))
+            .values(status="queued", run_at=run_at, locked_until=None, last_error=error)
+        )
+        return bool(res.rowcount)
+
+    @staticmethod
+    async def bury(session: AsyncSession, job_id: int, attempts: int, *, error: str) -> bool:
+        res = await session.execute(
+            update(Job)
+            .where(JobsRepo._owned(job_id, attempts))
+            .values(status="dead", locked_until=None, last_error=error, finished_at=func.now())
+        )
+        return bool(res.rowcount)
+
+    @staticmethod
+    async def purge_done(session: AsyncSession, before: datetime) -> int:
+        # dead не трогаем — их разбирают руками
+        res = await session.execute(delete(Job).where(Job.status == "done", Job.finished_at < before))
+        return int(res.rowcount or 0)
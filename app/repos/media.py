@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from posixpath import dirname, basename
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.media import MediaAsset
+from app.db.models.product import Product
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _split(path: str) -> tuple[str, str]:
+    return dirname(path), basename(path)
+
+
+class MediaRepo:
+    @staticmethod
+    async def list_files(session: AsyncSession, folder: str, query: str = "") -> Sequence[MediaAsset]:
+        stmt = select(MediaAsset).where(MediaAsset.folder == folder, MediaAsset.kind == "file")
+        query = query.strip()
+        if query:
+            pattern = f"%{_like_escape(query)}%"
+            stmt = stmt.where(or_(MediaAsset.name.ilike(pattern), MediaAsset.path.ilike(pattern)))
+        res = await session.execute(stmt.order_by(func.lower(MediaAsset.name)))
+        return res.scalars().all()
+
+    @staticmethod
+    async def list_subfolders(session: AsyncSession, folder: str) -> list[str]:
+        res = await session.execute(
+            select(MediaAsset.path)
+            .where(MediaAsset.folder == folder, MediaAsset.kind == "folder")
+            .order_by(func.lower(MediaAsset.name))
+        )
+        return list(res.scalars().all())
+
+    @staticmethod
+    async def list_all_folders(session: AsyncSession) -> list[str]:
+        res = await session.execute(
+            select(MediaAsset.path).where(MediaAsset.kind == "folder").order_by(MediaAsset.path)
+        )
+        return list(res.scalars().all())
+
+    @staticmethod
+    async def folder_exists(session: AsyncSession, folder: str) -> bool:
+        if not folder:
+            return True
+        res = await session.execute(
+            select(MediaAsset.id).where(MediaAsset.path == folder, MediaAsset.kind == "folder")
+        )
+        return res.first() is not None
+
+    @staticmethod
+    async def has_children(session: AsyncSession, folder: str) -> bool:
+        res = await session.execute(select(MediaAsset.id).where(MediaAsset.folder == folder).limit(1))
+        return res.first() is not None
+
+    @staticmethod
+    async def ensure_folder(session: AsyncSession, folder: str) -> None:
+        """Папка и все её предки; уже существующие строки не трогаем."""
+        rows = []
+        while folder:
+            parent, name = _split(folder)
+            rows.append({"path": folder, "folder": parent, "name": name, "kind": "folder"})
+            folder = parent
+        if rows:
+            await session.execute(
+                insert(MediaAsset).values(rows).on_conflict_do_nothing(index_elements=[MediaAsset.path])
+            )
+
+    @staticmethod
+    async def upsert_file(
+        session: AsyncSession,
+        path: str,
+        *,
+        size_bytes: int | None,
+        width: int | None,
+        height: int | None,
+        format: str | None,
+        sha256: str | None,
+    ) -> None:
+        parent, name = _split(path)
+        await MediaRepo.ensure_folder(session, parent)
+        values = {
+            "size_bytes": size_bytes,
+            "width": width,
+            "height": height,
+            "format": format,
+            "sha256": sha256,
+        }
+        stmt = insert(MediaAsset).values(path=path, folder=parent, name=name, kind="file", **values)
+        await session.execute(stmt.on_conflict_do_update(index_elements=[MediaAsset.path], set_=values))
+
+    @staticmethod
+    async def delete_path(session: AsyncSession, path: str) -> str | None:
+        """Удаляет запись и возвращает sha256 — чтобы отпустить blob."""
+        res = await session.execute(
+            delete(MediaAsset).where(MediaAsset.path == path).returning(MediaAsset.sha256)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def move_file(session: AsyncSession, source: str, destination: str) -> None:
+        parent, name = _split(destination)
+        await MediaRepo.ensure_folder(session, parent)
+        # если в destination уже что-то было проиндексировано — файл на диске перезаписан
+        await session.execute(delete(MediaAsset).where(MediaAsset.path == destination))
+        await session.execute(
+            update(MediaAsset)
+            .where(MediaAsset.path == source)
+            .values(path=destination, folder=parent, name=name)
+        )
+
+    @staticmethod
+    async def products_referencing(session: AsyncSession, url: str) -> Sequence[Product]:
+        # images @> '[{"url": ...}]' — идёт по GIN-индексу ix_products_images
+        res = await session.execute(select(Product).where(Product.images.contains([{"url": url}])))
+        return res.scalars().all()
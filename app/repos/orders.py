@@ -5,6 +5,7 @@ from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.order import Order
+from app.db.session import on_replica
 
 
 class OrdersRepo:
@@ -20,7 +21,7 @@ class OrdersRepo:
     async def list_recent(session: AsyncSession, limit: int = 10, status: str | None = None) -> list[Order]:
         stmt = select(Order).order_by(Order.created_at.desc()).limit(limit).where(Order.status != "archived")
         stmt = OrdersRepo._apply_status_filter(stmt, status)
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return list(res.scalars().all())
 
 
@@ -33,14 +34,14 @@ class OrdersRepo:
     ) -> list[Order]:
         stmt = select(Order).order_by(Order.created_at.desc()).offset(offset).limit(limit).where(Order.status != "archived")
         stmt = OrdersRepo._apply_status_filter(stmt, status)
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return list(res.scalars().all())
 
     @staticmethod
     async def count(session: AsyncSession, status: str | None = None) -> int:
         stmt = select(func.count()).select_from(Order)
         stmt = OrdersRepo._apply_status_filter(stmt, status)
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return int(res.scalar_one())
 
     @staticmethod
@@ -4,6 +4,7 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.payment import Payment
+from app.db.session import on_replica
 
 
 class PaymentRepo:
@@ -22,12 +23,12 @@ class PaymentRepo:
     @staticmethod
     async def list_paginated(session: AsyncSession, offset: int, limit: int) -> list[Payment]:
         stmt = select(Payment).order_by(Payment.id.desc()).offset(offset).limit(limit)
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return list(res.scalars().all())
 
     @staticmethod
     async def count(session: AsyncSession) -> int:
-        res = await session.execute(select(func.count()).select_from(Payment))
+        res = await session.execute(on_replica(select(func.count()).select_from(Payment)))
         return int(res.scalar_one())
 
     @staticmethod
@@ -3,19 +3,20 @@ from __future__ import annotations
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.product import Product
+from app.db.session import on_replica
 
 
 class ProductsRepo:
     @staticmethod
     async def list_active(session: AsyncSession) -> list[Product]:
         stmt = select(Product).where(Product.is_active.is_(True)).order_by(Product.id.desc())
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return list(res.scalars().unique().all())
 
     @staticmethod
     async def get_by_slug(session: AsyncSession, slug: str) -> Product | None:
         stmt = select(Product).where(Product.slug == slug, Product.is_active.is_(True))
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return res.scalars().unique().first()
 
     @staticmethod
@@ -23,7 +24,7 @@ class ProductsRepo:
         if not slugs:
             return []
         stmt = select(Product).where(Product.slug.in_(slugs), Product.is_active.is_(True))
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         items = list(res.scalars().unique().all())
 
         # сохранить порядок как в slugs
@@ -4,6 +4,7 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.support import SupportQuestion
+from app.db.session import on_replica
 
 
 class SupportRepo:
@@ -28,11 +29,11 @@ class SupportRepo:
 
     @staticmethod
     async def count(session: AsyncSession) -> int:
-        res = await session.execute(select(func.count()).select_from(SupportQuestion))
+        res = await session.execute(on_replica(select(func.count()).select_from(SupportQuestion)))
         return int(res.scalar() or 0)
 
     @staticmethod
     async def list_paginated(session: AsyncSession, *, offset: int, limit: int) -> list[SupportQuestion]:
         stmt = select(SupportQuestion).order_by(SupportQuestion.created_at.desc()).offset(offset).limit(limit)
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return list(res.scalars())
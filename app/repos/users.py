@@ -4,6 +4,7 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.user import User
+from app.db.session import on_replica
 
 
 class UsersRepo:
@@ -20,11 +21,11 @@ class UsersRepo:
     @staticmethod
     async def list_paginated(session: AsyncSession, offset: int, limit: int) -> list[User]:
         res = await session.execute(
-            select(User).order_by(User.id.asc()).offset(offset).limit(limit)
+            on_replica(select(User).order_by(User.id.asc()).offset(offset).limit(limit))
         )
         return list(res.scalars().all())
 
     @staticmethod
     async def count(session: AsyncSession) -> int:
-        res = await session.execute(select(func.count()).select_from(User))
+        res = await session.execute(on_replica(select(func.count()).select_from(User)))
         return int(res.scalar_one())
@@ -4,6 +4,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models.product import Variant
+from app.db.session import on_replica
 
 
 class VariantsRepo:
@@ -14,5 +15,5 @@ class VariantsRepo:
             .where(Variant.is_active.is_(True))
             .order_by(Variant.device_brand.asc(), Variant.device_model.asc())
         )
-        res = await session.execute(stmt)
+        res = await session.execute(on_replica(stmt))
         return list(res.scalars().unique().all())
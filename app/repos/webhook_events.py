@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.webhook_event import WebhookEvent
+
+
+class WebhookEventsRepo:
+    @staticmethod
+    async def add(
+        session: AsyncSession,
+        *,
+        provider: str,
+        event_key: str,
+        order_ref: str,
+        payload: dict[str, Any],
+    ) -> int | None:
+        """
+        id нового события или None, если такое уже записано (ретрай провайдера) —
+        одна проба уникального индекса. seq = max + 1 по заказу: вызывать под lock_order.
+        """
+        next_seq = (
+            select(func.coalesce(func.max(WebhookEvent.seq), 0) + 1)
+            .where(WebhookEvent.order_ref == order_ref)
+            .scalar_subquery()
+        )
+        res = await session.execute(
+            insert(WebhookEvent)
+            .values(
+                provider=provider,
+                event_key=event_key,
+                order_ref=order_ref,
+                seq=next_seq,
+                payload=payload,
+                status="received",
+            )
+            .on_conflict_do_nothing(constraint="uq_webhook_events_provider_event_key")
+            .returning(WebhookEvent.id)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def lock_order(session: AsyncSession, order_ref: str) -> None:
+        """Транзакционный advisory lock заказа: нумерация и применение его событий — строго по одному."""
+        await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"webhooks:{order_ref}"))))
+
+    @staticmethod
+    async def pending_for_order(session: AsyncSession, order_ref: str) -> Sequence[WebhookEvent]:
+        stmt = (
+            select(WebhookEvent)
+            .where(WebhookEvent.order_ref == order_ref, WebhookEvent.status == "received")
+            .order_by(WebhookEvent.seq)
+        )
+        res = await session.execute(stmt)
+        return res.scalars().all()
+
+    @staticmethod
+    async def mark_applied(session: AsyncSession, ids: Sequence[int]) -> None:
+        await session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(ids))
+            .values(status="applied", processed_at=func.now())
+        )
+
+    @staticmethod
+    async def exists_for_order(session: AsyncSession, order_ref: str) -> bool:
+        stmt = select(select(WebhookEvent.id).where(WebhookEvent.order_ref == order_ref).exists())
+        return bool((await session.execute(stmt)).scalar_one())
+
+    @staticmethod
+    async def log_started_at(session: AsyncSession) -> datetime | None:
+        """Время самого первого события (по PK, без скана): с него журнал полный."""
+        stmt = select(WebhookEvent.received_at).order_by(WebhookEvent.id).limit(1)
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+    @staticmethod
+    async def pending_refs(session: AsyncSession) -> list[str]:
+        stmt = select(WebhookEvent.order_ref).where(WebhookEvent.status == "received").distinct()
+        res = await session.execute(stmt)
+        return list(res.scalars().all())
+
+    @staticmethod
+    async def reset(session: AsyncSession, order_ref: str) -> int:
+        """Вернуть события заказа в received — для повторного применения."""
+        res = await session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.order_ref == order_ref)
+            .values(status="received", processed_at=None)
+        )
+        return int(res.rowcount or 0)
@@ -5,14 +5,16 @@ from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.sessions import load_session
 from app.db.session import get_async_session
 from app.repos.cart import CartRepo
 from app.repos.checkout import CheckoutRepo
 from app.schemas.cart import CartAddIn, CartOut, CartRemoveIn, CartUpdateQtyIn
 from app.services.cart import CartService
+from app.services.idempotency import IdempotencyGuard, idempotency
 from app.services.pricing import PricingService
 
-router = APIRouter(prefix="/api/cart", tags=["cart"])
+router = APIRouter(prefix="/api/cart", tags=["cart"], dependencies=[Depends(load_session)])
 
 SESSION_ORDER_KEY = "order_id"
 
@@ -114,7 +116,12 @@ async def add_to_cart(
     payload: CartAddIn,
     request: Request,
     session: AsyncSession = Depends(get_async_session),
+    idem: IdempotencyGuard = Depends(idempotency("cart.add")),
 ):
+    replayed = await idem.replay(session)
+    if replayed:
+        return replayed
+
     order = await _ensure_draft_order(request, session, create_if_missing=True)
     if not order:
         raise HTTPException(status_code=400, detail="Cart is empty")
@@ -176,9 +183,10 @@ async def add_to_cart(
 
     # await session.refresh(order)  # чтобы items подхватились
     CartService.recalc(order)
-    await session.commit()
-
-    return _cart_to_out(order)
+    await session.flush()
+    out = _cart_to_out(order)
+    replayed = await idem.commit(session, out)
+    return replayed or out
 
 
 @router.post("/update-qty", response_model=CartOut)
@@ -186,7 +194,12 @@ async def update_qty(
     payload: CartUpdateQtyIn,
     request: Request,
     session: AsyncSession = Depends(get_async_session),
+    idem: IdempotencyGuard = Depends(idempotency("cart.update_qty")),
 ):
+    replayed = await idem.replay(session)
+    if replayed:
+        return replayed
+
     order = await _load_order_any(request, session)
     if not order:
         raise HTTPException(status_code=404, detail="Cart is empty")
@@ -225,9 +238,10 @@ async def update_qty(
             raise HTTPException(status_code=404, detail="Item not found")
 
     CartService.recalc(order)
-    await session.commit()
-
-    return _cart_to_out(order)
+    await session.flush()
+    out = _cart_to_out(order)
+    replayed = await idem.commit(session, out)
+    return replayed or out
 
 
 @router.post("/remove", response_model=CartOut)
@@ -235,7 +249,12 @@ async def remove_item(
     payload: CartRemoveIn,
     request: Request,
     session: AsyncSession = Depends(get_async_session),
+    idem: IdempotencyGuard = Depends(idempotency("cart.remove")),
 ):
+    replayed = await idem.replay(session)
+    if replayed:
+        return replayed
+
     order = await _load_order_any(request, session)
     if not order:
         raise HTTPException(status_code=404, detail="Cart is empty")
@@ -276,9 +295,10 @@ async def remove_item(
         raise HTTPException(status_code=404, detail="Cart is empty")
 
     CartService.recalc(order)
-    await session.commit()
-
-    return _cart_to_out(order)
+    await session.flush()
+    out = _cart_to_out(order)
+    replayed = await idem.commit(session, out)
+    return replayed or out
 
 @router.post("/clear")
 async def clear_cart(request: Request):
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request
+from starlette.responses import Response
+
+from app.services.catalog_cache import catalog_cache
+
+router = APIRouter(prefix="/api", tags=["catalog"])
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=60"
+
+
+@router.get("/variants.json")
+async def variants_json(request: Request, v: str | None = None):
+    """
+    Payload пикера моделей. Страница товара ссылается на ?v=<hash> — такой URL
+    никогда не меняет содержимое и кэшируется навсегда; без/со старым hash
+    отдаём актуальные данные с коротким кэшем.
+    """
+    snapshot = await catalog_cache.get()
+    etag = f'"{snapshot.variants_hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE if v == snapshot.variants_hash else REVALIDATE,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.variants_json, media_type="application/json", headers=headers)
@@ -6,13 +6,15 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.sessions import load_session
 from app.db.session import get_async_session
 from app.repos.cart import CartRepo
 from app.repos.checkout import CheckoutRepo
 from app.schemas.checkout import CheckoutCreateOrderIn
 from app.services.checkout import CheckoutService
+from app.services.idempotency import IdempotencyGuard, idempotency
 
-router = APIRouter(prefix="/api/checkout", tags=["checkout"])
+router = APIRouter(prefix="/api/checkout", tags=["checkout"], dependencies=[Depends(load_session)])
 
 SESSION_ORDER_KEY = "order_id"
 log = logging.getLogger("orders")
@@ -23,7 +25,12 @@ async def create_order(
     payload: CheckoutCreateOrderIn,
     request: Request,
     session: AsyncSession = Depends(get_async_session),
+    idem: IdempotencyGuard = Depends(idempotency("checkout.create_order")),
 ):
+    replayed = await idem.replay(session)
+    if replayed:
+        return replayed
+
     order_id = request.session.get(SESSION_ORDER_KEY)
     if not order_id:
         raise HTTPException(status_code=400, detail="Cart is empty")
@@ -52,8 +59,9 @@ async def create_order(
     # переводим в pending_payment
     CheckoutService.finalize_for_payment(order)
 
+    result = {"order_id": order.id, "status": order.status}
     try:
-        await session.commit()
+        replayed = await idem.commit(session, result)
     except SQLAlchemyError as exc:
         await session.rollback()
         user_id = request.session.get("user_id", "anonymous")
@@ -65,4 +73,4 @@ async def create_order(
         )
         raise HTTPException(status_code=500, detail="Failed to create order") from exc
 
-    return {"order_id": order.id, "status": order.status}
+    return replayed or result
@@ -8,14 +8,16 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.sessions import load_session
 from app.db.models.payment import Payment
 from app.db.session import get_async_session
 from app.repos.checkout import CheckoutRepo
 from app.repos.payments import PaymentRepo
 from app.services.cart import CartService
+from app.services.idempotency import IdempotencyGuard, idempotency
 from app.services.twocheckout import TwoCOConfig, TwoCOService
 
-router = APIRouter(prefix="/api/payments/2co", tags=["payments"])
+router = APIRouter(prefix="/api/payments/2co", tags=["payments"], dependencies=[Depends(load_session)])
 
 SESSION_ORDER_KEY = "order_id"
 load_dotenv()
@@ -43,7 +45,12 @@ def _two_co_cfg(request: Request) -> TwoCOConfig:
 async def start_2co_payment(
     request: Request,
     session: AsyncSession = Depends(get_async_session),
+    idem: IdempotencyGuard = Depends(idempotency("payments.2co.start")),
 ):
+    replayed = await idem.replay(session)
+    if replayed:
+        return replayed
+
     order_id = request.session.get(SESSION_ORDER_KEY)
     if not order_id:
         raise HTTPException(status_code=400, detail="Cart is empty")
@@ -85,7 +92,11 @@ async def start_2co_payment(
 
     previous_status = payment.status
     payment.status = "redirected"
-    await session.commit()
+    result = {"redirect_url": url}
+    replayed = await idem.commit(session, result)
+    if replayed:
+        # параллельный ретрай уже создал Payment — наш откатился
+        return replayed
     if previous_status != payment.status:
         log.info(
             "Payment status changed | order_id=%s | payment_id=%s | from=%s | to=%s",
@@ -95,4 +106,4 @@ async def start_2co_payment(
             payment.status,
         )
 
-    return {"redirect_url": url}
+    return result
@@ -1,33 +1,21 @@
 from __future__ import annotations
-import os
-import httpx
 import logging
+from uuid import uuid4
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.sessions import load_session
 from app.db.session import get_async_session
 from app.repos.checkout import CheckoutRepo
 from app.db.models.payment import Payment
 from app.repos.payments import PaymentRepo
+from app.services.idempotency import IdempotencyGuard, idempotency
+from app.services.paypal import paypal_request
+from app.services.paypal_capture import PROVIDER as PAYPAL_PROVIDER, capture_event_key
+from app.services.webhook_events import apply_pending, record_event
 
-router = APIRouter(prefix="/api/payments/paypal", tags=["payments"])
+router = APIRouter(prefix="/api/payments/paypal", tags=["payments"], dependencies=[Depends(load_session)])
 log = logging.getLogger("payments")
 
-PAYPAL_CLIENT_ID = os.getenv("PAYPAL_CLIENT_ID")
-PAYPAL_SECRET = os.getenv("PAYPAL_SECRET")
-PAYPAL_BASE_URL = os.getenv("PAYPAL_BASE_URL", "https://api-m.sandbox.paypal.com")
-
-
-async def get_paypal_token():
-    async with httpx.AsyncClient() as client:
-        res = await client.post(
-            f"{PAYPAL_BASE_URL}/v1/oauth2/token",
-            auth=(PAYPAL_CLIENT_ID, PAYPAL_SECRET),
-            data={"grant_type": "client_credentials"},
-        )
-        res.raise_for_status()
-        return res.json()["access_token"]
-
-
 from pydantic import BaseModel
 from typing import Optional
 
@@ -44,9 +32,14 @@ class PayPalCreateRequest(BaseModel):
 async def create_order(
         request: Request,
         data: PayPalCreateRequest,  # Добавляем этот аргумент
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_async_session),
+        idem: IdempotencyGuard = Depends(idempotency("payments.paypal.create")),
 ):
     try:
+        replayed = await idem.replay(session)
+        if replayed:
+            return replayed
+
         order_id = request.session.get("order_id")
         if not order_id:
             raise HTTPException(status_code=400, detail="No order in session")
@@ -68,33 +61,16 @@ async def create_order(
         }
         session.add(order)
 
-        token = await get_paypal_token()
-
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "intent": "CAPTURE",
-                "purchase_units": [{
-                    "reference_id": str(order.id),
-                    "amount": {
-                        "currency_code": "EUR",
-                        "value": f"{order.total:.2f}",
-                    },
-                    "shipping": {
-                        "name": {"full_name": order.customer_name or "NOIRID Customer"},
-                        "address": {
-                            "address_line_1": data.line1 or "—",
-                            "admin_area_2": data.city or "—",
-                            "postal_code": (data.postal_code or "")[:20],
-                            "country_code": country_code,
-                        },
-                    },
-                }],
-                "payer": {
-                    "name": {
-                        "given_name": (order.customer_name or "Customer").split(" ")[0][:140],
-                        "surname": (order.customer_name or "NOIRID").split(" ")[-1][:140],
-                    },
-                    "email_address": order.customer_email,
+        payload = {
+            "intent": "CAPTURE",
+            "purchase_units": [{
+                "reference_id": str(order.id),
+                "amount": {
+                    "currency_code": "EUR",
+                    "value": f"{order.total:.2f}",
+                },
+                "shipping": {
+                    "name": {"full_name": order.customer_name or "NOIRID Customer"},
                     "address": {
                         "address_line_1": data.line1 or "—",
                         "admin_area_2": data.city or "—",
@@ -102,41 +78,62 @@ async def create_order(
                         "country_code": country_code,
                     },
                 },
-                "application_context": {
-                    "brand_name": "NOIRID",
-                    "user_action": "PAY_NOW",
-                    "shipping_preference": "SET_PROVIDED_ADDRESS",
-                    "landing_page": "BILLING",  # часто уменьшает “PayPal-way”
-                    "locale": "en-GB",  # чтоб не тянул US по умолчанию
-                }
+            }],
+            "payer": {
+                "name": {
+                    "given_name": (order.customer_name or "Customer").split(" ")[0][:140],
+                    "surname": (order.customer_name or "NOIRID").split(" ")[-1][:140],
+                },
+                "email_address": order.customer_email,
+                "address": {
+                    "address_line_1": data.line1 or "—",
+                    "admin_area_2": data.city or "—",
+                    "postal_code": (data.postal_code or "")[:20],
+                    "country_code": country_code,
+                },
+            },
+            "application_context": {
+                "brand_name": "NOIRID",
+                "user_action": "PAY_NOW",
+                "shipping_preference": "SET_PROVIDED_ADDRESS",
+                "landing_page": "BILLING",  # часто уменьшает “PayPal-way”
+                "locale": "en-GB",  # чтоб не тянул US по умолчанию
             }
+        }
 
-            res = await client.post(
-                f"{PAYPAL_BASE_URL}/v2/checkout/orders",
-                headers={"Authorization": f"Bearer {token}"},
-                json=payload
-            )
+        res = await paypal_request(
+            "POST",
+            "/v2/checkout/orders",
+            # ключ идемпотентности PayPal: ретрай после таймаута не создаст второй заказ
+            headers={"PayPal-Request-Id": f"create-{uuid4()}"},
+            json=payload,
+            idempotent=True,
+        )
 
-            if res.status_code != 201:
-                log.error(f"PayPal API Rejected: {res.text}")
-                raise HTTPException(status_code=400, detail="PayPal setup failed")
+        if res.status_code != 201:
+            log.error(f"PayPal API Rejected: {res.text}")
+            raise HTTPException(status_code=400, detail="PayPal setup failed")
 
-            paypal_data = res.json()
+        paypal_data = res.json()
 
-            # Привязываем ID PayPal к платежу
-            payment = Payment(
-                order_id=order.id,
-                provider="paypal",
-                provider_order_number=paypal_data.get("id"),
-                status="created",
-                amount=order.total,
-                currency="EUR",
-            )
-            session.add(payment)
-            await session.commit()
+        # Привязываем ID PayPal к платежу
+        payment = Payment(
+            order_id=order.id,
+            provider="paypal",
+            provider_order_number=paypal_data.get("id"),
+            status="created",
+            amount=order.total,
+            currency="EUR",
+        )
+        session.add(payment)
+        replayed = await idem.commit(session, paypal_data)
 
-            return paypal_data
+        return replayed or paypal_data
 
+    except HTTPException:
+        # 400/404 и 422 от idempotency-guard — как есть, это не сбой
+        await session.rollback()
+        raise
     except Exception as e:
         log.exception("PayPal create error")
         await session.rollback()
@@ -150,57 +147,50 @@ async def capture_order(
         session: AsyncSession = Depends(get_async_session)
 ):
     try:
-        token = await get_paypal_token()
-        async with httpx.AsyncClient() as client:
-            res = await client.post(
-                f"{PAYPAL_BASE_URL}/v2/checkout/orders/{paypal_order_id}/capture",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json"
-                },
-                json={}
-            )
-
-            data = res.json()
-
-            if res.status_code == 201 and data.get("status") == "COMPLETED":
-                purchase_unit = data.get("purchase_units", [{}])[0]
-                internal_uuid = purchase_unit.get("reference_id")
-                capture_id = purchase_unit.get("payments", {}).get("captures", [{}])[0].get("id")
-
-                order = await CheckoutRepo.get_order_any(session, internal_uuid)
-                if not order:
-                    raise HTTPException(status_code=404, detail="Order not found")
-
-                # Ищем наш платеж по provider_order_number (это paypal_order_id)
-                from sqlalchemy import select
-                q = select(Payment).where(Payment.provider_order_number == paypal_order_id)
-                payment_exec = await session.execute(q)
-                payment = payment_exec.scalars().first()
-
-                # Обновляем заказ
-                order.payment_status = "paid"
-                order.status = "paid"
-                order.paypal_capture_id = capture_id
-                order.need_post_process = True
-
-                # Обновляем платеж
-                if payment:
-                    payment.status = "paid"
-                    payment.provider_invoice_id = capture_id
-                    payment.raw_payload = data
-                else:
-                    log.warning(f"Payment record not found for PayPal ID {paypal_order_id}")
+        res = await paypal_request(
+            "POST",
+            f"/v2/checkout/orders/{paypal_order_id}/capture",
+            headers={
+                "Content-Type": "application/json",
+                # один ключ на заказ PayPal: повторный capture вернёт тот же результат, а не второе списание
+                "PayPal-Request-Id": f"capture-{paypal_order_id}",
+            },
+            json={},
+            idempotent=True,
+        )
 
-                await session.commit()
-                request.session.pop("order_id", None)
+        data = res.json()
+
+        # 200 — PayPal вернул сохранённый результат по тому же PayPal-Request-Id
+        if res.status_code in (200, 201) and data.get("status") == "COMPLETED":
+            internal_uuid = data.get("purchase_units", [{}])[0].get("reference_id")
+            order = await CheckoutRepo.get_order_any(session, internal_uuid)
+            if not order:
+                raise HTTPException(status_code=404, detail="Order not found")
+
+            # результат capture — событие журнала заказа; повторный capture (двойной клик,
+            # ретрай фронта) — дубль по capture id и заново не применяется
+            event_id = await record_event(
+                session,
+                provider=PAYPAL_PROVIDER,
+                event_key=capture_event_key(data),
+                order_ref=order.order_number,
+                payload=data,
+            )
+            if event_id is not None:
+                await apply_pending(session, order.order_number)
+            await session.commit()
+            request.session.pop("order_id", None)
 
-                log.info(f"Order {order.order_number} PAID")
-                return {"status": "success", "order_number": order.order_number}
+            log.info(f"Order {order.order_number} PAID")
+            return {"status": "success", "order_number": order.order_number}
 
-            log.error(f"PayPal Capture Error: {data}")
-            return {"status": "error", "detail": "Payment failed"}
+        log.error(f"PayPal Capture Error: {data}")
+        return {"status": "error", "detail": "Payment failed"}
 
+    except HTTPException:
+        await session.rollback()
+        raise
     except Exception as e:
         log.exception("PayPal capture exception")
         await session.rollback()
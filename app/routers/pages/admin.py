@@ -7,22 +7,41 @@ import json
 
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, Request, UploadFile
 from fastapi.responses import JSONResponse, RedirectResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Literal
+from app.core.config import settings
+from app.core.sessions import load_session, rotate_session
 from app.core.templates import templates
 from app.db.models.product import Product, Variant
 from app.db.models.user import User
-from app.db.session import get_async_session
+from app.db.session import get_admin_session, on_replica
+from app.repos.content import ContentRepo
+from app.repos.media import MediaRepo
 from app.repos.orders import OrdersRepo
 from app.repos.payments import PaymentRepo
 from app.repos.support import SupportRepo
 from app.repos.users import UsersRepo
 from app.services.auth import verify_password
-
-router = APIRouter(prefix="/admin", tags=["admin"])
+from app.services.blobs import release
+from app.services.catalog_cache import FEATURED_CONFIG_KEY, catalog_cache, commit_catalog_change
+from app.services.featured import compile_featured
+from app.services.images import drop_derivatives
+from app.services.jobs import enqueue_tracking_email
+from app.services.media import UploadRejected, process_upload, store_upload
+from app.services.promotions import (
+    PROMOTIONS_CONTENT_KEY,
+    announce_promotions_change,
+    compile_rules,
+    current_plan,
+    rules_from_payload,
+    set_plan,
+)
+from app.services.webhook_events import has_full_history, rebuild_order
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(load_session)])
 
 ADMIN_SESSION_KEY = "admin_user_id"
 PER_PAGE = 20
@@ -32,7 +51,7 @@ ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
 
 async def require_admin(
     request: Request,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ) -> User:
     user_id = request.session.get(ADMIN_SESSION_KEY)
     if not user_id:
@@ -54,7 +73,7 @@ async def admin_login_page(request: Request):
 @router.post("/login", include_in_schema=False)
 async def admin_login(
     request: Request,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     username: str = Form(...),
     password: str = Form(...),
 ):
@@ -65,6 +84,8 @@ async def admin_login(
             {"request": request, "error": "Invalid credentials"},
             status_code=401,
         )
+    # новый sid на входе: id сессии, подсунутый до логина, админских прав не получит
+    rotate_session(request)
     request.session[ADMIN_SESSION_KEY] = user.id
     return RedirectResponse("/admin", status_code=303)
 
@@ -79,7 +100,7 @@ async def admin_logout(request: Request):
 async def admin_dashboard(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     recent_orders = await OrdersRepo.list_recent(session, limit=10)
     return templates.TemplateResponse(
@@ -95,7 +116,7 @@ async def admin_orders(
     page: int = 1,
     status: Literal["pending_payment", "paid"] | None = None,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     page = max(page, 1)
     total = await OrdersRepo.count(session, status=status)
@@ -128,7 +149,7 @@ async def admin_order_detail(
     request: Request,
     order_id: str,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     order = await OrdersRepo.get_by_id(session, order_id)
     if not order:
@@ -136,7 +157,13 @@ async def admin_order_detail(
     payments = await PaymentRepo.list_for_order(session, order_id)
     return templates.TemplateResponse(
         "admin/order_detail.html",
-        {"request": request, "order": order, "payments": payments, "admin_user": admin_user},
+        {
+            "request": request,
+            "order": order,
+            "payments": payments,
+            "admin_user": admin_user,
+            "can_rebuild_payment": await has_full_history(session, order),
+        },
     )
 
 
@@ -145,7 +172,7 @@ async def admin_users(
     request: Request,
     page: int = 1,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     page = max(page, 1)
     total = await UsersRepo.count(session)
@@ -170,7 +197,7 @@ async def admin_payments(
     request: Request,
     page: int = 1,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     page = max(page, 1)
     total = await PaymentRepo.count(session)
@@ -195,7 +222,7 @@ async def admin_questions(
     request: Request,
     page: int = 1,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     page = max(page, 1)
     total = await SupportRepo.count(session)
@@ -219,9 +246,9 @@ async def admin_questions(
 async def admin_products_list(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
-    products = (await session.execute(select(Product).order_by(Product.id.desc()))).scalars().all()
+    products = (await session.execute(on_replica(select(Product).order_by(Product.id.desc())))).scalars().all()
     return templates.TemplateResponse(
         "admin/products_list.html",
         {"request": request, "products": products, "admin_user": admin_user},
@@ -232,14 +259,14 @@ async def admin_products_list(
 async def admin_product_new(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     return templates.TemplateResponse(
         "admin/product_form.html",
         {
             "request": request,
             "product": None,
-            "media_folders": _list_media_folders(),
+            "media_folders": await MediaRepo.list_all_folders(session),
             "action_url": "/admin/products/new",
             "admin_user": admin_user,
         },
@@ -250,7 +277,7 @@ async def admin_product_new(
 async def admin_product_create(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     title: str = Form(...),
     slug: str = Form(...),
     description: str | None = Form(default=None),
@@ -273,7 +300,7 @@ async def admin_product_create(
     )
     session.add(product)
 
-    await session.commit()
+    await commit_catalog_change(session)
     return RedirectResponse("/admin/products", status_code=303)
 
 
@@ -282,7 +309,7 @@ async def admin_product_edit(
     request: Request,
     product_id: int,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     product = (await session.execute(select(Product).where(Product.id == product_id))).scalars().first()
     if not product:
@@ -292,7 +319,7 @@ async def admin_product_edit(
         {
             "request": request,
             "product": product,
-            "media_folders": _list_media_folders(),
+            "media_folders": await MediaRepo.list_all_folders(session),
             "action_url": f"/admin/products/{product_id}/edit",
             "admin_user": admin_user,
         },
@@ -304,7 +331,7 @@ async def admin_product_update(
     request: Request,
     product_id: int,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     title: str = Form(...),
     slug: str = Form(...),
     description: str | None = Form(default=None),
@@ -328,7 +355,7 @@ async def admin_product_update(
     product.personalization_schema = personalization_payload
     product.images = _normalize_product_images(image_urls)
 
-    await session.commit()
+    await commit_catalog_change(session)
     return RedirectResponse("/admin/products", status_code=303)
 
 
@@ -337,13 +364,13 @@ async def admin_product_delete(
     request: Request,
     product_id: int,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     product = (await session.execute(select(Product).where(Product.id == product_id))).scalars().first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     await session.delete(product)
-    await session.commit()
+    await commit_catalog_change(session)
     return RedirectResponse("/admin/products", status_code=303)
 
 
@@ -351,9 +378,9 @@ async def admin_product_delete(
 async def admin_variants(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
-    variants = (await session.execute(select(Variant).order_by(Variant.id.desc()))).scalars().all()
+    variants = (await session.execute(on_replica(select(Variant).order_by(Variant.id.desc())))).scalars().all()
     return templates.TemplateResponse(
         "admin/variants.html",
         {"request": request, "variants": variants, "admin_user": admin_user},
@@ -364,7 +391,7 @@ async def admin_variants(
 async def admin_create_variant(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     sku: str = Form(...),
     device_brand: str = Form(...),
     device_model: str = Form(...),
@@ -383,7 +410,7 @@ async def admin_create_variant(
         is_active=is_active,
     )
     session.add(variant)
-    await session.commit()
+    await commit_catalog_change(session)
     return RedirectResponse("/admin/variants", status_code=303)
 
 
@@ -392,7 +419,7 @@ async def admin_variant_edit(
     request: Request,
     variant_id: int,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     variant = (await session.execute(select(Variant).where(Variant.id == variant_id))).scalars().first()
     if not variant:
@@ -408,7 +435,7 @@ async def admin_variant_update(
     request: Request,
     variant_id: int,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     sku: str = Form(...),
     device_brand: str = Form(...),
     device_model: str = Form(...),
@@ -425,7 +452,7 @@ async def admin_variant_update(
     variant.price_delta = Decimal(price_delta)
     variant.stock_qty = int(stock_qty) if stock_qty not in (None, "") else None
     variant.is_active = is_active
-    await session.commit()
+    await commit_catalog_change(session)
     return RedirectResponse("/admin/variants", status_code=303)
 
 
@@ -434,16 +461,103 @@ async def admin_variant_delete(
     request: Request,
     variant_id: int,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     variant = (await session.execute(select(Variant).where(Variant.id == variant_id))).scalars().first()
     if not variant:
         raise HTTPException(status_code=404, detail="Variant not found")
     await session.delete(variant)
-    await session.commit()
+    await commit_catalog_change(session)
     return RedirectResponse("/admin/variants", status_code=303)
 
 
+@router.get("/promotions", include_in_schema=False)
+async def admin_promotions(
+    request: Request,
+    admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
+):
+    block = await ContentRepo.get_by_key(session, PROMOTIONS_CONTENT_KEY)
+    rules = rules_from_payload(block.payload if block else None)
+    return templates.TemplateResponse(
+        "admin/promotions.html",
+        {
+            "request": request,
+            "rules_json": json.dumps(rules, indent=2, ensure_ascii=False),
+            "active_rules": current_plan().size,
+            "admin_user": admin_user,
+        },
+    )
+
+
+@router.post("/promotions", include_in_schema=False)
+async def admin_promotions_update(
+    request: Request,
+    admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
+    rules: str = Form(...),
+):
+    try:
+        data = json.loads(rules)
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid promotions JSON: {exc.msg}") from exc
+
+    # компилируем до сохранения: кривой конфиг не должен попасть в БД
+    try:
+        plan = compile_rules(data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    await ContentRepo.upsert(session, PROMOTIONS_CONTENT_KEY, {"rules": data})
+    await announce_promotions_change(session)
+    await session.commit()
+    set_plan(plan)
+    return RedirectResponse("/admin/promotions", status_code=303)
+
+
+@router.get("/featured", include_in_schema=False)
+async def admin_featured(
+    request: Request,
+    admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
+):
+    block = await ContentRepo.get_by_key(session, FEATURED_CONFIG_KEY)
+    config = block.payload if block and block.payload else {"mode": "weighted", "items": []}
+    return templates.TemplateResponse(
+        "admin/featured.html",
+        {
+            "request": request,
+            "config_json": json.dumps(config, indent=2, ensure_ascii=False),
+            "admin_user": admin_user,
+        },
+    )
+
+
+@router.post("/featured", include_in_schema=False)
+async def admin_featured_update(
+    request: Request,
+    admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
+    config: str = Form(...),
+):
+    try:
+        data = json.loads(config)
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid featured JSON: {exc.msg}") from exc
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Featured config must be a JSON object")
+
+    try:
+        compile_featured(data, await catalog_cache.get())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    await ContentRepo.upsert(session, FEATURED_CONFIG_KEY, data)
+    # конфиг живёт в снимке каталога — пересобираем его на всех воркерах
+    await commit_catalog_change(session)
+    return RedirectResponse("/admin/featured", status_code=303)
+
+
 def _safe_media_path(relative_path: str) -> Path:
     if not relative_path:
         return MEDIA_ROOT
@@ -453,33 +567,14 @@ def _safe_media_path(relative_path: str) -> Path:
     return safe_path
 
 
+def _media_rel(path: Path) -> str:
+    """Ключ в индексе медиатеки: путь относительно MEDIA_ROOT, '' для корня."""
+    rel = path.resolve().relative_to(MEDIA_ROOT.resolve()).as_posix()
+    return "" if rel == "." else rel
+
+
 def _url_for_media(path: Path) -> str:
-    rel = path.relative_to(MEDIA_ROOT).as_posix()
-    return f"/static/images/{rel}"
-
-
-def _list_media_folders() -> list[str]:
-    MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
-    folders = []
-    for path in MEDIA_ROOT.rglob("*"):
-        if path.is_dir():
-            rel = path.relative_to(MEDIA_ROOT).as_posix()
-            if rel:
-                folders.append(rel)
-    return sorted(folders)
-
-
-def _list_media_images(current_path: Path, query: str = "") -> list[dict[str, str]]:
-    query = query.strip().lower()
-    images: list[dict[str, str]] = []
-    for path in sorted(current_path.iterdir(), key=lambda p: p.name.lower()):
-        if not path.is_file() or path.suffix.lower() not in ALLOWED_IMAGE_EXTENSIONS:
-            continue
-        url = _url_for_media(path)
-        if query and query not in path.name.lower() and query not in url.lower():
-            continue
-        images.append({"url": url})
-    return images
+    return f"/static/images/{_media_rel(path)}"
 
 
 def _normalize_product_images(image_urls: list[str]) -> list[dict[str, str]]:
@@ -557,39 +652,33 @@ async def _update_products_for_image_change(
     old_url: str,
     new_url: str | None = None,
 ) -> None:
-    products = (await session.execute(select(Product))).scalars().all()
-    for product in products:
-        if not product.images:
-            continue
+    # только товары, где картинка реально используется (GIN по products.images)
+    for product in await MediaRepo.products_referencing(session, old_url):
         updated = []
-        changed = False
-        for entry in product.images:
+        for entry in product.images or []:
             url = entry.get("url")
             if url == old_url:
-                changed = True
                 if new_url:
                     updated.append({"id": len(updated), "url": new_url})
                 continue
             updated.append({"id": len(updated), "url": url})
-        if changed:
-            product.images = updated
+        product.images = updated
 
 
 @router.get("/media", include_in_schema=False)
 async def admin_media_library(
     request: Request,
     admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
     path: str | None = None,
     q: str | None = None,
 ):
-    MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
-    current_path = _safe_media_path(path or "")
-    if not current_path.exists():
+    folder = _media_rel(_safe_media_path((path or "").strip("/")))
+    if not await MediaRepo.folder_exists(session, folder):
         raise HTTPException(status_code=404, detail="Folder not found")
-    folders = sorted([p for p in current_path.iterdir() if p.is_dir()], key=lambda p: p.name.lower())
-
-    query = (q or "").strip().lower()
-    images = _list_media_images(current_path, query)
+    # шаблон работает с Path относительно MEDIA_ROOT, как раньше при обходе диска
+    folders = [MEDIA_ROOT / rel for rel in await MediaRepo.list_subfolders(session, folder)]
+    images = [{"url": asset.url} for asset in await MediaRepo.list_files(session, folder, q or "")]
 
     folder_parts = [part for part in (path or "").split("/") if part]
     return templates.TemplateResponse(
@@ -611,42 +700,48 @@ async def admin_media_library(
 async def admin_media_images(
     request: Request,
     admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
     folder: str | None = None,
     q: str | None = None,
 ):
-    current_path = _safe_media_path(folder or "")
-    if not current_path.exists():
+    rel = _media_rel(_safe_media_path((folder or "").strip("/")))
+    if not await MediaRepo.folder_exists(session, rel):
         raise HTTPException(status_code=404, detail="Folder not found")
-    images = _list_media_images(current_path, q or "")
+    images = [{"url": asset.url} for asset in await MediaRepo.list_files(session, rel, q or "")]
     return JSONResponse({"images": images})
 
 
 @router.post("/media/upload", include_in_schema=False)
 async def admin_media_upload(
     request: Request,
+    background_tasks: BackgroundTasks,
     admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
     image: UploadFile = File(...),
     folder: str | None = Form(default=None),
 ):
-    MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
-    if not image.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    ext = Path(image.filename).suffix.lower()
-    if ext not in ALLOWED_IMAGE_EXTENSIONS:
-        raise HTTPException(status_code=400, detail="Only image files are allowed")
     if image.content_type and not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Only image files are allowed")
 
     target_dir = _safe_media_path(folder or "")
-    target_dir.mkdir(parents=True, exist_ok=True)
-    target_path = target_dir / image.filename
-    counter = 1
-    while target_path.exists():
-        target_path = target_dir / f"{target_path.stem}-{counter}{ext}"
-        counter += 1
-
-    contents = await image.read()
-    target_path.write_bytes(contents)
+    try:
+        meta = await store_upload(image, target_dir, max_bytes=settings.media_max_upload_bytes)
+    except UploadRejected as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    await MediaRepo.upsert_file(
+        session,
+        _media_rel(meta.path),
+        size_bytes=meta.size_bytes,
+        width=meta.width,
+        height=meta.height,
+        format=meta.format,
+        sha256=meta.sha256,
+    )
+    await session.commit()
+
+    # нарезка под srcset — после ответа, админка не ждёт Pillow
+    background_tasks.add_task(process_upload, meta.path)
     redirect_path = folder.strip("/") if folder else ""
     return RedirectResponse(f"/admin/media?path={redirect_path}", status_code=303)
 
@@ -655,10 +750,13 @@ async def admin_media_upload(
 async def admin_media_create_folder(
     request: Request,
     admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
     folder: str = Form(...),
 ):
     target_dir = _safe_media_path(folder.strip("/"))
     target_dir.mkdir(parents=True, exist_ok=True)
+    await MediaRepo.ensure_folder(session, _media_rel(target_dir))
+    await session.commit()
     redirect_path = folder.strip("/")
     return RedirectResponse(f"/admin/media?path={redirect_path}", status_code=303)
 
@@ -667,21 +765,30 @@ async def admin_media_create_folder(
 async def admin_media_delete(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     target: str = Form(...),
     current_path: str | None = Form(default=None),
 ):
     target_path = _safe_media_path(target.strip("/"))
+    rel = _media_rel(target_path)
+    if not rel:
+        raise HTTPException(status_code=400, detail="Invalid path")
     if target_path.is_dir():
-        if any(target_path.iterdir()):
+        if await MediaRepo.has_children(session, rel) or any(target_path.iterdir()):
             raise HTTPException(status_code=400, detail="Folder is not empty")
         target_path.rmdir()
+        await MediaRepo.delete_path(session, rel)
+        await session.commit()
     else:
         url = _url_for_media(target_path)
         if target_path.exists():
             target_path.unlink()
+        drop_derivatives(target_path)
+        sha256 = await MediaRepo.delete_path(session, rel)
         await _update_products_for_image_change(session, url)
-    await session.commit()
+        await commit_catalog_change(session)
+        # последняя ссылка ушла — blob удаляется сразу, не дожидаясь gc_blobs
+        release(sha256)
     redirect_path = (current_path or "").strip("/")
     return RedirectResponse(f"/admin/media?path={redirect_path}", status_code=303)
 
@@ -690,7 +797,7 @@ async def admin_media_delete(
 async def admin_media_rename(
     request: Request,
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
     source: str = Form(...),
     destination: str = Form(...),
     current_path: str | None = Form(default=None),
@@ -703,10 +810,12 @@ async def admin_media_rename(
         raise HTTPException(status_code=400, detail="Only image files are allowed")
     destination_path.parent.mkdir(parents=True, exist_ok=True)
     source_path.replace(destination_path)
+    drop_derivatives(source_path)
+    await MediaRepo.move_file(session, _media_rel(source_path), _media_rel(destination_path))
     old_url = _url_for_media(source_path)
     new_url = _url_for_media(destination_path)
     await _update_products_for_image_change(session, old_url, new_url)
-    await session.commit()
+    await commit_catalog_change(session)
     redirect_path = (current_path or "").strip("/")
     return RedirectResponse(f"/admin/media?path={redirect_path}", status_code=303)
 
@@ -716,7 +825,7 @@ async def admin_add_tracking(
     order_id: str,
     tracking_number: str = Form(...),
     admin_user=Depends(require_admin),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_admin_session),
 ):
     order = await OrdersRepo.get_by_id(session, order_id)
     if not order:
@@ -730,6 +839,26 @@ async def admin_add_tracking(
 
     order.tracking_number = tracking_number.strip()
     order.tracking_email_sent_at = None
+    await enqueue_tracking_email(session, order.id, order.tracking_number)
+    await session.commit()
+
+    return RedirectResponse("/admin/orders", status_code=303)
+
+
+@router.post("/orders/{order_id}/rebuild-payment", include_in_schema=False)
+async def admin_rebuild_payment(
+    request: Request,
+    order_id: str,
+    admin_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_admin_session),
+):
+    order = await OrdersRepo.get_by_id(session, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    # payment_status заново из журнала webhook_events (IPN 2CO, capture PayPal) по порядку
+    if await rebuild_order(session, order.order_number) is None:
+        raise HTTPException(status_code=400, detail="Order has no complete webhook event history")
     await session.commit()
 
-    return RedirectResponse("/admin/orders", status_code=303)
\ No newline at end of file
+    return RedirectResponse(f"/admin/orders/{order_id}", status_code=303)
\ No newline at end of file
@@ -1,20 +1,22 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Request
 
+from app.core.config import settings
+from app.core.page_cache import cached_page
 from app.core.templates import templates
-from app.db.session import get_async_session
-from app.repos.products import ProductsRepo
+from app.services.catalog_cache import catalog_cache
 
 router = APIRouter(prefix="/catalog", tags=["pages"])
 
 
 @router.get("", include_in_schema=False)
 @router.get("/", include_in_schema=False)
-async def catalog(request: Request, session: AsyncSession = Depends(get_async_session)):
-    products = await ProductsRepo.list_active(session)
+@cached_page(generation=lambda: catalog_cache.generation, ttl=settings.catalog_cache_ttl_seconds)
+async def catalog(request: Request):
+    snapshot = await catalog_cache.get()
     return templates.TemplateResponse(
         "pages/catalog.html",
-        {"request": request, "products": products},
+        # поколение снимка — в ключ фрагмента: рендер по старому снимку не перезапишет свежую сетку
+        {"request": request, "products": snapshot.products, "catalog_generation": snapshot.generation},
     )
@@ -6,13 +6,14 @@ from decimal import Decimal
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.sessions import load_session
 from app.core.templates import templates
 from app.db.session import get_async_session
 from app.repos.cart import CartRepo
 from app.repos.checkout import CheckoutRepo
 from app.services.cart import CartService
 
-router = APIRouter(prefix="/checkout", tags=["pages"])
+router = APIRouter(prefix="/checkout", tags=["pages"], dependencies=[Depends(load_session)])
 
 SESSION_ORDER_KEY = "order_id"
 
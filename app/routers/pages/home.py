@@ -1,14 +1,10 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Request
 
 from app.core.templates import templates
-from app.db.session import get_async_session
-from app.repos.content import ContentRepo
-from app.repos.products import ProductsRepo
-from sqlalchemy import select, func
-from app.db.models.product import Product
+from app.services.catalog_cache import catalog_cache
+from app.services.featured import pick_featured
 import random
 
 HERO_IMAGES = [
@@ -24,17 +20,11 @@ router = APIRouter(tags=["pages"])
 
 
 @router.get("/", include_in_schema=False)
-async def home(request: Request, session: AsyncSession = Depends(get_async_session)):
+async def home(request: Request):
     hero_img = random.choice(HERO_IMAGES)
 
-    q = (
-        select(Product)
-        .where(Product.is_active.is_(True))
-        .order_by(func.random())
-        .limit(1)
-    )
-    products = (await session.execute(q)).scalars().first()
-
+    snapshot = await catalog_cache.get()
+    products = pick_featured(snapshot)
 
     return templates.TemplateResponse(
         "pages/home.html",
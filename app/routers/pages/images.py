@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException
+from starlette.responses import FileResponse
+
+from app.services.images import WIDTHS, ensure_derivative, source_for_path
+
+router = APIRouter(prefix="/img", tags=["pages"])
+
+# URL не содержит hash исходника, поэтому не immutable: неделя + ревалидация по ETag
+CACHE_CONTROL = "public, max-age=604800"
+
+
+@router.get("/w{width}/{path:path}", include_in_schema=False)
+async def image_derivative(width: int, path: str):
+    if width not in WIDTHS:
+        raise HTTPException(status_code=404, detail="Unknown size")
+    source = source_for_path(path)
+    if source is None or not source.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # первый запрос режет и кладёт на диск, дальше — просто файл
+    target = await ensure_derivative(source, width)
+    return FileResponse(target, media_type="image/webp", headers={"Cache-Control": CACHE_CONTROL})
@@ -3,6 +3,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, Form, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.page_cache import cached_page
 from app.core.templates import templates
 from app.db.session import get_async_session
 from app.repos.support import SupportRepo
@@ -12,28 +13,34 @@ router = APIRouter(tags=["pages"])
 
 
 @router.get("/about", include_in_schema=False)
+@cached_page()
 async def about_page(request: Request):
     return templates.TemplateResponse("pages/about.html", {"request": request})
 
 @router.get("/privacy", include_in_schema=False)
+@cached_page()
 async def about_page(request: Request):
     return templates.TemplateResponse("pages/privacy.html", {"request": request})
 
 @router.get("/terms", include_in_schema=False)
+@cached_page()
 async def about_page(request: Request):
     return templates.TemplateResponse("pages/terms.html", {"request": request})
 
 @router.get("/returns", include_in_schema=False)
+@cached_page()
 async def about_page(request: Request):
     return templates.TemplateResponse("pages/returns.html", {"request": request})
 
 
 @router.get("/delivery", include_in_schema=False)
+@cached_page()
 async def delivery_page(request: Request):
     return templates.TemplateResponse("pages/delivery.html", {"request": request})
 
 
 @router.get("/support", include_in_schema=False)
+@cached_page()
 async def support_page(request: Request):
     return templates.TemplateResponse("pages/support.html", {"request": request, "success": False})
 
@@ -66,5 +73,6 @@ async def support_submit(
 
 
 @router.get("/check-order", include_in_schema=False)
+@cached_page()
 async def check_order_page(request: Request):
     return templates.TemplateResponse("pages/check_order.html", {"request": request})
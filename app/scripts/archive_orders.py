@@ -1,9 +1,26 @@
 import asyncio
-from app.workers.archive_orders import archive_old_orders
+from app.workers.archive_orders import (
+    archive_old_orders,
+    drop_expired_archive_partitions,
+    move_to_cold_storage,
+    purge_finished_jobs,
+    purge_idempotency_keys,
+    purge_sent_emails,
+)
 
 async def main():
     count = await archive_old_orders()
     print(f"Archived {count} orders")
+    moved = await move_to_cold_storage()
+    print(f"Moved {moved} archived orders to orders_archive")
+    dropped = await drop_expired_archive_partitions()
+    print(f"Dropped {len(dropped)} expired archive partitions {dropped}")
+    purged = await purge_idempotency_keys()
+    print(f"Purged {purged} expired idempotency keys")
+    jobs = await purge_finished_jobs()
+    print(f"Purged {jobs} finished jobs")
+    emails = await purge_sent_emails()
+    print(f"Purged {emails} sent emails from outbox")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
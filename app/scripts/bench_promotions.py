@@ -0,0 +1,69 @@
+"""
+Микро-бенчмарк пересчёта корзины: 50 активных правил, корзина на 10 строк.
+Падает с кодом 1, если пересчёт не укладывается в бюджет.
+
+    python -m app.scripts.bench_promotions
+"""
+from __future__ import annotations
+
+import sys
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.services.cart import CartService
+from app.services.promotions import compile_rules, set_plan
+
+RULES_COUNT = 50
+ITEMS_COUNT = 10
+ITERATIONS = 20_000
+BUDGET_US = 100.0  # на один recalc
+
+
+def build_rules() -> list[dict]:
+    rules = []
+    for i in range(RULES_COUNT // 2):
+        rules.append({"type": "bundle_tier", "reason": f"tier_{i}", "min_qty": 2 + i, "percent": str(5 + i % 20)})
+    for i in range(RULES_COUNT - len(rules)):
+        rules.append(
+            {
+                "type": "product_override",
+                "reason": f"override_{i}",
+                "product_id": i + 1,
+                "percent": "10",
+                "starts_at": "2020-01-01T00:00:00",
+                "ends_at": "2999-01-01T00:00:00",
+            }
+        )
+    return rules
+
+
+def build_order() -> SimpleNamespace:
+    items = [
+        SimpleNamespace(product_id=i + 1, unit_price=Decimal("39.90"), qty=1 + i % 3)
+        for i in range(ITEMS_COUNT)
+    ]
+    return SimpleNamespace(items=items, subtotal=None, discount_amount=None, discount_reason=None, total=None)
+
+
+def main() -> int:
+    set_plan(compile_rules(build_rules()))
+    order = build_order()
+
+    for _ in range(1_000):  # прогрев
+        CartService.recalc(order)
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        CartService.recalc(order)
+    per_call_us = (time.perf_counter() - started) / ITERATIONS * 1_000_000
+
+    print(
+        f"recalc: {per_call_us:.1f} us/call | rules={RULES_COUNT} items={ITEMS_COUNT} "
+        f"budget={BUDGET_US:.0f} us | total={order.total} reason={order.discount_reason}"
+    )
+    return 0 if per_call_us <= BUDGET_US else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+from app.core.assets import DIST_DIR, MANIFEST_PATH, STATIC_DIR
+
+try:
+    import brotli  # опционально: pip install brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# что фингерпринтим; images/ (медиатека админки, URL лежат в БД) и out/ (превью) не трогаем
+SOURCES = ("css", "js", "fonts", "icons", "img", "favicon-16.png", "favicon-32.png", "apple-touch-icon.png")
+SKIP_NAMES = {"input.css"}  # исходник tailwind, в браузер не уходит
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".ttf", ".map"}
+MIN_COMPRESS_BYTES = 512
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)/static/([^'")?#]+)([^'")]*)\1\s*\)""")
+
+
+def _iter_sources():
+    for entry in SOURCES:
+        path = STATIC_DIR / entry
+        if path.is_file():
+            yield path
+        elif path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.is_file() and p.name not in SKIP_NAMES)
+
+
+def _hashed_name(rel: Path, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    return rel.with_name(f"{rel.stem}.{digest}{rel.suffix}").as_posix()
+
+
+def _rewrite_css(content: bytes, manifest: dict[str, str]) -> bytes:
+    # шрифты/картинки внутри CSS тоже должны указывать на hash-версии,
+    # иначе immutable-CSS навсегда закэширует ссылку на изменяемый файл
+    def repl(m: re.Match) -> str:
+        quote, rel, tail = m.group(1), m.group(2), m.group(3)
+        hashed = manifest.get(rel)
+        target = f"/static/dist/{hashed}" if hashed else f"/static/{rel}"
+        return f"url({quote}{target}{tail}{quote})"
+
+    return CSS_URL_RE.sub(repl, content.decode("utf-8")).encode("utf-8")
+
+
+def _write(target: Path, content: bytes) -> int:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(content)
+    written = 1
+    if target.suffix in COMPRESSIBLE and len(content) >= MIN_COMPRESS_BYTES:
+        target.with_name(target.name + ".gz").write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+        written += 1
+        if brotli is not None:
+            target.with_name(target.name + ".br").write_bytes(brotli.compress(content, quality=11))
+            written += 1
+    return written
+
+
+def main():
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+
+    sources = list(_iter_sources())
+    manifest: dict[str, str] = {}
+    files = 0
+
+    # CSS в конце: к этому моменту hash-имена шрифтов и картинок уже известны
+    for path in sorted(sources, key=lambda p: p.suffix == ".css"):
+        rel = path.relative_to(STATIC_DIR)
+        content = path.read_bytes()
+        if path.suffix == ".css":
+            content = _rewrite_css(content, manifest)
+        hashed = _hashed_name(rel, content)
+        manifest[rel.as_posix()] = hashed
+        files += _write(DIST_DIR / hashed, content)
+
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"Built {len(manifest)} assets ({files} files) into {DIST_DIR}")
+    if brotli is None:
+        print("brotli not installed: only .gz variants written", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
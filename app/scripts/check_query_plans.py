@@ -0,0 +1,71 @@
+import asyncio
+import json
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.db.session import engine
+from app.workers.archive_orders import ARCHIVE_SQL
+from app.workers.post_payment import pending_work_query
+
+# Регрессия планов для запросов воркеров: на засеянных данных запрос обязан идти
+# по своему частичному индексу. Всё в одной транзакции с ROLLBACK — базу не трогает,
+# но запускать лучше на staging/локальной копии (ANALYZE по orders внутри).
+
+SEED_SQL = """
+INSERT INTO orders (id, status, currency, subtotal, total, created_at, updated_at,
+                    need_post_process, confirmation_email_sent_at, tracking_number, tracking_email_sent_at)
+SELECT gen_random_uuid(),
+       CASE WHEN g % 100 = 0 THEN 'draft' WHEN g % 100 = 1 THEN 'pending_payment'
+            WHEN g % 2 = 0 THEN 'paid' ELSE 'archived' END,
+       'USD', 0, 0,
+       NOW() - (g || ' minutes')::interval, NOW(),
+       g % 5000 = 2,
+       CASE WHEN g % 5000 = 4 THEN NULL ELSE NOW() END,
+       'TRK' || g,
+       NOW()
+FROM generate_series(1, :rows) AS g
+"""
+
+CHECKS = [
+    (
+        "post-payment pending work",
+        str(pending_work_query().compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})),
+        {},
+        "ix_orders_post_payment_pending",
+    ),
+    ("archive stale orders", ARCHIVE_SQL.strip().rstrip(";"), {"batch_size": 1000}, "ix_orders_stale_created_at"),
+]
+
+
+def _index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= _index_names(child)
+    return names
+
+
+async def main(rows: int = 200_000) -> int:
+    failed = 0
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            await conn.execute(text(SEED_SQL), {"rows": rows})
+            await conn.execute(text("ANALYZE orders"))
+            for name, sql, params, expected in CHECKS:
+                res = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params)
+                raw = res.scalar_one()
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                used = _index_names(plan)
+                ok = expected in used
+                failed += not ok
+                print(f"{'OK  ' if ok else 'FAIL'} {name}: expected {expected}, plan uses {sorted(used) or 'seq scan'}")
+        finally:
+            await trans.rollback()
+    await engine.dispose()
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
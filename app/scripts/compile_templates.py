@@ -0,0 +1,22 @@
+import time
+
+from app.core.templates import BYTECODE_DIR, templates
+
+
+def main():
+    # Запускать на деплое до старта воркеров: get_template() компилирует
+    # шаблон и кладёт байткод в BYTECODE_DIR, воркеры стартуют уже тёплыми.
+    env = templates.env
+    started = time.perf_counter()
+    # ключ байткода — имя и исходник шаблона, настройки окружения (autoescape, расширения)
+    # в него не входят: старый кэш после их смены отдавал бы код, собранный по-старому
+    env.bytecode_cache.clear()
+    names = env.list_templates(extensions=["html", "txt", "xml"])
+    for name in names:
+        env.get_template(name)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"Compiled {len(names)} templates into {BYTECODE_DIR} in {elapsed:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from app.services.blobs import BLOBS_DIR, collect_garbage
+
+
+def main():
+    # blob без внешних ссылок (nlink == 1): медиа удалили, мокапы/папки заказов почистили
+    removed, freed = collect_garbage()
+    print(f"Removed {removed} unreferenced blobs from {BLOBS_DIR}, freed {freed / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
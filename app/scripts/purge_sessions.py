@@ -0,0 +1,15 @@
+import asyncio
+
+from app.core.config import settings
+from app.core.sessions import SessionStore
+from app.db.session import engine
+
+
+async def main():
+    store = SessionStore(engine, max_entries=0, max_age=settings.session_max_age)
+    count = await store.purge_expired()
+    print(f"Purged {count} expired sessions")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
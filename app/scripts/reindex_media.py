@@ -0,0 +1,74 @@
+import asyncio
+
+import anyio
+from sqlalchemy import delete, select
+
+from app.db.models.media import MediaAsset
+from app.db.session import worker_session
+from app.repos.media import MediaRepo
+from app.services.blobs import intern
+from app.services.images import STATIC_DIR
+from app.services.media import FORMATS_BY_EXTENSION, extract_metadata
+
+MEDIA_ROOT = STATIC_DIR / "images"
+
+
+def _scan():
+    folders, files = [], []
+    for path in sorted(MEDIA_ROOT.rglob("*")):
+        rel = path.relative_to(MEDIA_ROOT).as_posix()
+        if path.is_dir():
+            folders.append(rel)
+        elif path.suffix.lower() in FORMATS_BY_EXTENSION and not path.name.startswith("."):
+            files.append(path)
+    return folders, files
+
+
+async def main():
+    # Первичное заполнение / сверка индекса медиатеки с диском (после ручных правок в static/images)
+    MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+    folders, files = await anyio.to_thread.run_sync(_scan)
+
+    async with worker_session() as session:
+        known = {
+            path: sha
+            for path, sha in (await session.execute(select(MediaAsset.path, MediaAsset.sha256))).all()
+        }
+        seen = set(folders)
+        for folder in folders:
+            await MediaRepo.ensure_folder(session, folder)
+
+        indexed = 0
+        for path in files:
+            rel = path.relative_to(MEDIA_ROOT).as_posix()
+            seen.add(rel)
+            try:
+                meta = await anyio.to_thread.run_sync(extract_metadata, path)
+            except Exception as exc:
+                print(f"Skipped {rel}: {exc}")
+                continue
+            # заодно переводим старые файлы на blob-хранилище (дедупликация)
+            await anyio.to_thread.run_sync(intern, path, meta.sha256)
+            if known.get(rel) == meta.sha256:
+                continue
+            await MediaRepo.upsert_file(
+                session,
+                rel,
+                size_bytes=meta.size_bytes,
+                width=meta.width,
+                height=meta.height,
+                format=meta.format,
+                sha256=meta.sha256,
+            )
+            indexed += 1
+
+        stale = [path for path in known if path not in seen]
+        if stale:
+            await session.execute(delete(MediaAsset).where(MediaAsset.path.in_(stale)))
+        await session.commit()
+
+    print(f"Indexed {indexed} files, {len(folders)} folders, removed {len(stale)} stale entries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
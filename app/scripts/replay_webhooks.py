@@ -0,0 +1,42 @@
+import asyncio
+import sys
+
+from app.db.session import worker_session
+from app.repos.webhook_events import WebhookEventsRepo
+from app.services.webhook_events import apply_pending, rebuild_order
+
+
+async def replay(order_ref: str, *, rebuild: bool) -> int | None:
+    async with worker_session() as session:
+        if rebuild:
+            applied = await rebuild_order(session, order_ref)
+        else:
+            applied = await apply_pending(session, order_ref)
+        await session.commit()
+    return applied
+
+
+async def main():
+    # без аргументов — доприменить всё, что осталось received (воркер лежал, задача ушла в dead);
+    # с order_ref (NRD-... или REFNO 2CO) — пересобрать платёжное состояние заказа из всех его событий
+    order_refs = sys.argv[1:]
+    if not order_refs:
+        async with worker_session() as session:
+            targets = await WebhookEventsRepo.pending_refs(session)
+    else:
+        targets = order_refs
+
+    for order_ref in targets:
+        try:
+            applied = await replay(order_ref, rebuild=bool(order_refs))
+        except Exception as exc:
+            print(f"{order_ref}: failed ({type(exc).__name__}: {exc})")
+            continue
+        if applied is None:
+            print(f"{order_ref}: skipped, no complete event history (order older than the log or no events)")
+            continue
+        print(f"{order_ref}: applied {applied} events")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
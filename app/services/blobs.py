@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import errno
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from app.core.directories import STATIC_DIR
+
+log = logging.getLogger("blobs")
+
+# Контент-адресное хранилище: static/out/blobs/ab/cd/<sha256>.
+# Файлы медиатеки и превью заказов — hardlink'и на blob, счётчик ссылок ведёт ФС
+# (st_nlink), поэтому отдельной таблицы refcount нет: blob с nlink == 1 никому не нужен.
+BLOBS_DIR = STATIC_DIR / "out" / "blobs"
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(sha256: str) -> Path:
+    return BLOBS_DIR / sha256[:2] / sha256[2:4] / sha256
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_to(blob: Path, dst: Path) -> None:
+    """Атомарно делает dst ссылкой на blob (заменяя то, что там было)."""
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.link")
+    tmp.unlink(missing_ok=True)
+    os.link(blob, tmp)
+    try:
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def intern(path: Path, sha256: str | None = None) -> Path | None:
+    """
+    Кладёт содержимое path в хранилище и превращает path в ссылку на blob.
+    Если такие байты уже есть — копия path освобождается, остаётся одна на диске.
+    Возвращает blob или None, если хранилище на другой ФС (тогда файл остаётся как есть).
+    Синхронная, вызывать не из event loop.
+    """
+    sha = sha256 or file_sha256(path)
+    blob = blob_path(sha)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    # несколько попыток: blob может удалить параллельный collect между link и replace
+    for _ in range(3):
+        try:
+            os.link(path, blob)
+            return blob
+        except FileExistsError:
+            pass
+        except OSError as exc:
+            if exc.errno == errno.EXDEV:
+                log.warning("Blob store is on another filesystem, %s stays a plain file", path)
+                return None
+            raise
+        try:
+            if not os.path.samefile(path, blob):
+                link_to(blob, path)
+            return blob
+        except FileNotFoundError:
+            continue
+    raise RuntimeError(f"Could not intern {path}")
+
+
+def refcount(blob: Path) -> int:
+    """Сколько файлов вне хранилища ссылается на blob."""
+    try:
+        return blob.stat().st_nlink - 1
+    except FileNotFoundError:
+        return 0
+
+
+def release(sha256: str | None) -> bool:
+    """Вызывать после удаления ссылки: blob без ссылок удаляется сразу."""
+    if not sha256:
+        return False
+    blob = blob_path(sha256)
+    if refcount(blob) > 0:
+        return False
+    blob.unlink(missing_ok=True)
+    return True
+
+
+def collect_garbage() -> tuple[int, int]:
+    """Полный проход по хранилищу: удаляет blob'ы без ссылок. -> (удалено, освобождено байт)."""
+    removed = freed = 0
+    if not BLOBS_DIR.exists():
+        return removed, freed
+    for blob in BLOBS_DIR.glob("*/*/*"):
+        try:
+            st = blob.stat()
+        except FileNotFoundError:
+            continue
+        if st.st_nlink > 1:
+            continue
+        blob.unlink(missing_ok=True)
+        removed += 1
+        freed += st.st_size
+    return removed, freed
@@ -21,8 +21,8 @@
 
 from decimal import Decimal, ROUND_HALF_UP
 
-CASE_DISCOUNT_QTY = 2
-CASE_DISCOUNT_RATE = Decimal("0.15")
+from app.services.promotions import current_plan
+
 
 def money(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
@@ -30,29 +30,13 @@ def money(x: Decimal) -> Decimal:
 class CartService:
     @staticmethod
     def recalc(order) -> None:
-        # subtotal товаров
-        subtotal = Decimal("0.00")
-        total_qty = 0
-
-        for it in order.items or []:
-            unit = it.unit_price or Decimal("0.00")
-            qty = int(it.qty or 0)
-            subtotal += unit * qty
-            total_qty += qty
-
-        subtotal = money(subtotal)
-
-        # скидка: >= 2 чехлов (пока считаем, что все items — чехлы)
-        discount = Decimal("0.00")
-        reason = None
-
-        if total_qty >= CASE_DISCOUNT_QTY:
-            discount = money(subtotal * CASE_DISCOUNT_RATE)
-            reason = "2_cases_15"
+        # subtotal и скидка — одним проходом по скомпилированному плану акций
+        # (правила живут в ContentBlock "promotions", без похода в БД на запрос)
+        result = current_plan().evaluate(order.items or [])
 
-        order.subtotal = subtotal
-        order.discount_amount = discount
-        order.discount_reason = reason
+        order.subtotal = result.subtotal
+        order.discount_amount = result.discount
+        order.discount_reason = result.reason
 
         # если у тебя есть доставка — подставь
         shipping = getattr(order, "shipping_amount", None)
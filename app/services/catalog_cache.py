@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.invalidation import dispatch, publish, subscribe
+from app.db.models.content import ContentBlock
+from app.db.models.product import Product, Variant
+from app.db.session import AsyncSessionLocal
+
+log = logging.getLogger("catalog_cache")
+
+CATALOG_TOPIC = "catalog"
+FEATURED_CONFIG_KEY = "featured_products"
+
+
+@dataclass(frozen=True, slots=True)
+class ProductView:
+    """Снимок товара для витрины. Не ORM-объект: не лезет в БД и не протухает после сессии."""
+
+    id: int
+    slug: str
+    title: str
+    description: str | None
+    base_price: Decimal
+    currency: str
+    personalization_schema: dict[str, Any]
+    images: tuple[dict[str, str], ...]
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class VariantView:
+    id: int
+    product_id: int | None
+    sku: str
+    device_brand: str
+    device_model: str
+    price_delta: Decimal
+    stock_qty: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    generation: int
+    loaded_at: datetime
+    products: tuple[ProductView, ...]  # активные, новые первыми (как ProductsRepo.list_active)
+    variants: tuple[VariantView, ...]  # активные, brand/model (как VariantsRepo.list_active)
+    by_slug: Mapping[str, ProductView] = field(default_factory=dict)
+    featured_config: Mapping[str, Any] | None = None  # ContentBlock "featured_products", см. services/featured.py
+    # payload пикера моделей: уже сериализован, отдаётся как есть (/api/variants.json)
+    variants_json: bytes = b"[]"
+    variants_hash: str = ""
+
+    def product(self, slug: str) -> ProductView | None:
+        return self.by_slug.get(slug)
+
+
+def _product_view(p: Product) -> ProductView:
+    return ProductView(
+        id=p.id,
+        slug=p.slug,
+        title=p.title,
+        description=p.description,
+        base_price=p.base_price,
+        currency=p.currency,
+        personalization_schema=dict(p.personalization_schema or {}),
+        images=tuple(dict(img) for img in (p.images or [])),
+        created_at=p.created_at,
+    )
+
+
+def _variant_view(v: Variant) -> VariantView:
+    return VariantView(
+        id=v.id,
+        product_id=v.product_id,
+        sku=v.sku,
+        device_brand=v.device_brand,
+        device_model=v.device_model,
+        price_delta=v.price_delta or Decimal("0.00"),
+        stock_qty=v.stock_qty,
+    )
+
+
+def _variants_payload(variants: tuple[VariantView, ...]) -> tuple[bytes, str]:
+    # формат, который ждёт product.js: плоский список, сгруппирован по бренду
+    ordered = sorted(variants, key=lambda v: (v.device_brand.casefold(), v.device_model.casefold(), v.id))
+    payload = [
+        {
+            "id": v.id,
+            "brand": v.device_brand,
+            "model": v.device_model,
+            "price_delta": float(v.price_delta or 0),
+        }
+        for v in ordered
+    ]
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+class CatalogCache:
+    """
+    Каталог в памяти процесса. Снимок иммутабелен и подменяется целиком;
+    generation растёт на каждую инвалидацию, снимок помнит, с какой
+    generation он собран, и при расхождении перечитывается на следующем запросе.
+    TTL — страховка на случай, если LISTEN-коннект лежал и NOTIFY потерялись.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.generation = 1
+        self._snapshot: CatalogSnapshot | None = None
+        self._loaded_monotonic = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, snap: CatalogSnapshot | None) -> bool:
+        return (
+            snap is not None
+            and snap.generation == self.generation
+            and time.monotonic() - self._loaded_monotonic < self.ttl_seconds
+        )
+
+    async def get(self) -> CatalogSnapshot:
+        snap = self._snapshot
+        if self._is_fresh(snap):
+            return snap
+
+        async with self._lock:
+            # пока ждали лок, снимок мог собрать соседний запрос
+            if self._is_fresh(self._snapshot):
+                return self._snapshot
+            return await self._reload()
+
+    async def _reload(self) -> CatalogSnapshot:
+        generation = self.generation
+        # читаем с primary: после NOTIFY реплика может ещё не догнать
+        async with AsyncSessionLocal() as session:
+            products = (
+                await session.execute(
+                    select(Product).where(Product.is_active.is_(True)).order_by(Product.id.desc())
+                )
+            ).scalars().all()
+            variants = (
+                await session.execute(
+                    select(Variant)
+                    .where(Variant.is_active.is_(True))
+                    .order_by(Variant.device_brand.asc(), Variant.device_model.asc())
+                )
+            ).scalars().all()
+            featured_config = (
+                await session.execute(
+                    select(ContentBlock.payload).where(ContentBlock.key == FEATURED_CONFIG_KEY)
+                )
+            ).scalar_one_or_none()
+
+        product_views = tuple(_product_view(p) for p in products)
+        variant_views = tuple(_variant_view(v) for v in variants)
+        variants_json, variants_hash = _variants_payload(variant_views)
+        snap = CatalogSnapshot(
+            generation=generation,
+            loaded_at=datetime.now(timezone.utc),
+            products=product_views,
+            variants=variant_views,
+            by_slug=MappingProxyType({p.slug: p for p in product_views}),
+            featured_config=featured_config,
+            variants_json=variants_json,
+            variants_hash=variants_hash,
+        )
+        self._snapshot = snap
+        self._loaded_monotonic = time.monotonic()
+        log.info(
+            "Catalog snapshot loaded | generation=%s products=%s variants=%s",
+            generation,
+            len(snap.products),
+            len(snap.variants),
+        )
+        return snap
+
+    def invalidate(self) -> None:
+        self.generation += 1
+
+
+catalog_cache = CatalogCache(ttl_seconds=settings.catalog_cache_ttl_seconds)
+subscribe(CATALOG_TOPIC, catalog_cache.invalidate)
+
+
+async def commit_catalog_change(session: AsyncSession) -> None:
+    """
+    Коммит правки каталога из админки: NOTIFY уходит в той же транзакции,
+    локальные кэши сбрасываем сразу после коммита, не дожидаясь LISTEN.
+    """
+    await publish(session, CATALOG_TOPIC)
+    await session.commit()
+    await dispatch(CATALOG_TOPIC)
@@ -1,8 +1,16 @@
-import httpx
+import json
 import logging
-from app.core.config import settings
+from dataclasses import dataclass
+from functools import lru_cache
 
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.http import request
+from app.core.templates import templates
+from app.repos.email_outbox import EmailOutboxRepo
 
 log = logging.getLogger("emails")
 
@@ -11,177 +19,130 @@ MAILGUN_DOMAIN = "mg.noirid.com"
 MAILGUN_FROM = "NOIRID <noreply@mg.noirid.com>"
 BASE_URL = "https://noirid.com"  # Твой основной домен
 
+OUTBOX_CHANNEL = "noirid_outbox"
 
-async def send_success_payment_email(email: str, order_number: str):
-    if not MAILGUN_API_KEY:
-        log.error("MAILGUN_API_KEY is not set in environment variables!")
-    url = f"https://api.mailgun.net/v3/{MAILGUN_DOMAIN}/messages"
-    auth = ("api", MAILGUN_API_KEY)
-
-    # Ссылка на твой трэкинг
-    tracking_url = f"{BASE_URL}/order/{order_number}"
-
-    html_content = f"""
-        <html>
-            <head>
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            </head>
-            <body style="background-color: #000000; color: #ffffff; font-family: 'Helvetica', Arial, sans-serif; margin: 0; padding: 60px 20px; text-align: center;">
-                <div style="max-width: 600px; margin: 0 auto;">
-                    <h1 style="font-size: 24px; letter-spacing: 8px; text-transform: uppercase; font-weight: 300; margin-bottom: 40px;">
-                        NOIRID
-                    </h1>
-
-                    <div style="border-top: 1px solid #222; border-bottom: 1px solid #222; padding: 40px 0; margin-bottom: 40px;">
-                        <p style="text-transform: uppercase; letter-spacing: 2px; font-size: 12px; color: #888; margin-bottom: 10px;">
-                            Status: Confirmed
-                        </p>
-                        <h2 style="font-size: 20px; font-weight: 300; margin-bottom: 25px;">
-                            Payment Received
-                        </h2>
-                        <p style="font-size: 14px; line-height: 1.6; color: #ccc; margin-bottom: 30px;">
-                            Your custom piece is now in production. <br> 
-                            We will notify you as soon as it's ready for shipment.
-                        </p>
-
-                        <div style="background-color: #111; padding: 15px; display: inline-block; border-radius: 2px;">
-                            <span style="font-size: 11px; color: #555; text-transform: uppercase; display: block; margin-bottom: 5px;">Order ID</span>
-                            <span style="font-size: 16px; letter-spacing: 3px; font-weight: bold; color: #fff;">{order_number}</span>
-                        </div>
-                    </div>
-
-                    <div style="margin-top: 20px;">
-                        <a href="{tracking_url}" 
-                           style="display: inline-block; background-color: #ffffff; color: #000000; padding: 18px 40px; text-decoration: none; font-size: 11px; font-weight: bold; letter-spacing: 2px; text-transform: uppercase; border-radius: 0px;">
-                           Track Order
-                        </a>
-                    </div>
-
-                    <p style="margin-top: 80px; font-size: 10px; letter-spacing: 1px; color: #444; text-transform: uppercase;">
-                        Designed for the dark. &copy; 2026 NOIRID.
-                    </p>
-                </div>
-            </body>
-        </html>
-        """
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                url,
-                auth=auth,
-                data={
-                    "from": MAILGUN_FROM,
-                    "to": [email],
-                    "subject": f"Order {order_number} confirmed | NOIRID",
-                    "html": html_content,
-                    "text": f"Your order {order_number} is confirmed. Track it here: {tracking_url}",
-                },
-            )
-            response.raise_for_status()
-            log.info(f"Email sent to {email} for order {order_number}")
-        except Exception as e:
-            log.error(f"Mailgun error: {str(e)}")
-
-async def send_tracking_email(
+
+@dataclass(frozen=True, slots=True)
+class EmailTemplate:
+    subject: str
+    html: str
+    text: str
+    # переменные подставляет Mailgun для каждого получателя: %recipient.<name>%,
+    # без HTML-экранирования — только наши значения (номера заказов, трекинг, URL)
+    variables: tuple[str, ...]
+
+
+EMAIL_TEMPLATES = {
+    "payment_confirmed": EmailTemplate(
+        subject="Order {order_number} confirmed | NOIRID",
+        html="emails/payment_confirmed.html",
+        text="emails/payment_confirmed.txt",
+        variables=("order_number", "tracking_url"),
+    ),
+    "tracking": EmailTemplate(
+        subject="Order {order_number} shipped | NOIRID",
+        html="emails/tracking.html",
+        text="emails/tracking.txt",
+        variables=("order_number", "tracking_number", "tracking_url"),
+    ),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedEmail:
+    subject: str
+    html: str
+    text: str
+
+
+@lru_cache(maxsize=None)
+def render_batch_template(name: str) -> RenderedEmail:
+    """
+    Шаблон рендерится один раз на процесс — с плейсхолдерами Mailgun вместо значений,
+    поэтому одно и то же тело уходит всей пачке, а Mailgun подставляет переменные сам.
+    """
+    tpl = EMAIL_TEMPLATES[name]
+    placeholders = {var: f"%recipient.{var}%" for var in tpl.variables}
+    return RenderedEmail(
+        subject=tpl.subject.format(**placeholders),
+        html=templates.env.get_template(tpl.html).render(**placeholders),
+        text=templates.env.get_template(tpl.text).render(**placeholders),
+    )
+
+
+async def queue_email(
+    session: AsyncSession,
+    template: str,
+    to_email: str,
+    variables: dict[str, str],
+    *,
+    dedup_key: str | None = None,
+) -> int | None:
+    """Кладёт письмо в outbox в транзакции вызывающего; отправит workers/email_sender.py."""
+    missing = set(EMAIL_TEMPLATES[template].variables) - variables.keys()
+    if missing:
+        raise ValueError(f"Email {template!r} is missing variables: {sorted(missing)}")
+    email_id = await EmailOutboxRepo.add(
+        session, template=template, to_email=to_email, variables=variables, dedup_key=dedup_key
+    )
+    if email_id is not None:
+        await session.execute(select(func.pg_notify(OUTBOX_CHANNEL, template)))
+    return email_id
+
+
+async def queue_payment_email(session: AsyncSession, *, order_id: str, email: str, order_number: str) -> int | None:
+    return await queue_email(
+        session,
+        "payment_confirmed",
+        email,
+        {"order_number": order_number, "tracking_url": f"{BASE_URL}/order/{order_number}"},
+        dedup_key=f"payment_confirmed:{order_id}",
+    )
+
+
+async def queue_tracking_email(
+    session: AsyncSession,
+    *,
+    order_id: str,
     email: str,
     order_number: str,
     tracking_number: str,
-):
-    if not MAILGUN_API_KEY:
-        log.error("MAILGUN_API_KEY is not set in environment variables!")
-        return
-
-    url = f"https://api.mailgun.net/v3/{MAILGUN_DOMAIN}/messages"
-    auth = ("api", MAILGUN_API_KEY)
-
+) -> int | None:
     # если потом появится страница трекинга — просто поменяешь URL
-    tracking_url = f"{BASE_URL}/order/{order_number}"
-
-    html_content = f"""
-    <html>
-      <head>
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-      </head>
-      <body style="background-color:#000; color:#fff; font-family:Helvetica, Arial, sans-serif; margin:0; padding:60px 20px; text-align:center;">
-        <div style="max-width:600px; margin:0 auto;">
-
-          <h1 style="font-size:24px; letter-spacing:8px; text-transform:uppercase; font-weight:300; margin-bottom:40px;">
-            NOIRID
-          </h1>
-
-          <div style="border-top:1px solid #222; border-bottom:1px solid #222; padding:40px 0; margin-bottom:40px;">
-
-            <p style="text-transform:uppercase; letter-spacing:2px; font-size:12px; color:#888; margin-bottom:10px;">
-              Status: Shipped
-            </p>
-
-            <h2 style="font-size:20px; font-weight:300; margin-bottom:25px;">
-              Your Order Has Shipped
-            </h2>
-
-            <p style="font-size:14px; line-height:1.6; color:#ccc; margin-bottom:35px;">
-              Your custom piece is on its way.<br>
-              Use the tracking number below to follow the delivery.
-            </p>
-
-            <div style="margin-bottom:25px;">
-              <div style="font-size:11px; color:#555; text-transform:uppercase; letter-spacing:1px; margin-bottom:6px;">
-                Tracking Number
-              </div>
-              <div style="background-color:#111; padding:16px 24px; display:inline-block;">
-                <span style="font-size:16px; letter-spacing:3px; font-weight:bold; color:#fff;">
-                  {tracking_number}
-                </span>
-              </div>
-            </div>
-
-            <div style="margin-top:10px;">
-              <div style="font-size:11px; color:#555; text-transform:uppercase; margin-bottom:6px;">
-                Order ID
-              </div>
-              <span style="font-size:13px; letter-spacing:2px; color:#aaa;">
-                {order_number}
-              </span>
-            </div>
-
-          </div>
-
-          <div>
-            <a href="{tracking_url}"
-               style="display:inline-block; background:#fff; color:#000; padding:18px 40px; text-decoration:none;
-                      font-size:11px; font-weight:bold; letter-spacing:2px; text-transform:uppercase;">
-              View Order
-            </a>
-          </div>
-
-          <p style="margin-top:80px; font-size:10px; letter-spacing:1px; color:#444; text-transform:uppercase;">
-            Designed for the dark. &copy; 2026 NOIRID.
-          </p>
-
-        </div>
-      </body>
-    </html>
+    return await queue_email(
+        session,
+        "tracking",
+        email,
+        {
+            "order_number": order_number,
+            "tracking_number": tracking_number,
+            "tracking_url": f"{BASE_URL}/order/{order_number}",
+        },
+        # номер в ключе: письмо с исправленным номером не конфликтует с уже отправленным
+        dedup_key=f"tracking:{order_id}:{tracking_number}",
+    )
+
+
+async def send_batch(template: str, recipients: dict[str, dict[str, str]]) -> httpx.Response:
     """
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                url,
-                auth=auth,
-                data={
-                    "from": MAILGUN_FROM,
-                    "to": [email],
-                    "subject": f"Order {order_number} shipped | NOIRID",
-                    "html": html_content,
-                    "text": (
-                        f"Your order {order_number} has shipped.\n"
-                        f"Tracking number: {tracking_number}\n"
-                        f"{tracking_url}"
-                    ),
-                },
-            )
-            response.raise_for_status()
-            log.info(f"Tracking email sent to {email} for order {order_number}")
-        except Exception as e:
-            log.error(f"Mailgun tracking email error: {str(e)}")
+    Один запрос Mailgun на всю пачку (batch sending): to = все адреса,
+    recipient-variables — значения для каждого. Каждый получатель видит только себя.
+    Адрес в пачке должен быть уникальным — это ключ recipient-variables.
+    """
+    if not MAILGUN_API_KEY:
+        log.error("MAILGUN_API_KEY is not set in environment variables!")
+    rendered = render_batch_template(template)
+    return await request(
+        "mailgun",
+        "POST",
+        f"{settings.mailgun_base_url}/{MAILGUN_DOMAIN}/messages",
+        auth=("api", MAILGUN_API_KEY),
+        data={
+            "from": MAILGUN_FROM,
+            "to": list(recipients),
+            "subject": rendered.subject,
+            "html": rendered.html,
+            "text": rendered.text,
+            "recipient-variables": json.dumps(recipients),
+        },
+    )
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import random
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Any, Mapping
+
+from app.services.catalog_cache import CatalogSnapshot, ProductView
+
+MODES = {"weighted", "rotation"}
+
+
+def _parse_dt(value: Any, field: str) -> datetime | None:
+    if value in (None, ""):
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value))
+    except ValueError as exc:
+        raise ValueError(f"'{field}' must be an ISO datetime") from exc
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True, slots=True)
+class FeaturedEntry:
+    product: ProductView
+    weight: float
+    starts_at: datetime | None = None
+    ends_at: datetime | None = None
+
+    def is_live(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+
+@dataclass(frozen=True, slots=True)
+class FeaturedSelector:
+    """
+    Собирается один раз на снимок каталога. pick() — чистая арифметика
+    по готовым массивам, без БД и без сортировок.
+    """
+
+    mode: str
+    entries: tuple[FeaturedEntry, ...]
+    cum_weights: tuple[float, ...]
+    has_windows: bool
+    rotation_seconds: int
+    fallback: tuple[ProductView, ...]
+
+    def pick(self, now: datetime | None = None, rng: random.Random | None = None) -> ProductView | None:
+        rng = rng or random
+        entries, cum = self.entries, self.cum_weights
+        if self.has_windows:
+            now = now or datetime.now(timezone.utc)
+            entries = tuple(e for e in entries if e.is_live(now))
+            cum = tuple(accumulate(e.weight for e in entries))
+
+        if not entries:
+            return rng.choice(self.fallback) if self.fallback else None
+
+        if self.mode == "rotation":
+            now = now or datetime.now(timezone.utc)
+            slot = int(now.timestamp()) // self.rotation_seconds
+            return entries[slot % len(entries)].product
+
+        return entries[bisect_right(cum, rng.random() * cum[-1])].product
+
+
+def compile_featured(config: Mapping[str, Any] | None, snapshot: CatalogSnapshot) -> FeaturedSelector:
+    """
+    config (ContentBlock "featured_products"):
+      {"mode": "weighted"|"rotation", "rotation_minutes": 60,
+       "items": [{"slug": "...", "weight": 3, "starts_at": "...", "ends_at": "..."}]}
+    Пустой конфиг = равномерно по всем активным товарам.
+    Неактивные/удалённые slug'и молча пропускаются — каталог мог поменяться.
+    """
+    config = config or {}
+    mode = config.get("mode") or "weighted"
+    if mode not in MODES:
+        raise ValueError(f"Unknown featured mode '{mode}'")
+
+    try:
+        rotation_minutes = int(config.get("rotation_minutes") or 60)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("'rotation_minutes' must be an integer") from exc
+    if rotation_minutes < 1:
+        raise ValueError("'rotation_minutes' must be >= 1")
+
+    items = config.get("items") or []
+    if not isinstance(items, list):
+        raise ValueError("'items' must be a list")
+
+    entries: list[FeaturedEntry] = []
+    for idx, raw in enumerate(items):
+        if not isinstance(raw, dict) or not raw.get("slug"):
+            raise ValueError(f"Item #{idx} needs a 'slug'")
+        try:
+            weight = float(raw.get("weight", 1))
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Item #{idx}: 'weight' must be a number") from exc
+        if weight <= 0:
+            raise ValueError(f"Item #{idx}: 'weight' must be > 0")
+
+        product = snapshot.product(str(raw["slug"]))
+        if product is None:
+            continue
+        entries.append(
+            FeaturedEntry(
+                product=product,
+                weight=weight,
+                starts_at=_parse_dt(raw.get("starts_at"), "starts_at"),
+                ends_at=_parse_dt(raw.get("ends_at"), "ends_at"),
+            )
+        )
+
+    return FeaturedSelector(
+        mode=mode,
+        entries=tuple(entries),
+        cum_weights=tuple(accumulate(e.weight for e in entries)),
+        has_windows=any(e.starts_at or e.ends_at for e in entries),
+        rotation_seconds=rotation_minutes * 60,
+        fallback=snapshot.products,
+    )
+
+
+_compiled: tuple[CatalogSnapshot, FeaturedSelector] | None = None
+
+
+def selector_for(snapshot: CatalogSnapshot) -> FeaturedSelector:
+    global _compiled
+    if _compiled is None or _compiled[0] is not snapshot:
+        try:
+            selector = compile_featured(snapshot.featured_config, snapshot)
+        except ValueError:
+            # конфиг валидируется при сохранении; сюда попадём, только если его правили руками в БД
+            selector = compile_featured(None, snapshot)
+        _compiled = (snapshot, selector)
+    return _compiled[1]
+
+
+def pick_featured(snapshot: CatalogSnapshot) -> ProductView | None:
+    return selector_for(snapshot).pick()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.sessions import load_session
+from app.repos.idempotency import IdempotencyRepo
+
+log = logging.getLogger("idempotency")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LEN = 128
+# id клиента в сессии: ключ действует только в пределах того, кто его прислал
+CLIENT_SESSION_KEY = "idem_client"
+
+
+@dataclass(frozen=True)
+class IdempotencyGuard:
+    """
+    Ответ сохраняется в той же транзакции, что и изменения заказа.
+    Два одновременных ретрая упираются в PK (scope, key): второй коммит
+    откатывается целиком и отдаёт ответ первого — без двойного qty и
+    без второго Payment.
+    """
+
+    scope: str
+    key: str | None
+    request_hash: str
+
+    async def replay(self, session: AsyncSession) -> JSONResponse | None:
+        if not self.key:
+            return None
+
+        row = await IdempotencyRepo.get(session, self.scope, self.key)
+        if row is None:
+            return None
+
+        if row.expires_at <= datetime.now(timezone.utc):
+            # протух — освобождаем ключ, запрос выполнится заново
+            await session.delete(row)
+            await session.flush()
+            return None
+
+        if row.request_hash != self.request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+
+        log.info("Idempotent replay | scope=%s | key=%s", self.scope, self.key)
+        return JSONResponse(row.response_body, status_code=row.status_code, headers={REPLAYED_HEADER: "true"})
+
+    async def commit(self, session: AsyncSession, response: Any, status_code: int = 200) -> JSONResponse | None:
+        """
+        Коммитит сессию вместе с сохранённым ответом.
+        None — всё ок, отдавай свой ответ; JSONResponse — мы проиграли гонку, отдай его.
+        """
+        if not self.key:
+            await session.commit()
+            return None
+
+        IdempotencyRepo.add(
+            session,
+            scope=self.scope,
+            key=self.key,
+            request_hash=self.request_hash,
+            status_code=status_code,
+            response_body=jsonable_encoder(response),
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.idempotency_ttl_seconds),
+        )
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            replayed = await self.replay(session)
+            if replayed is None:
+                raise
+            return replayed
+        return None
+
+
+def idempotency(scope: str):
+    """Depends-фабрика: читает Idempotency-Key и считает отпечаток запроса."""
+
+    async def dependency(
+        request: Request,
+        idempotency_key: str | None = Header(default=None, alias=IDEMPOTENCY_HEADER),
+    ) -> IdempotencyGuard:
+        key = (idempotency_key or "").strip() or None
+        if key is None:
+            return IdempotencyGuard(scope=scope, key=None, request_hash="")
+        if len(key) > MAX_KEY_LEN:
+            raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+        # scope + клиент: чужой запрос с тем же ключом и телом не получит сохранённый ответ
+        # (там корзина/заказ первого клиента), а выполнится как свой
+        await load_session(request)
+        client = request.session.get(CLIENT_SESSION_KEY)
+        if not client:
+            client = request.session[CLIENT_SESSION_KEY] = secrets.token_urlsafe(16)
+
+        digest = hashlib.sha256()
+        digest.update(f"{request.method} {request.url.path}\n".encode("utf-8"))
+        digest.update(await request.body())
+        return IdempotencyGuard(scope=f"{scope}:{client}", key=key, request_hash=digest.hexdigest())
+
+    return dependency
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+import anyio
+from PIL import Image, ImageOps
+
+STATIC_DIR = Path(__file__).resolve().parents[1] / "static"
+DERIVATIVES_DIR = STATIC_DIR / "out" / "derivatives"
+
+# ширины под типовые экраны: мобилка, мобилка@2x/планшет, десктоп, retina-десктоп
+WIDTHS = (320, 640, 1080, 1600)
+
+# откуда разрешено резать: медиатека админки и картинки вёрстки
+SOURCE_ROOTS = ("images", "img")
+RASTER_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+DERIVATIVE_URL_PREFIX = "/img"
+WEBP_QUALITY = 80
+
+_locks: dict[Path, asyncio.Lock] = {}
+
+
+def source_for_url(url: str | None) -> Path | None:
+    """'/static/images/products/a.webp' -> абсолютный путь, если это наша растровая картинка."""
+    if not url or not url.startswith("/static/"):
+        return None
+    rel = url[len("/static/"):].split("?", 1)[0]
+    return source_for_path(rel)
+
+
+def source_for_path(rel: str) -> Path | None:
+    if not rel.startswith(tuple(f"{root}/" for root in SOURCE_ROOTS)):
+        return None
+    path = (STATIC_DIR / rel).resolve()
+    if not path.is_relative_to(STATIC_DIR) or path.suffix.lower() not in RASTER_EXTENSIONS:
+        return None
+    return path
+
+
+def derivative_path(source: Path, width: int) -> Path:
+    rel = source.relative_to(STATIC_DIR)
+    # всегда webp: и для png-исходников это в разы легче
+    return DERIVATIVES_DIR / f"w{width}" / rel.with_suffix(".webp")
+
+
+def derivative_url(source: Path, width: int) -> str:
+    rel = source.relative_to(STATIC_DIR).as_posix()
+    return f"{DERIVATIVE_URL_PREFIX}/w{width}/{rel}"
+
+
+@lru_cache(maxsize=4096)
+def _image_size(path: str, mtime_ns: int) -> tuple[int, int] | None:
+    # Image.open читает только заголовок, без декодирования пикселей
+    try:
+        with Image.open(path) as im:
+            return im.size
+    except (OSError, ValueError):
+        return None
+
+
+def image_size(source: Path) -> tuple[int, int] | None:
+    try:
+        st = source.stat()
+    except OSError:
+        return None
+    return _image_size(str(source), st.st_mtime_ns)
+
+
+def is_fresh(source: Path, target: Path) -> bool:
+    try:
+        return target.stat().st_mtime_ns >= source.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def render_derivative(source: Path, width: int) -> Path:
+    """Синхронно: режет одну ширину и атомарно кладёт файл. Вызывать не из event loop."""
+    target = derivative_path(source, width)
+    if is_fresh(source, target):
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            im = im.resize((width, round(im.height * width / im.width)), Image.Resampling.LANCZOS)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                im.save(fh, "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+    return target
+
+
+def render_all(source: Path) -> list[Path]:
+    """Все ширины меньше исходника. Для загрузок из админки (фоном) и прогрева."""
+    size = image_size(source)
+    if size is None:
+        return []
+    return [render_derivative(source, w) for w in WIDTHS if w < size[0]]
+
+
+async def ensure_derivative(source: Path, width: int) -> Path:
+    target = derivative_path(source, width)
+    if is_fresh(source, target):
+        return target
+    # один и тот же файл не режем параллельно из нескольких запросов
+    lock = _locks.setdefault(target, asyncio.Lock())
+    async with lock:
+        try:
+            return await anyio.to_thread.run_sync(render_derivative, source, width)
+        finally:
+            _locks.pop(target, None)
+
+
+def srcset(url: str | None) -> str:
+    """
+    Jinja-хелпер: srcset с ширинами меньше оригинала + сам оригинал.
+    Для чужих/нерастровых URL — пустая строка (атрибут просто ничего не даст).
+    """
+    source = source_for_url(url)
+    if source is None:
+        return ""
+    size = image_size(source)
+    if size is None:
+        return ""
+    parts = [f"{derivative_url(source, w)} {w}w" for w in WIDTHS if w < size[0]]
+    parts.append(f"{url} {size[0]}w")
+    return ", ".join(parts)
+
+
+def drop_derivatives(source: Path) -> None:
+    """После удаления/переименования исходника — чтобы не отдавать старые нарезки."""
+    for w in WIDTHS:
+        derivative_path(source, w).unlink(missing_ok=True)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repos.jobs import JobsRepo
+
+JOBS_CHANNEL = "noirid_jobs"
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+_handlers: dict[str, JobHandler] = {}
+
+
+def register(job_type: str, handler: JobHandler) -> None:
+    _handlers[job_type] = handler
+
+
+def handler_for(job_type: str) -> JobHandler | None:
+    return _handlers.get(job_type)
+
+
+async def enqueue(
+    session: AsyncSession,
+    job_type: str,
+    payload: dict[str, Any],
+    *,
+    dedup_key: str | None = None,
+    delay: timedelta | None = None,
+    max_attempts: int | None = None,
+) -> int | None:
+    """
+    Ставит задачу в текущей транзакции вызывающего: commit заказа и задачи —
+    атомарно, NOTIFY уходит консьюмерам тоже только после COMMIT.
+    Возвращает id или None, если задача с таким dedup_key уже есть.
+    """
+    run_at = datetime.now(timezone.utc) + delay if delay else None
+    job_id = await JobsRepo.add(
+        session,
+        type=job_type,
+        payload=payload,
+        dedup_key=dedup_key,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.jobs_max_attempts,
+    )
+    if job_id is not None and delay is None:
+        await session.execute(select(func.pg_notify(JOBS_CHANNEL, job_type)))
+    return job_id
+
+
+def backoff(attempts: int) -> timedelta:
+    """Экспонента 10s, 20s, 40s, ... до jobs_backoff_max_seconds; джиттер разводит ретраи после общего сбоя."""
+    cap = min(settings.jobs_backoff_max_seconds, settings.jobs_backoff_base_seconds * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=random.uniform(cap / 2, cap))
+
+
+# типы задач заказа; обработчики — app/workers/post_payment.py
+POST_PAYMENT_JOB = "order.post_payment"
+TRACKING_EMAIL_JOB = "order.tracking_email"
+
+
+async def enqueue_post_payment(session: AsyncSession, order_id: str) -> int | None:
+    """Мокапы + письмо об оплате. Вызывать в той же транзакции, где заказ стал paid."""
+    return await enqueue(session, POST_PAYMENT_JOB, {"order_id": order_id}, dedup_key=f"post_payment:{order_id}")
+
+
+async def enqueue_tracking_email(session: AsyncSession, order_id: str, tracking_number: str) -> int | None:
+    # номер трекинга в ключе: исправленный номер — новое письмо, а не конфликт с отработавшей задачей
+    return await enqueue(
+        session,
+        TRACKING_EMAIL_JOB,
+        {"order_id": order_id},
+        dedup_key=f"tracking_email:{order_id}:{tracking_number}",
+    )
+
+
+# применение записанных вебхуков; обработчик — app/workers/webhook_events.py
+WEBHOOK_APPLY_JOB = "webhook.apply"
+
+
+async def enqueue_webhook_apply(session: AsyncSession, order_ref: str) -> int | None:
+    # без dedup_key: дубль задачи безвреден, второй консьюмер найдёт очередь заказа пустой
+    return await enqueue(session, WEBHOOK_APPLY_JOB, {"order_ref": order_ref})
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import anyio
+from fastapi import UploadFile
+from PIL import Image, UnidentifiedImageError
+
+from app.services.blobs import intern
+from app.services.images import render_all
+
+log = logging.getLogger("media")
+
+CHUNK_SIZE = 1024 * 1024
+
+# расширение -> что Pillow должен увидеть в заголовке; расширению не верим
+FORMATS_BY_EXTENSION = {
+    ".jpg": {"JPEG", "MPO"},
+    ".jpeg": {"JPEG", "MPO"},
+    ".png": {"PNG"},
+    ".webp": {"WEBP"},
+    ".gif": {"GIF"},
+}
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class MediaMeta:
+    path: Path
+    size_bytes: int
+    width: int
+    height: int
+    format: str
+    sha256: str
+
+
+def _validate_header(path: Path, ext: str) -> tuple[int, int, str]:
+    # Image.open читает только заголовок: формат и размеры без декодирования пикселей
+    try:
+        with Image.open(path) as im:
+            fmt, (width, height) = im.format, im.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise UploadRejected("File is not a valid image") from exc
+    if fmt not in FORMATS_BY_EXTENSION[ext]:
+        raise UploadRejected(f"File content ({fmt}) does not match extension {ext}")
+    if width * height > (Image.MAX_IMAGE_PIXELS or 0) > 0:
+        raise UploadRejected("Image is too large")
+    return width, height, fmt
+
+
+def _place(tmp: Path, target_dir: Path, filename: str) -> Path:
+    """
+    Атомарно и без перезаписи: os.link падает с FileExistsError, если имя занято,
+    поэтому нет гонки exists()/write между двумя загрузками с одинаковым именем.
+    """
+    stem, ext = Path(filename).stem, Path(filename).suffix
+    counter = 0
+    while True:
+        name = f"{stem}{ext}" if counter == 0 else f"{stem}-{counter}{ext}"
+        candidate = target_dir / name
+        try:
+            os.link(tmp, candidate)
+        except FileExistsError:
+            counter += 1
+            continue
+        tmp.unlink()
+        return candidate
+
+
+async def store_upload(upload: UploadFile, target_dir: Path, *, max_bytes: int) -> MediaMeta:
+    """
+    Стримит загрузку во временный файл рядом с целью (та же ФС — link атомарен),
+    всё дисковое I/O — в threadpool, event loop не блокируется даже на больших файлах.
+    sha256 считается по ходу записи, поэтому метаданные для индекса готовы сразу,
+    а файл тут же становится ссылкой на blob — повторная загрузка тех же байт места не занимает.
+    """
+    filename = Path(upload.filename or "").name
+    ext = Path(filename).suffix.lower()
+    if not filename or ext not in FORMATS_BY_EXTENSION:
+        raise UploadRejected("Only image files are allowed")
+
+    await anyio.to_thread.run_sync(lambda: target_dir.mkdir(parents=True, exist_ok=True))
+    fd, tmp_name = await anyio.to_thread.run_sync(
+        # .part не попадёт в листинг медиатеки, пока файл докачивается
+        lambda: tempfile.mkstemp(dir=target_dir, prefix=".upload-", suffix=".part")
+    )
+    tmp = Path(tmp_name)
+    digest = hashlib.sha256()
+    try:
+        written = 0
+        with os.fdopen(fd, "wb") as fh:
+
+            def write(chunk: bytes) -> None:
+                digest.update(chunk)
+                fh.write(chunk)
+
+            while chunk := await upload.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadRejected(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+                await anyio.to_thread.run_sync(write, chunk)
+
+        width, height, fmt = await anyio.to_thread.run_sync(_validate_header, tmp, ext)
+        path = await anyio.to_thread.run_sync(_place, tmp, target_dir, filename)
+    except BaseException:
+        await anyio.to_thread.run_sync(lambda: tmp.unlink(missing_ok=True))
+        raise
+    sha256 = digest.hexdigest()
+    await anyio.to_thread.run_sync(intern, path, sha256)
+    return MediaMeta(
+        path=path,
+        size_bytes=written,
+        width=width,
+        height=height,
+        format=fmt,
+        sha256=sha256,
+    )
+
+
+def extract_metadata(path: Path) -> MediaMeta:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    with Image.open(path) as im:
+        width, height = im.size
+        fmt = im.format or ""
+    return MediaMeta(
+        path=path,
+        size_bytes=path.stat().st_size,
+        width=width,
+        height=height,
+        format=fmt,
+        sha256=digest.hexdigest(),
+    )
+
+
+def process_upload(path: Path) -> None:
+    """Фоновая нарезка под srcset после ответа. Синхронная — идёт в threadpool."""
+    try:
+        rendered = render_all(path)
+    except Exception:
+        log.exception("Post-upload processing failed | path=%s", path)
+        return
+    log.info("Media processed | path=%s derivatives=%s", path, len(rendered))
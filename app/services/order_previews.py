@@ -5,6 +5,8 @@ import shutil
 from pathlib import Path
 from typing import Iterable
 
+from app.services.blobs import intern, link_to
+
 def _static_url_to_path(static_dir: Path, url: str) -> Path:
     rel = url.removeprefix("/static/").lstrip("/")
     return static_dir / rel
@@ -51,17 +53,18 @@ def persist_preview_files(
         ext = src.suffix.lower() or ".webp"
         dst = orders_dir / f"{item_id}{ext}"
 
-        tmp = orders_dir / f".{item_id}{ext}.tmp.{os.getpid()}"
-        try:
-            shutil.copy2(src, tmp)
-            tmp.replace(dst)  # atomic rename on same filesystem
-        finally:
-            # если copy2 успел создать tmp, но replace не произошёл
-            if tmp.exists():
-                try:
-                    tmp.unlink()
-                except Exception:
-                    pass
+        # мокап и копия заказа — одна и та же запись в blob-хранилище: persist = hardlink,
+        # одинаковые превью разных заказов лежат на диске один раз
+        blob = intern(src)
+        if blob is not None:
+            link_to(blob, dst)
+        else:
+            tmp = orders_dir / f".{dst.name}.tmp.{os.getpid()}"
+            try:
+                shutil.copy2(src, tmp)
+                tmp.replace(dst)
+            finally:
+                tmp.unlink(missing_ok=True)
 
         new_url = f"/static/out/orders/{order_id}/{dst.name}"
         updates.append({"id": item_id, "new_url": new_url})
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from app.core.http import request as upstream_request
+
+log = logging.getLogger("payments")
+
+PAYPAL_CLIENT_ID = os.getenv("PAYPAL_CLIENT_ID")
+PAYPAL_SECRET = os.getenv("PAYPAL_SECRET")
+PAYPAL_BASE_URL = os.getenv("PAYPAL_BASE_URL", "https://api-m.sandbox.paypal.com")
+
+# за сколько до истечения начинаем обновлять токен в фоне
+REFRESH_MARGIN_SECONDS = 5 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class AccessToken:
+    value: str
+    expires_at: float  # time.monotonic()
+
+
+class PayPalTokenManager:
+    """
+    OAuth-токен PayPal (client_credentials) в памяти процесса.
+    - живёт expires_in (обычно ~9 часов), а не один запрос;
+    - за REFRESH_MARGIN_SECONDS до истечения обновляется фоном, текущие запросы не ждут;
+    - single-flight: параллельные запросы при пустом кэше ждут один и тот же fetch;
+    - invalidate() после 401 — следующий get() возьмёт свежий.
+    """
+
+    def __init__(self, base_url: str, client_id: str | None, secret: str | None, *, margin: float = REFRESH_MARGIN_SECONDS):
+        self.base_url = base_url
+        self.client_id = client_id
+        self.secret = secret
+        self.margin = margin
+        self._token: AccessToken | None = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    async def _fetch(self) -> AccessToken:
+        res = await upstream_request(
+            "paypal",
+            "POST",
+            f"{self.base_url}/v1/oauth2/token",
+            auth=(self.client_id, self.secret),
+            data={"grant_type": "client_credentials"},
+            idempotent=True,
+        )
+        res.raise_for_status()
+        data = res.json()
+        expires_in = float(data.get("expires_in") or 0)
+        return AccessToken(data["access_token"], time.monotonic() + expires_in)
+
+    async def _refresh(self, stale: AccessToken | None) -> AccessToken:
+        async with self._lock:
+            # пока ждали лок, токен мог обновить другой запрос
+            if self._token is not None and self._token is not stale:
+                return self._token
+            self._token = await self._fetch()
+            return self._token
+
+    def _refresh_in_background(self, current: AccessToken) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        async def run() -> None:
+            try:
+                await self._refresh(current)
+            except Exception:
+                # старый токен ещё жив — просто попробуем на следующем запросе
+                log.warning("PayPal token background refresh failed", exc_info=True)
+
+        self._refresh_task = asyncio.create_task(run(), name="paypal-token-refresh")
+
+    async def get(self) -> str:
+        token = self._token
+        now = time.monotonic()
+        if token is not None and now < token.expires_at:
+            if now >= token.expires_at - self.margin:
+                self._refresh_in_background(token)
+            return token.value
+        return (await self._refresh(token)).value
+
+    def invalidate(self, value: str) -> None:
+        # сбрасываем только тот токен, на который пришёл 401, а не уже обновлённый
+        if self._token is not None and self._token.value == value:
+            self._token = None
+
+
+paypal_tokens = PayPalTokenManager(PAYPAL_BASE_URL, PAYPAL_CLIENT_ID, PAYPAL_SECRET)
+
+
+async def paypal_request(method: str, path: str, *, headers: dict[str, str] | None = None, **kwargs) -> httpx.Response:
+    """Запрос к PayPal API с кэшированным токеном; на 401 — один повтор со свежим."""
+    for attempt in range(2):
+        token = await paypal_tokens.get()
+        res = await upstream_request(
+            "paypal",
+            method,
+            f"{PAYPAL_BASE_URL}{path}",
+            headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+            **kwargs,
+        )
+        if res.status_code != 401 or attempt:
+            return res
+        log.warning("PayPal rejected cached token, refreshing")
+        paypal_tokens.invalidate(token)
+    return res
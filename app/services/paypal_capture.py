@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repos.checkout import CheckoutRepo
+from app.repos.payments import PaymentRepo
+from app.services.jobs import enqueue_post_payment
+from app.services.payment_state import apply_payment_status
+
+log = logging.getLogger("payments")
+
+PROVIDER = "paypal"
+
+
+def _capture(data: dict[str, Any]) -> tuple[str | None, str | None]:
+    purchase_unit = data.get("purchase_units", [{}])[0]
+    internal_uuid = purchase_unit.get("reference_id")
+    capture_id = purchase_unit.get("payments", {}).get("captures", [{}])[0].get("id")
+    return internal_uuid, capture_id
+
+
+def capture_event_key(data: dict[str, Any]) -> str:
+    """id capture у PayPal; повторный capture с тем же PayPal-Request-Id вернёт тот же id."""
+    _, capture_id = _capture(data)
+    return f"capture:{capture_id}" if capture_id else f"order:{data.get('id')}"
+
+
+async def apply_capture(session: AsyncSession, data: dict[str, Any]) -> None:
+    """
+    Применяет ответ PayPal на capture (status COMPLETED) к заказу и платежу.
+    Без commit, как и apply_ipn: транзакцией владеет роут capture или консьюмер webhook_events.
+    """
+    paypal_order_id = data.get("id")
+    internal_uuid, capture_id = _capture(data)
+
+    order = await CheckoutRepo.get_order_any(session, internal_uuid) if internal_uuid else None
+    if order is None:
+        log.error("Order not found for PayPal capture %s (reference_id=%s)", paypal_order_id, internal_uuid)
+        return
+
+    order.payment_status = apply_payment_status(order.payment_status, "paid")
+    order.paypal_capture_id = capture_id
+    # при повторном применении отгруженный/возвращённый заказ назад в paid не откатываем
+    if order.payment_status == "paid" and order.status in ("draft", "pending_payment"):
+        order.status = "paid"
+        order.need_post_process = True
+        await enqueue_post_payment(session, order.id)
+
+    payment = await PaymentRepo.get_by_provider_order(session, PROVIDER, str(paypal_order_id))
+    if payment is not None:
+        payment.status = "paid"
+        payment.provider_invoice_id = capture_id
+        payment.raw_payload = data
+    else:
+        log.warning("Payment record not found for PayPal ID %s", paypal_order_id)
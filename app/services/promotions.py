@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.invalidation import publish, subscribe
+from app.db.session import AsyncSessionLocal
+from app.repos.content import ContentRepo
+
+log = logging.getLogger("promotions")
+
+PROMOTIONS_CONTENT_KEY = "promotions"
+PROMOTIONS_TOPIC = "promotions"
+
+# То, что раньше было захардкожено в CartService: 2+ чехла -> 15%
+DEFAULT_RULES: list[dict[str, Any]] = [
+    {"type": "bundle_tier", "reason": "2_cases_15", "min_qty": 2, "percent": "15"},
+]
+
+RULE_TYPES = {"bundle_tier", "product_override"}
+
+ZERO = Decimal("0.00")
+HUNDRED = Decimal("100")
+
+
+def _money(x: Decimal) -> Decimal:
+    return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_dt(value: Any, field: str) -> datetime | None:
+    if value in (None, ""):
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value))
+    except ValueError as exc:
+        raise ValueError(f"'{field}' must be an ISO datetime") from exc
+    # без таймзоны считаем UTC, иначе сравнение с now() упадёт
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _parse_decimal(value: Any, field: str) -> Decimal:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError) as exc:
+        raise ValueError(f"'{field}' must be a number") from exc
+
+
+@dataclass(frozen=True, slots=True)
+class TierRule:
+    reason: str
+    min_qty: int
+    rate: Decimal  # 0.15, не 15
+    starts_at: datetime | None = None
+    ends_at: datetime | None = None
+
+    def is_live(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+
+@dataclass(frozen=True, slots=True)
+class OverrideRule:
+    reason: str
+    product_id: int
+    rate: Decimal | None = None  # скидка в долях от строки
+    unit_price: Decimal | None = None  # или фиксированная цена за штуку
+    starts_at: datetime | None = None
+    ends_at: datetime | None = None
+
+    def is_live(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+    def line_discount(self, unit: Decimal, qty: int) -> Decimal:
+        if self.unit_price is not None:
+            return max(unit - self.unit_price, ZERO) * qty
+        return unit * qty * (self.rate or ZERO)
+
+
+@dataclass(frozen=True, slots=True)
+class PromotionResult:
+    subtotal: Decimal
+    discount: Decimal
+    reason: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class PromotionPlan:
+    """
+    Скомпилированный набор правил. Иммутабелен: при изменении в админке
+    собирается новый план и атомарно подменяет старый.
+    """
+
+    tiers: tuple[TierRule, ...]
+    overrides: tuple[OverrideRule, ...]
+
+    @property
+    def size(self) -> int:
+        return len(self.tiers) + len(self.overrides)
+
+    def evaluate(self, items: Iterable[Any], now: datetime | None = None) -> PromotionResult:
+        """
+        O(items + rules): один проход по правилам (отбор живых по времени)
+        и один проход по строкам корзины. Акции не складываются —
+        корзина получает одно лучшее предложение, как и раньше.
+        """
+        now = now or _utcnow()
+
+        live_overrides: dict[int, OverrideRule] = {}
+        for rule in self.overrides:
+            if rule.is_live(now) and rule.product_id not in live_overrides:
+                live_overrides[rule.product_id] = rule
+
+        subtotal = ZERO
+        total_qty = 0
+        override_discount = ZERO
+        override_reason: str | None = None
+
+        for it in items:
+            unit = it.unit_price or ZERO
+            qty = int(it.qty or 0)
+            subtotal += unit * qty
+            total_qty += qty
+
+            rule = live_overrides.get(it.product_id) if live_overrides else None
+            if rule is not None:
+                override_discount += rule.line_discount(unit, qty)
+                override_reason = override_reason or rule.reason
+
+        subtotal = _money(subtotal)
+
+        best = _money(override_discount) if override_reason else ZERO
+        reason = override_reason if best > ZERO else None
+
+        for tier in self.tiers:
+            if total_qty < tier.min_qty or not tier.is_live(now):
+                continue
+            amount = _money(subtotal * tier.rate)
+            if amount > best:
+                best, reason = amount, tier.reason
+
+        return PromotionResult(subtotal=subtotal, discount=min(best, subtotal), reason=reason)
+
+
+def _compile_rule(raw: Any, idx: int) -> TierRule | OverrideRule | None:
+    if not isinstance(raw, dict):
+        raise ValueError(f"Rule #{idx} must be an object")
+
+    rule_type = raw.get("type")
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Rule #{idx}: unknown type '{rule_type}'")
+
+    if raw.get("active", True) is False:
+        return None
+
+    reason = str(raw.get("reason") or f"{rule_type}_{idx}")[:64]
+    starts_at = _parse_dt(raw.get("starts_at"), "starts_at")
+    ends_at = _parse_dt(raw.get("ends_at"), "ends_at")
+
+    rate = None
+    if raw.get("percent") is not None:
+        rate = _parse_decimal(raw["percent"], "percent") / HUNDRED
+        if not (ZERO < rate <= 1):
+            raise ValueError(f"Rule #{idx}: 'percent' must be in (0, 100]")
+
+    if rule_type == "bundle_tier":
+        try:
+            min_qty = int(raw.get("min_qty"))
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Rule #{idx}: 'min_qty' must be an integer") from exc
+        if min_qty < 1 or rate is None:
+            raise ValueError(f"Rule #{idx}: bundle_tier needs 'min_qty' >= 1 and 'percent'")
+        return TierRule(reason=reason, min_qty=min_qty, rate=rate, starts_at=starts_at, ends_at=ends_at)
+
+    try:
+        product_id = int(raw.get("product_id"))
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Rule #{idx}: 'product_id' must be an integer") from exc
+
+    unit_price = None
+    if raw.get("unit_price") is not None:
+        unit_price = _parse_decimal(raw["unit_price"], "unit_price")
+    if (rate is None) == (unit_price is None):
+        raise ValueError(f"Rule #{idx}: product_override needs exactly one of 'percent' / 'unit_price'")
+
+    return OverrideRule(
+        reason=reason,
+        product_id=product_id,
+        rate=rate,
+        unit_price=unit_price,
+        starts_at=starts_at,
+        ends_at=ends_at,
+    )
+
+
+def compile_rules(rules: list[dict[str, Any]]) -> PromotionPlan:
+    """Валидирует правила и собирает план. Кидает ValueError на кривом конфиге."""
+    if not isinstance(rules, list):
+        raise ValueError("Promotions must be a JSON list of rules")
+
+    tiers: list[TierRule] = []
+    overrides: list[OverrideRule] = []
+    for idx, raw in enumerate(rules):
+        rule = _compile_rule(raw, idx)
+        if isinstance(rule, TierRule):
+            tiers.append(rule)
+        elif isinstance(rule, OverrideRule):
+            overrides.append(rule)
+
+    # самые «жирные» тиры первыми — при равной скидке выигрывает старший
+    tiers.sort(key=lambda r: r.min_qty, reverse=True)
+    return PromotionPlan(tiers=tuple(tiers), overrides=tuple(overrides))
+
+
+_plan: PromotionPlan = compile_rules(DEFAULT_RULES)
+
+
+def current_plan() -> PromotionPlan:
+    return _plan
+
+
+def set_plan(plan: PromotionPlan) -> None:
+    global _plan
+    _plan = plan
+    log.info("Promotions plan installed | rules=%s", plan.size)
+
+
+def rules_from_payload(payload: dict[str, Any] | None) -> list[dict[str, Any]]:
+    if not payload or "rules" not in payload:
+        return DEFAULT_RULES
+    return payload["rules"]
+
+
+async def load_promotions(session: AsyncSession) -> PromotionPlan:
+    """Читает правила из ContentBlock и ставит новый план. Зовётся на старте и после правок в админке."""
+    block = await ContentRepo.get_by_key(session, PROMOTIONS_CONTENT_KEY)
+    plan = compile_rules(rules_from_payload(block.payload if block else None))
+    set_plan(plan)
+    return plan
+
+
+async def reload_promotions() -> None:
+    async with AsyncSessionLocal() as session:
+        await load_promotions(session)
+
+
+async def announce_promotions_change(session: AsyncSession) -> None:
+    """NOTIFY в транзакции сохранения: остальные воркеры перечитают план после коммита."""
+    await publish(session, PROMOTIONS_TOPIC)
+
+
+subscribe(PROMOTIONS_TOPIC, reload_promotions)
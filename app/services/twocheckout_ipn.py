@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repos.orders import OrdersRepo
+from app.repos.payments import PaymentRepo
+from app.services.jobs import enqueue_post_payment
+from app.services.payment_state import apply_payment_status
+from app.services.twocheckout_ins_parser import map_to_internal_status, pick
+
+log = logging.getLogger("2co.ipn")
+
+PROVIDER = "2checkout"
+
+AMOUNT_TOLERANCE = Decimal("0.10")  # +/- 0.10 EUR
+
+# меняются от ретрая к ретраю одного и того же уведомления — в ключ события не входят
+VOLATILE_KEYS = {"IPN_DATE", "HASH", "SIGNATURE_SHA2_256", "SIGNATURE_SHA3_256"}
+
+
+def _to_decimal(val: Any) -> Decimal | None:
+    try:
+        if val is None:
+            return None
+        return Decimal(str(val))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def _amount_matches(expected: Decimal, received: Decimal) -> bool:
+    return abs(expected - received) <= AMOUNT_TOLERANCE
+
+
+def ipn_event_key(items: list[tuple[str, Any]]) -> str:
+    """
+    Натуральный ключ IPN: sha256 от полей в порядке 2CO без даты и подписи.
+    Ретрай того же уведомления даёт тот же ключ; повтор с тем же содержимым
+    и применять незачем — apply_payment_status на нём ничего не меняет.
+    """
+    stable = [(k, str(v)) for k, v in items if k not in VOLATILE_KEYS]
+    raw = json.dumps(stable, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def ipn_order_ref(payload: dict[str, Any]) -> str | None:
+    """По чему упорядочиваем события: наш order_number, иначе номер заказа в 2CO."""
+    return (payload.get("REFNOEXT") or "").strip().upper() or pick(payload, "REFNO", "ORDERNO", "sale_id")
+
+
+async def apply_ipn(session: AsyncSession, payload: dict[str, Any]) -> None:
+    """
+    Применяет проверенное (подпись уже сверена) IPN к заказу и платежу.
+    Без commit: транзакцией владеет вызывающий — роут в синхронном режиме
+    или консьюмер webhook_events.
+    """
+    # 2) Идентификаторы
+    merchant_order_id = (payload.get("REFNOEXT") or "").strip() or None  # твой order_number (NRD-...)
+    provider_order_number = pick(payload, "REFNO", "ORDERNO", "sale_id")
+    invoice_id = pick(payload, "invoice_id", "INVOICE_ID")
+
+    # 3) Статус
+    internal_status, extracted = map_to_internal_status(payload)
+
+    log.info(
+        "2CO IPN processed: %s",
+        {
+            "merchant_order_id": merchant_order_id,
+            "provider_order_number": provider_order_number,
+            "invoice_id": invoice_id,
+            "internal_status": internal_status,
+            "order_status": extracted.get("order_status"),
+            "invoice_status": extracted.get("invoice_status"),
+            "fraud_status": extracted.get("fraud_status"),
+        },
+    )
+
+    # 4) Ищем Order
+    order = None
+    if merchant_order_id:
+        order = await OrdersRepo.get_by_order_number(session, merchant_order_id)
+        if not order:
+            # Если REFNOEXT не совпал — дальше гадать опасно: можем заапдейтить чужой payment.
+            log.error("Order not found for REFNOEXT: %s", merchant_order_id)
+            return
+
+    # 5) Ищем Payment
+    payment = None
+    if provider_order_number:
+        payment = await PaymentRepo.get_by_provider_order(session, "2checkout", str(provider_order_number))
+
+    if payment is None and order is not None:
+        payment = await PaymentRepo.get_latest_for_order(session, str(order.id))
+
+    # 6) Сумма/валюта (для paid — строгий гейт по сумме, валюта только если есть expected_currency)
+    received_amount = _to_decimal(payload.get("IPN_TOTALGENERAL"))
+    received_currency = (payload.get("CURRENCY") or "").upper().strip() or None
+
+    expected_amount: Decimal | None = None
+    expected_currency: str | None = None
+
+    if payment is not None:
+        expected_amount = getattr(payment, "amount", None)
+        expected_currency = (getattr(payment, "currency", None) or "").upper().strip() or None
+
+    if expected_amount is None and order is not None:
+        expected_amount = getattr(order, "total", None)
+
+    if expected_currency is None and order is not None:
+        expected_currency = (getattr(order, "currency", None) or "").upper().strip() or None
+
+    if expected_currency is None:
+        expected_currency = "EUR"
+
+    amount_ok = True
+    currency_ok = True
+
+    if expected_amount is not None and received_amount is not None:
+        amount_ok = _amount_matches(expected_amount, received_amount)
+        if not amount_ok:
+            log.error(
+                "2CO amount mismatch: %s",
+                {
+                    "merchant_order_id": merchant_order_id,
+                    "provider_order_number": provider_order_number,
+                    "expected_amount": str(expected_amount),
+                    "received_amount": str(received_amount),
+                    "tolerance": str(AMOUNT_TOLERANCE),
+                },
+            )
+    else:
+        log.warning(
+            "2CO amount check skipped (missing expected/received): %s",
+            {
+                "merchant_order_id": merchant_order_id,
+                "provider_order_number": provider_order_number,
+                "expected_amount": str(expected_amount) if expected_amount is not None else None,
+                "received_amount": str(received_amount) if received_amount is not None else None,
+            },
+        )
+
+    if expected_currency and received_currency:
+        currency_ok = (expected_currency == received_currency)
+        if not currency_ok:
+            log.error(
+                "2CO currency mismatch: %s",
+                {
+                    "merchant_order_id": merchant_order_id,
+                    "provider_order_number": provider_order_number,
+                    "expected_currency": expected_currency,
+                    "received_currency": received_currency,
+                },
+            )
+    else:
+        # валюта может отсутствовать у тебя в базе — не блокируем paid только из-за этого
+        log.debug(
+            "2CO currency check skipped: %s",
+            {
+                "merchant_order_id": merchant_order_id,
+                "provider_order_number": provider_order_number,
+                "expected_currency": expected_currency,
+                "received_currency": received_currency,
+            },
+        )
+
+    def _can_apply_status(status: str | None) -> bool:
+        if not status:
+            return False
+
+        if status == "paid":
+            # paid применяем ТОЛЬКО если можем подтвердить сумму
+            if expected_amount is None or received_amount is None or not amount_ok:
+                return False
+
+            # валюту проверяем только если она у нас есть (expected_currency)
+            if expected_currency and received_currency and not currency_ok:
+                return False
+
+        return True
+
+    # 7) Обновляем Order
+    if order is not None and internal_status:
+        if not _can_apply_status(internal_status):
+            if internal_status == "paid":
+                log.error(
+                    "2CO paid ignored due to verification failure: %s",
+                    {
+                        "merchant_order_id": merchant_order_id,
+                        "provider_order_number": provider_order_number,
+                        "expected_amount": str(expected_amount) if expected_amount is not None else None,
+                        "received_amount": str(received_amount) if received_amount is not None else None,
+                        "expected_currency": expected_currency,
+                        "received_currency": received_currency,
+                    },
+                )
+        else:
+            order.payment_status = apply_payment_status(order.payment_status, internal_status)
+
+            if order.payment_status == "paid" and order.status == "pending_payment":
+                order.status = "paid"
+                order.need_post_process = True
+                # в той же транзакции: заказ paid <=> задача в очереди
+                await enqueue_post_payment(session, order.id)
+
+            if order.payment_status == "refunded" and order.status != "refunded":
+                order.status = "refunded"
+
+            if order.payment_status == "canceled" and order.status != "canceled":
+                order.status = "canceled"
+
+    # 8) Обновляем Payment
+    if payment is not None:
+        if internal_status and _can_apply_status(internal_status):
+            payment.status = internal_status
+
+        if provider_order_number:
+            payment.provider_order_number = str(provider_order_number)
+
+        payment.provider_invoice_id = str(invoice_id) if invoice_id else payment.provider_invoice_id
+        payment.provider_message_type = extracted.get("message_type")
+        payment.provider_order_status = extracted.get("order_status")
+        payment.provider_invoice_status = extracted.get("invoice_status")
+        payment.provider_approve_status = extracted.get("approve_status")
+
+        payment.raw_payload = payload
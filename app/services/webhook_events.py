@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.order import Order
+from app.repos.orders import OrdersRepo
+from app.repos.webhook_events import WebhookEventsRepo
+from app.services import paypal_capture, twocheckout_ipn
+
+log = logging.getLogger("webhooks")
+
+EventApplier = Callable[[AsyncSession, dict[str, Any]], Awaitable[None]]
+
+APPLIERS: dict[str, EventApplier] = {
+    twocheckout_ipn.PROVIDER: twocheckout_ipn.apply_ipn,
+    paypal_capture.PROVIDER: paypal_capture.apply_capture,
+}
+
+
+async def record_event(
+    session: AsyncSession,
+    *,
+    provider: str,
+    event_key: str,
+    order_ref: str,
+    payload: dict[str, Any],
+) -> int | None:
+    """
+    Пишет событие в журнал следующим по seq заказа — в транзакции вызывающего,
+    lock заказа держится до её конца. None — дубль: событие уже записано,
+    его применение стоит в очереди или уже прошло, делать ничего не нужно.
+    """
+    await WebhookEventsRepo.lock_order(session, order_ref)
+    return await WebhookEventsRepo.add(
+        session, provider=provider, event_key=event_key, order_ref=order_ref, payload=payload
+    )
+
+
+async def apply_pending(session: AsyncSession, order_ref: str) -> int:
+    """
+    Применяет необработанные события заказа строго по seq, от любых провайдеров.
+    Под advisory lock заказа и в одной транзакции: если событие упало, откатываются
+    и предыдущие из этой пачки — следующее никогда не применится раньше упавшего.
+    Без commit — транзакцией владеет вызывающий.
+    """
+    await WebhookEventsRepo.lock_order(session, order_ref)
+    events = await WebhookEventsRepo.pending_for_order(session, order_ref)
+    for event in events:
+        try:
+            await APPLIERS[event.provider](session, event.payload)
+        except Exception:
+            log.exception("Webhook event %s (%s seq=%s) failed", event.id, order_ref, event.seq)
+            raise
+    if events:
+        await WebhookEventsRepo.mark_applied(session, [e.id for e in events])
+    return len(events)
+
+
+async def has_full_history(session: AsyncSession, order: Order) -> bool:
+    """
+    Можно ли собрать платёжное состояние заказа с нуля только из журнала.
+    Нет событий — не из чего собирать. Заказ старше журнала мог получить
+    оплату/возврат до его появления: свёртка одного хвоста с unpaid даст не то
+    (refunded без предшествующего paid так и останется unpaid).
+    """
+    if not await WebhookEventsRepo.exists_for_order(session, order.order_number):
+        return False
+    started_at = await WebhookEventsRepo.log_started_at(session)
+    return started_at is not None and order.created_at >= started_at
+
+
+async def rebuild_order(session: AsyncSession, order_ref: str) -> int | None:
+    """
+    Пересобирает платёжное состояние заказа из журнала: payment_status в unpaid
+    и все события заново по seq. apply_payment_status монотонен, поэтому результат
+    тот же, что при честной доставке по порядку; ушедший дальше paid заказ
+    (отгружен и т.п.) своим status не откатывается.
+    None — отказ: заказа нет или журнал неполный (has_full_history), состояние не трогаем.
+    """
+    await WebhookEventsRepo.lock_order(session, order_ref)
+    order = await OrdersRepo.get_by_order_number(session, order_ref)
+    if order is None or not await has_full_history(session, order):
+        return None
+    order.payment_status = "unpaid"
+    await WebhookEventsRepo.reset(session, order_ref)
+    return await apply_pending(session, order_ref)
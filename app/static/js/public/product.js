@@ -1,7 +1,7 @@
 (() => {
   // ===== BOOTSTRAP DATA =====
   const PD = window.PRODUCT_DATA || {};
-  const variants = PD.variants || [];
+  let variants = PD.variants || [];
   const productSlug = PD.productSlug || null;
   const productId = PD.productId || null;
 
@@ -400,7 +400,7 @@ function modelCompare(a, b) {
     if (active) active.scrollIntoView({ behavior: 'smooth', inline: 'center', block: 'nearest' });
   }
 
-  async function setMainImageAnimated(url, { isPreview = false } = {}) {
+  async function setMainImageAnimated(url, { isPreview = false, srcset = '' } = {}) {
     if (!els.mainImg || !url) return;
     if (galleryLocked) return;
 
@@ -417,6 +417,9 @@ function modelCompare(a, b) {
       await new Promise(r => setTimeout(r, 140));
 
       const prevSrc = els.mainImg.src;
+      const prevSrcset = els.mainImg.srcset;
+      // srcset важнее src: без сброса браузер продолжит показывать старую картинку
+      els.mainImg.srcset = srcset;
       els.mainImg.src = url;
 
       if (!els.mainImg.complete || els.mainImg.naturalWidth === 0) {
@@ -428,7 +431,10 @@ function modelCompare(a, b) {
           };
           els.mainImg.onload = done;
           els.mainImg.onerror = () => {
-            if (prevSrc) els.mainImg.src = prevSrc;
+            if (prevSrc) {
+              els.mainImg.srcset = prevSrcset;
+              els.mainImg.src = prevSrc;
+            }
             done();
           };
         });
@@ -454,10 +460,10 @@ function modelCompare(a, b) {
     }
 
     galleryIndex = wrapIndex(nextIdx, els.thumbs.length);
-    const src = els.thumbs[galleryIndex].dataset.src;
+    const { src, srcset } = els.thumbs[galleryIndex].dataset;
 
     setActiveThumb(galleryIndex);
-    await setMainImageAnimated(src, { isPreview: false });
+    await setMainImageAnimated(src, { isPreview: false, srcset: srcset || '' });
 
     if (pendingGalleryIndex !== null) {
       const last = pendingGalleryIndex;
@@ -596,6 +602,17 @@ function scrollToPreview() {
 }
 
   // ===== BRAND → MODEL =====
+  // Список моделей общий для всех товаров и кэшируется браузером по hash в URL
+  async function loadVariants() {
+    if (variants.length || !PD.variantsUrl) return;
+    try {
+      const res = await fetch(PD.variantsUrl, { credentials: 'same-origin' });
+      if (res.ok) variants = await res.json();
+    } catch (e) {
+      console.warn('Failed to load variants', e);
+    }
+  }
+
   function initBrandModel() {
     const brands = [...new Set(variants.map(v => v.brand))].sort();
 
@@ -904,7 +921,7 @@ function scrollToPreview() {
     }
 
     initGallery();
-    initBrandModel();
+    loadVariants().then(initBrandModel);
     initPersonalizationListeners();
 
     initCoordsListeners();
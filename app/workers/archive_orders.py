@@ -1,18 +1,198 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
 from sqlalchemy import text
-from app.db.session import AsyncSessionLocal
 
+from app.core.config import settings
+from app.db.session import worker_session
+from app.repos.email_outbox import EmailOutboxRepo
+from app.repos.idempotency import IdempotencyRepo
+from app.repos.jobs import JobsRepo
+
+# Одна пачка: самые старые кандидаты, чужие блокировки пропускаем (SKIP LOCKED),
+# наружу — только число строк, id в Python не тащим.
 ARCHIVE_SQL = """
-UPDATE orders
-SET status = 'archived'
-WHERE
-    (status = 'draft' AND created_at < NOW() - INTERVAL '24 hours')
- OR (status = 'pending_payment' AND created_at < NOW() - INTERVAL '36 hours')
-RETURNING id;
+WITH batch AS (
+    SELECT id
+    FROM orders
+    WHERE status IN ('draft', 'pending_payment')
+      AND (
+            (status = 'draft' AND created_at < NOW() - INTERVAL '24 hours')
+         OR (status = 'pending_payment' AND created_at < NOW() - INTERVAL '36 hours')
+      )
+    ORDER BY created_at
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), archived AS (
+    UPDATE orders
+    SET status = 'archived'
+    FROM batch
+    WHERE orders.id = batch.id
+    RETURNING 1
+)
+SELECT count(*) FROM archived;
+"""
+
+async def archive_old_orders(
+    batch_size: int | None = None,
+    pause: float | None = None,
+) -> int:
+    """
+    Архивирует пачками по batch_size, коммит после каждой: блокировки короткие,
+    WAL ровный. Пауза между пачками оставляет I/O живому трафику.
+    """
+    batch_size = batch_size or settings.archive_batch_size
+    pause = settings.archive_batch_pause_seconds if pause is None else pause
+    total = 0
+    async with worker_session() as session:
+        while True:
+            result = await session.execute(text(ARCHIVE_SQL), {"batch_size": batch_size})
+            count = int(result.scalar_one())
+            await session.commit()
+            total += count
+            if count < batch_size:
+                return total
+            await asyncio.sleep(pause)
+
+# Переезд в холодное хранилище: DELETE из orders (каскадом уходят items и payments)
+# и INSERT документа в orders_archive — один оператор, одна пачка. Все подзапросы CTE
+# видят снимок до оператора, поэтому items/payments ещё читаются.
+COLD_MOVE_SQL = """
+WITH batch AS (
+    SELECT id
+    FROM orders
+    WHERE status = 'archived' AND created_at < :cutoff
+    ORDER BY created_at
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), moved AS (
+    DELETE FROM orders
+    USING batch
+    WHERE orders.id = batch.id
+    RETURNING orders.*
+), stored AS (
+    INSERT INTO orders_archive (id, created_at, order_number, status, data)
+    SELECT
+        m.id, m.created_at, m.order_number, m.status,
+        to_jsonb(m) || jsonb_build_object(
+            'items', COALESCE((SELECT jsonb_agg(to_jsonb(i)) FROM order_items i WHERE i.order_id = m.id), '[]'::jsonb),
+            'payments', COALESCE((SELECT jsonb_agg(to_jsonb(p)) FROM payments p WHERE p.order_id = m.id), '[]'::jsonb)
+        )
+    FROM moved m
+    RETURNING 1
+)
+SELECT count(*) FROM stored;
 """
 
-async def archive_old_orders() -> int:
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(text(ARCHIVE_SQL))
-        archived_ids = result.scalars().all()
+ARCHIVE_PARTITION_PREFIX = "orders_archive_y"
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"{ARCHIVE_PARTITION_PREFIX}{month.year}m{month.month:02d}"
+
+
+async def ensure_archive_partitions(session, since: datetime, until: datetime) -> int:
+    """Помесячные секции orders_archive на [since, until] (включительно по месяцам)."""
+    month, last, created = _month_start(since), _month_start(until), 0
+    while month <= last:
+        upper = _add_months(month, 1)
+        # имена и границы генерируем сами из дат — не пользовательский ввод
+        await session.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF orders_archive "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        month, created = upper, created + 1
+    await session.commit()
+    return created
+
+
+async def move_to_cold_storage(batch_size: int | None = None, pause: float | None = None) -> int:
+    """archived-заказы старше orders_cold_after_days -> orders_archive, пачками с коммитом."""
+    batch_size = batch_size or settings.archive_batch_size
+    pause = settings.archive_batch_pause_seconds if pause is None else pause
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.orders_cold_after_days)
+    total = 0
+    async with worker_session() as session:
+        oldest = (
+            await session.execute(
+                text("SELECT min(created_at) FROM orders WHERE status = 'archived' AND created_at < :cutoff"),
+                {"cutoff": cutoff},
+            )
+        ).scalar_one()
+        if oldest is None:
+            return 0
+        # секции до текущего месяца включительно — заодно и "наперёд" для следующих запусков
+        await ensure_archive_partitions(session, oldest, now)
+
+        while True:
+            result = await session.execute(text(COLD_MOVE_SQL), {"cutoff": cutoff, "batch_size": batch_size})
+            count = int(result.scalar_one())
+            await session.commit()
+            total += count
+            if count < batch_size:
+                return total
+            await asyncio.sleep(pause)
+
+
+async def drop_expired_archive_partitions() -> list[str]:
+    """Секции orders_archive целиком старше orders_archive_retention_months: DETACH + DROP."""
+    horizon = _add_months(_month_start(datetime.now(timezone.utc)), -settings.orders_archive_retention_months)
+    dropped: list[str] = []
+    async with worker_session() as session:
+        names = (
+            await session.execute(
+                text(
+                    "SELECT c.relname FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent "
+                    "WHERE p.relname = 'orders_archive'"
+                )
+            )
+        ).scalars().all()
+        for name in sorted(names):
+            suffix = name.removeprefix(ARCHIVE_PARTITION_PREFIX)
+            try:
+                year, month = suffix.split("m")
+                upper = _add_months(datetime(int(year), int(month), 1, tzinfo=timezone.utc), 1)
+            except ValueError:
+                continue
+            if upper > horizon:
+                continue
+            await session.execute(text(f"ALTER TABLE orders_archive DETACH PARTITION {name}"))
+            await session.execute(text(f"DROP TABLE {name}"))
+            await session.commit()
+            dropped.append(name)
+    return dropped
+
+
+async def purge_idempotency_keys() -> int:
+    async with worker_session() as session:
+        count = await IdempotencyRepo.purge_expired(session, datetime.now(timezone.utc))
+        await session.commit()
+        return count
+
+async def purge_finished_jobs() -> int:
+    async with worker_session() as session:
+        before = datetime.now(timezone.utc) - timedelta(days=settings.jobs_retention_days)
+        count = await JobsRepo.purge_done(session, before)
+        await session.commit()
+        return count
+
+async def purge_sent_emails() -> int:
+    async with worker_session() as session:
+        before = datetime.now(timezone.utc) - timedelta(days=settings.jobs_retention_days)
+        count = await EmailOutboxRepo.purge_sent(session, before)
         await session.commit()
-        return len(archived_ids)
\ No newline at end of file
+        return count
@@ -0,0 +1,183 @@
+# app/workers/email_sender.py
+import asyncio
+import logging
+import signal
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.invalidation import listen_dsn
+from app.core.logger_setup import setup_logging
+from app.db.models import EmailOutbox
+from app.db.session import worker_session
+from app.repos.email_outbox import EmailOutboxRepo
+from app.services.emails import OUTBOX_CHANNEL, send_batch
+from app.services.jobs import backoff
+
+log = logging.getLogger("emails")
+
+LEASE = timedelta(minutes=5)
+
+
+def build_batches(messages: list[EmailOutbox], size: int) -> list[tuple[str, list[EmailOutbox]]]:
+    """
+    Пачки по шаблону. Адрес — ключ recipient-variables, поэтому в одной пачке
+    он встречается один раз: два заказа одного покупателя уйдут разными запросами.
+    """
+    by_template: dict[str, list[EmailOutbox]] = defaultdict(list)
+    for message in messages:
+        by_template[message.template].append(message)
+
+    batches: list[tuple[str, list[EmailOutbox]]] = []
+    for template, items in by_template.items():
+        open_batches: list[tuple[set[str], list[EmailOutbox]]] = []
+        for message in items:
+            address = message.to_email.lower()
+            for seen, batch in open_batches:
+                if address not in seen and len(batch) < size:
+                    seen.add(address)
+                    batch.append(message)
+                    break
+            else:
+                open_batches.append(({address}, [message]))
+        batches.extend((template, batch) for _, batch in open_batches)
+    return batches
+
+
+class OutboxSender:
+    """
+    Разбирает email_outbox: просыпается по NOTIFY, ждёт email_batch_linger_seconds,
+    чтобы после волны оплат набралась пачка, и шлёт её одним запросом Mailgun.
+    Запросы идут не чаще mailgun_requests_per_second; 429 — пауза по Retry-After.
+    """
+
+    def __init__(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._next_request_at = 0.0
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        self._wakeup.set()
+
+    async def _listen(self) -> None:
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = await asyncpg.connect(listen_dsn())
+                await conn.add_listener(OUTBOX_CHANNEL, self._on_notify)
+                self._wakeup.set()
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _c: closed.set())
+                await closed.wait()
+                log.warning("Outbox listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Outbox listener failed, retry in 2s")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(2)
+
+    async def _pace(self) -> None:
+        delay = self._next_request_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next_request_at = time.monotonic() + 1.0 / settings.mailgun_requests_per_second
+
+    async def _send(self, template: str, batch: list[EmailOutbox]) -> None:
+        ids = [m.id for m in batch]
+        recipients = {m.to_email: m.variables for m in batch}
+        await self._pace()
+        error: str
+        try:
+            response = await send_batch(template, recipients)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        else:
+            if response.status_code == 200:
+                message_id = (response.json() or {}).get("id")
+                async with worker_session() as session:
+                    await EmailOutboxRepo.mark_sent(session, ids, message_id)
+                    await session.commit()
+                log.info("Email batch sent | template=%s recipients=%s id=%s", template, len(ids), message_id)
+                return
+            error = f"HTTP {response.status_code}: {response.text[:500]}"
+            if response.status_code == 429:
+                retry_after = response.headers.get("retry-after", "")
+                pause = float(retry_after) if retry_after.isdigit() else 10.0
+                self._next_request_at = time.monotonic() + pause
+
+        now = datetime.now(timezone.utc)
+        attempts = max(m.attempts for m in batch)
+        async with worker_session() as session:
+            if attempts >= settings.email_max_attempts:
+                await EmailOutboxRepo.bury(session, ids, error=error)
+                log.error("Email batch dead-lettered | template=%s recipients=%s error=%s", template, len(ids), error)
+            else:
+                delay = backoff(attempts)
+                await EmailOutboxRepo.retry(session, ids, run_at=now + delay, error=error)
+                log.warning(
+                    "Email batch failed, retry in %.0fs | template=%s recipients=%s error=%s",
+                    delay.total_seconds(), template, len(ids), error,
+                )
+            await session.commit()
+
+    async def drain(self) -> int:
+        """Отправляет всё, что готово к отправке. -> число писем."""
+        sent = 0
+        while not self._stopping.is_set():
+            async with worker_session() as session:
+                messages = list(await EmailOutboxRepo.claim(session, settings.mailgun_batch_size * 4, LEASE))
+                await session.commit()
+            if not messages:
+                return sent
+            for template, batch in build_batches(messages, settings.mailgun_batch_size):
+                await self._send(template, batch)
+                sent += len(batch)
+        return sent
+
+    async def run(self) -> None:
+        listener = asyncio.create_task(self._listen(), name="outbox-listener")
+        log.info("Email sender started")
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.clear()
+                try:
+                    await self.drain()
+                except Exception:
+                    log.exception("Email outbox drain failed")
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.jobs_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    continue
+                # письма по волне оплат приходят пачкой NOTIFY — даём им накопиться
+                await asyncio.sleep(settings.email_batch_linger_seconds)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+
+async def main():
+    setup_logging(settings.env)
+    sender = OutboxSender()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, sender.stop)
+    http_clients.open()
+    try:
+        await sender.run()
+    finally:
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+# app/workers/job_runner.py
+import asyncio
+import logging
+import signal
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.http import http_clients
+from app.core.invalidation import listen_dsn
+from app.core.logger_setup import setup_logging
+from app.db.models import Job
+from app.db.session import worker_session
+from app.repos.jobs import JobsRepo
+from app.services.jobs import JOBS_CHANNEL, backoff, handler_for
+
+# регистрация обработчиков задач
+import app.workers.post_payment  # noqa: F401
+import app.workers.webhook_events  # noqa: F401
+
+log = logging.getLogger("jobs")
+
+
+class JobRunner:
+    """
+    Долгоживущий консьюмер очереди jobs.
+    Просыпается по NOTIFY (или раз в jobs_poll_interval_seconds — для отложенных
+    ретраев и на случай потерянных уведомлений), держит не больше concurrency задач в работе.
+    """
+
+    def __init__(self, concurrency: int | None = None) -> None:
+        self.concurrency = concurrency or settings.jobs_concurrency
+        self.lease = timedelta(seconds=settings.jobs_lease_seconds)
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._running: set[asyncio.Task] = set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _on_notify(self, conn, pid, channel, payload) -> None:
+        self._wakeup.set()
+
+    async def _listen(self) -> None:
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = await asyncpg.connect(listen_dsn())
+                await conn.add_listener(JOBS_CHANNEL, self._on_notify)
+                # пока слушателя не было, NOTIFY могли потеряться
+                self._wakeup.set()
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _c: closed.set())
+                await closed.wait()
+                log.warning("Jobs listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Jobs listener failed, retry in 2s")
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(2)
+
+    async def _claim(self, limit: int) -> list[Job]:
+        async with worker_session() as session:
+            jobs = list(await JobsRepo.claim(session, limit, self.lease))
+            await session.commit()
+        return jobs
+
+    async def _heartbeat(self, job: Job, work: asyncio.Task, lost: asyncio.Event) -> None:
+        """
+        Продлевает аренду, пока обработчик работает: долгая задача не истечёт и не уйдёт
+        второму раннеру. Если задачу всё-таки перехватили (раннер подвис дольше аренды) —
+        отменяем свою копию, владелец теперь другой.
+        """
+        interval = self.lease.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with worker_session() as session:
+                    owned = await JobsRepo.extend(session, job.id, job.attempts, self.lease)
+                    await session.commit()
+            except Exception:
+                log.warning("Job heartbeat failed | id=%s", job.id, exc_info=True)
+                continue
+            if not owned:
+                log.error("Job lease lost, cancelling | id=%s type=%s attempt=%s", job.id, job.type, job.attempts)
+                lost.set()
+                work.cancel()
+                return
+
+    async def _execute(self, job: Job) -> None:
+        handler = handler_for(job.type)
+        lost = asyncio.Event()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job type {job.type!r}")
+            work = asyncio.create_task(handler(job.payload), name=f"job-{job.id}-handler")
+            heartbeat = asyncio.create_task(self._heartbeat(job, work, lost), name=f"job-{job.id}-heartbeat")
+            try:
+                await work
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+        except asyncio.CancelledError:
+            # аренду потеряли — статус задачи пишет новый владелец
+            if lost.is_set():
+                return
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            async with worker_session() as session:
+                if job.attempts >= job.max_attempts or handler is None:
+                    owned = await JobsRepo.bury(session, job.id, job.attempts, error=error)
+                    if owned:
+                        log.error(
+                            "Job dead-lettered | id=%s type=%s attempts=%s error=%s",
+                            job.id, job.type, job.attempts, error,
+                        )
+                else:
+                    delay = backoff(job.attempts)
+                    owned = await JobsRepo.retry(
+                        session, job.id, job.attempts, run_at=datetime.now(timezone.utc) + delay, error=error
+                    )
+                    if owned:
+                        log.warning(
+                            "Job failed, retry in %.0fs | id=%s type=%s attempt=%s/%s",
+                            delay.total_seconds(), job.id, job.type, job.attempts, job.max_attempts,
+                            exc_info=True,
+                        )
+                await session.commit()
+            if not owned:
+                log.warning("Job failed after its lease was taken over | id=%s error=%s", job.id, error)
+            return
+
+        async with worker_session() as session:
+            owned = await JobsRepo.complete(session, job.id, job.attempts)
+            await session.commit()
+        if owned:
+            log.info("Job done | id=%s type=%s attempt=%s", job.id, job.type, job.attempts)
+        else:
+            log.warning("Job finished after its lease was taken over | id=%s type=%s", job.id, job.type)
+
+    def _spawn(self, job: Job) -> None:
+        task = asyncio.create_task(self._execute(job), name=f"job-{job.id}")
+        self._running.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            self._running.discard(t)
+            # освободился слот — сразу смотрим, нет ли ещё работы
+            self._wakeup.set()
+
+        task.add_done_callback(done)
+
+    async def run(self) -> None:
+        listener = asyncio.create_task(self._listen(), name="jobs-listener")
+        log.info("Job runner started | concurrency=%s", self.concurrency)
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.clear()
+                free = self.concurrency - len(self._running)
+                if free > 0:
+                    try:
+                        jobs = await self._claim(free)
+                    except Exception:
+                        log.exception("Failed to claim jobs")
+                        jobs = []
+                    for job in jobs:
+                        self._spawn(job)
+                    # забрали всё, что влезло — возможно, в очереди есть ещё
+                    if jobs and len(jobs) == free:
+                        continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.jobs_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            if self._running:
+                log.info("Waiting for %s running jobs", len(self._running))
+                await asyncio.gather(*self._running, return_exceptions=True)
+
+
+async def main():
+    setup_logging(settings.env)
+    runner = JobRunner()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, runner.stop)
+    http_clients.open()
+    try:
+        await runner.run()
+    finally:
+        await http_clients.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,144 +4,185 @@ import logging
 from datetime import datetime, timezone
 from pathlib import Path
 
-from sqlalchemy import and_, or_, select
+from sqlalchemy import select, text, update
 from sqlalchemy.orm import selectinload
 
 from app.core.directories import STATIC_DIR
-from app.db.models import Order
-from app.db.session import AsyncSessionLocal
-from app.services.emails import send_success_payment_email, send_tracking_email
+from app.db.models import Order, OrderItem
+from app.db.models.order import POST_PAYMENT_PENDING_SQL
+from app.db.session import worker_session
+from app.services.emails import queue_payment_email, queue_tracking_email
+from app.services.jobs import (
+    POST_PAYMENT_JOB,
+    TRACKING_EMAIL_JOB,
+    enqueue_post_payment,
+    enqueue_tracking_email,
+    register,
+)
 from app.services.order_previews import persist_preview_files
 
 log = logging.getLogger("postpay")
 
-# сколько заказов обработаем за один запуск воркера (раз в минуту — более чем)
-BATCH = 25
+# сколько заказов ставим в очередь за один проход страховочного скана
+BATCH = 500
 
 
 def utcnow():
     return datetime.now(timezone.utc)
 
 
-async def process_one(session) -> bool:
-    """
-    Берём 1 заказ под обработку (skip_locked), делаем:
-    - persist мокапов (если need_post_process)
-    - payment email (если не отправлен)
-    - tracking email (если tracking есть и не отправлен)
-    Возвращает True если что-то сделали, иначе False.
-    """
+async def _persist_previews(order_id: str) -> None:
+    """Шаг 1: мокапы -> out/orders/<id>/. Маркер — need_post_process."""
+    async with worker_session() as session:
+        order = (
+            await session.execute(select(Order).where(Order.id == order_id).options(selectinload(Order.items)))
+        ).scalars().first()
+        if order is None or not order.need_post_process:
+            return
 
-    stmt = (
-        select(Order)
-        .where(
-            Order.status == "paid",
-            or_(
-                Order.need_post_process.is_(True),
-                Order.confirmation_email_sent_at.is_(None),
-                and_(Order.tracking_number.is_not(None), Order.tracking_email_sent_at.is_(None)),
-            ),
+        items_data = [{"id": str(it.id), "url": it.preview_url} for it in order.items]
+        # rollback экспирирует order: дальше только скопированные значения, иначе ленивый refresh
+        await session.rollback()
+        # hardlink'и в blob-хранилище идемпотентны: повтор после сбоя безопасен
+        updated_paths = await asyncio.to_thread(
+            persist_preview_files,
+            order_id=str(order_id),
+            items_data=items_data,
+            static_dir=Path(STATIC_DIR),
         )
-        .options(selectinload(Order.items))
-        .with_for_update(skip_locked=True)
-        .limit(1)
-    )
-
-    result = await session.execute(stmt)
-    order = result.scalars().unique().first()
-    if not order:
-        return False
+        for r in updated_paths:
+            await session.execute(
+                update(OrderItem)
+                .where(OrderItem.id == int(r["id"]), OrderItem.order_id == order_id)
+                .values(preview_url=r["new_url"])
+            )
+        await session.execute(
+            update(Order).where(Order.id == order_id, Order.need_post_process.is_(True)).values(need_post_process=False)
+        )
+        await session.commit()
 
-    did_something = False
 
-    try:
-        log.info("Processing order %s", order.id)
+async def _queue_confirmation(order_id: str) -> None:
+    """
+    Шаг 2: письмо об оплате — в outbox (отправит workers/email_sender.py пачкой).
+    Маркер confirmation_email_sent_at ставится в той же транзакции, что и запись в outbox:
+    дальше доставку гарантирует outbox с собственными ретраями.
+    """
+    async with worker_session() as session:
+        row = (
+            await session.execute(
+                select(Order.customer_email, Order.order_number, Order.confirmation_email_sent_at)
+                .where(Order.id == order_id)
+            )
+        ).first()
+        if row is None or row.confirmation_email_sent_at is not None:
+            return
+        await queue_payment_email(session, order_id=order_id, email=row.customer_email, order_number=row.order_number)
+        await session.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.confirmation_email_sent_at.is_(None))
+            .values(confirmation_email_sent_at=utcnow())
+        )
+        await session.commit()
 
-        # 1) persist мокапов — только если нужно
-        if order.need_post_process:
-            items_data = [{"id": str(it.id), "url": it.preview_url} for it in order.items]
 
-            updated_paths = await asyncio.to_thread(
-                persist_preview_files,
-                order_id=str(order.id),
-                items_data=items_data,
-                static_dir=Path(STATIC_DIR),
+async def handle_post_payment(payload: dict) -> None:
+    """
+    Задача order.post_payment. Шаги независимы и идут параллельно, каждый на своей
+    сессии и со своим маркером: упавший шаг не откатывает соседний, а ретрай задачи
+    (backoff, см. job_runner) повторит только то, что не завершилось.
+    Строку заказа не блокируем — от параллельного запуска той же задачи защищает аренда в jobs:
+    раннер продлевает её, пока шаг идёт, а потерявший аренду отменяет свою копию.
+    """
+    order_id = payload["order_id"]
+    async with worker_session() as session:
+        status = (await session.execute(select(Order.status).where(Order.id == order_id))).scalar_one_or_none()
+    if status != "paid":
+        log.warning("Post-payment skipped, order %s is not paid", order_id)
+        return
+
+    results = await asyncio.gather(
+        _persist_previews(order_id),
+        _queue_confirmation(order_id),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    for exc in errors[1:]:
+        log.error("Post-payment step failed for order %s", order_id, exc_info=exc)
+    if errors:
+        raise errors[0]
+
+
+async def handle_tracking_email(payload: dict) -> None:
+    order_id = payload["order_id"]
+    async with worker_session() as session:
+        row = (
+            await session.execute(
+                select(Order.customer_email, Order.order_number, Order.tracking_number, Order.tracking_email_sent_at)
+                .where(Order.id == order_id)
             )
+        ).first()
+        if row is None or not row.tracking_number or row.tracking_email_sent_at is not None:
+            return
+        queued = await queue_tracking_email(
+            session,
+            order_id=order_id,
+            email=row.customer_email,
+            order_number=row.order_number,
+            tracking_number=row.tracking_number,
+        )
+        if queued is None:
+            # письмо с этим номером в outbox уже есть — маркер не трогаем, отправленным его не считаем
+            log.warning("Tracking email for order %s (%s) already queued", order_id, row.tracking_number)
+            return
+        await session.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.tracking_email_sent_at.is_(None))
+            .values(tracking_email_sent_at=utcnow())
+        )
+        await session.commit()
 
-            if updated_paths:
-                updates_map = {r["id"]: r["new_url"] for r in updated_paths}
-                for it in order.items:
-                    new_url = updates_map.get(str(it.id))
-                    if new_url:
-                        it.preview_url = new_url
-
-            order.need_post_process = False
-
-            # фиксируем файлы/урлы как “важную часть”
-            await session.commit()
-            await session.refresh(order)
-
-            did_something = True
-
-        # 2) payment email
-        if order.confirmation_email_sent_at is None:
-            try:
-                await send_success_payment_email(
-                    email=order.customer_email,
-                    order_number=order.order_number,
-                )
-                order.confirmation_email_sent_at = utcnow()
-                await session.commit()
-                await session.refresh(order)
-
-                did_something = True
-            except Exception:
-                # письмо не ушло — БД не трогаем, воркер попробует снова
-                await session.rollback()
-                log.exception("Payment email failed for order %s", order.id)
-
-        # 3) tracking email
-        if order.tracking_number and order.tracking_email_sent_at is None:
-            try:
-                await send_tracking_email(
-                    email=order.customer_email,
-                    order_number=order.order_number,
-                    tracking_number=order.tracking_number,
-                )
-                order.tracking_email_sent_at = utcnow()
-                await session.commit()
-                await session.refresh(order)
-
-                did_something = True
-            except Exception:
-                await session.rollback()
-                log.exception("Tracking email failed for order %s", order.id)
-
-        return did_something
-
-    except Exception:
-        await session.rollback()
-        log.exception("Failed to process order %s", order.id)
-        return False
 
+register(POST_PAYMENT_JOB, handle_post_payment)
+register(TRACKING_EMAIL_JOB, handle_tracking_email)
 
-async def process_batch() -> int:
-    processed = 0
 
-    async with AsyncSessionLocal() as session:
-        # Пробуем обработать до BATCH заказов за один запуск.
-        for _ in range(BATCH):
-            did = await process_one(session)
-            if not did:
-                break
-            processed += 1
+def pending_work_query():
+    """Заказы с незавершённой пост-обработкой; идёт по ix_orders_post_payment_pending."""
+    return (
+        select(
+            Order.id,
+            Order.need_post_process,
+            Order.confirmation_email_sent_at,
+            Order.tracking_number,
+            Order.tracking_email_sent_at,
+        )
+        .where(text(POST_PAYMENT_PENDING_SQL))
+        .order_by(Order.created_at)
+        .limit(BATCH)
+    )
+
 
-    return processed
+async def enqueue_pending() -> int:
+    """
+    Страховочный скан (cron, редко): заказы, для которых работа есть, а задачи нет —
+    оплаченные до появления очереди или изменённые руками в БД.
+    dedup_key не даёт поставить дубль, dead-задачи остаются на разбор.
+    """
+    enqueued = 0
+    async with worker_session() as session:
+        for row in (await session.execute(pending_work_query())).all():
+            if row.need_post_process or row.confirmation_email_sent_at is None:
+                enqueued += await enqueue_post_payment(session, row.id) is not None
+            if row.tracking_number and row.tracking_email_sent_at is None:
+                enqueued += await enqueue_tracking_email(session, row.id, row.tracking_number) is not None
+        await session.commit()
+    return enqueued
 
 
 async def main():
-    n = await process_batch()
-    log.info("Processed %s orders (did_something)", n)
+    n = await enqueue_pending()
+    log.info("Enqueued %s post-payment jobs", n)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+# app/workers/webhook_events.py
+import logging
+
+from app.db.session import worker_session
+from app.services.jobs import WEBHOOK_APPLY_JOB, register
+from app.services.webhook_events import apply_pending
+
+log = logging.getLogger("webhooks")
+
+
+async def handle_webhook_apply(payload: dict) -> None:
+    """
+    Задача webhook.apply: все необработанные события заказа, по порядку.
+    Упавшее событие откатывает пачку, задача уходит в ретрай по backoff —
+    события после него ждут, а не применяются через голову.
+    """
+    order_ref = payload["order_ref"]
+    async with worker_session() as session:
+        applied = await apply_pending(session, order_ref)
+        await session.commit()
+    if applied:
+        log.info("Applied %s webhook events | order_ref=%s", applied, order_ref)
+
+
+register(WEBHOOK_APPLY_JOB, handle_webhook_apply)